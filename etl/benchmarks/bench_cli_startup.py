@@ -0,0 +1,104 @@
+# Usage (from the etl directory) : python -m benchmarks.bench_cli_startup
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+COMMANDS = ["ofx", "csv", "prices", "replay", "all"]
+
+HEAVY_MODULES = ["numpy", "pandas", "sqlalchemy", "pymysql", "ofxparse", "yfinance"]
+
+# the real command of main.py, on an empty data directory and a database refusing connections :
+# each step imports what it needs, fails on its first query and the next step runs.
+# A module missing from the environment (yfinance...) still fails the command.
+SNIPPET = """
+import atexit, json, logging, os, sys, tempfile
+logging.disable(logging.CRITICAL)
+atexit.register(lambda: print(json.dumps({{"modules": len(sys.modules), "heavy": [name for name in {heavy!r} if name in sys.modules]}})))
+
+import main
+data_dir = tempfile.mkdtemp()
+for folder in ("to_process", "archives", "error"):
+    os.makedirs(os.path.join(data_dir, folder))
+main.data_directory = data_dir
+main.metrics_jsonl_path = os.path.join(data_dir, "metrics.jsonl")
+main.metrics_prometheus_path = None
+main.db_config = {{**main.db_config, "host": "127.0.0.1", "port": 1}}
+
+from pipelines.main_pipeline import MainPipeline
+def tolerant(step):
+    def run(self, *args, **kwargs):
+        try:
+            return step(self, *args, **kwargs)
+        except ImportError:
+            raise
+        except Exception:
+            return 0, 0
+    return run
+for name, step in list(vars(MainPipeline).items()):
+    if name.startswith("process_"):
+        setattr(MainPipeline, name, tolerant(step))
+
+main.run_command(main.parse_args([{command!r}]))
+"""
+
+def import_seconds(importtime_output: str) -> float:
+    # sum of the "self" column of python -X importtime : time spent importing modules
+    total = 0
+    for line in importtime_output.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            self_time = line.split(":", 1)[1].split("|")[0].strip()
+            if self_time.isdigit():
+                total += int(self_time)
+    return total / 1e6
+
+def measure(command: str) -> dict:
+    # one cold interpreter : wall time of the whole process, import time reported by -X importtime
+    snippet = SNIPPET.format(command=command, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", snippet], capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        # last line of the traceback, e.g. ModuleNotFoundError: No module named 'yfinance'
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["imports"] = import_seconds(process.stderr)
+    result["wall"] = wall
+    return result
+
+def run(commands: list, repeat: int, output: str):
+    print(f"{'command':>8} {'wall (ms)':>10} {'imports (ms)':>13} {'modules':>8}  heavy modules")
+    results = {}
+    for command in commands:
+        try:
+            runs = [measure(command) for _ in range(repeat)]
+        except RuntimeError as e:
+            print(f"{command:>8} skipped : {e}")
+            continue
+        results[command] = {
+            "wall_ms"       : round(statistics.median(run["wall"] for run in runs) * 1000, 1),
+            "imports_ms"    : round(statistics.median(run["imports"] for run in runs) * 1000, 1),
+            "modules"       : runs[-1]["modules"],
+            "heavy"         : runs[-1]["heavy"]
+        }
+        result = results[command]
+        print(f"{command:>8} {result['wall_ms']:>10.1f} {result['imports_ms']:>13.1f} {result['modules']:>8}  {', '.join(result['heavy'])}")
+
+    # tracked between versions : compare the files of two runs
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start latency of each main.py command")
+    parser.add_argument("--commands", nargs="+", default=COMMANDS, choices=COMMANDS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="JSON file receiving the medians")
+    args = parser.parse_args()
+
+    # imports resolve from the etl directory, as main.py
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    run(args.commands, args.repeat, args.output)
@@ -0,0 +1,71 @@
+# Usage (from the etl directory) : python -m benchmarks.bench_csv_securities_transformer
+import argparse
+import re
+import time
+import pandas as pd
+from transform.csv_securities_transformer import CsvSecuritiesTransformer
+from benchmarks.generators import generate_raw_operations
+
+def legacy_clean_amounts(amount: str):
+    match = re.search(r"[\d,]+", amount)
+    if match:
+        amount = match.group().replace(",", ".")
+        amount = float(amount)
+
+    return amount
+
+def legacy_transform_security_operations(raw_data: pd.DataFrame) -> pd.DataFrame:
+    # previous row by row implementation
+    operations = raw_data[["Opération", "ISIN", "Quantité", "Montant Net", "Frais", "Date", "account_id"]].copy()
+    operations = operations[operations["ISIN"].notna() & (operations["ISIN"] != "")]
+
+    operations["operation_type"] = operations["Opération"].apply(
+        lambda x: "purchase" if "ACHAT" in x.upper()
+        else "sale" if "VENTE" in x.upper()
+        else "tax"
+    )
+
+    operations["Montant Net"] = operations["Montant Net"].apply(legacy_clean_amounts)
+    operations["Frais"] = operations["Frais"].apply(legacy_clean_amounts)
+
+    operations["gross_amount"] = operations.apply(
+        lambda row: row["Montant Net"] + row["Frais"]
+        if row["operation_type"] == "sale"
+        else row["Montant Net"] - row["Frais"],
+        axis=1
+    )
+
+    operations["gross_unit_price"] = round(operations["gross_amount"]/operations["Quantité"], 4)
+    operations["net_unit_price"] = round(operations["Montant Net"]/operations["Quantité"], 4)
+
+    return operations.drop(columns="Opération")
+
+def as_text(legacy: pd.DataFrame, vectorized: pd.DataFrame) -> tuple:
+    # categorical columns of the transformer (db.dtypes) are compared on their labels
+    columns = [column for column in vectorized.columns if isinstance(vectorized[column].dtype, pd.CategoricalDtype)]
+    return legacy.astype({column: str for column in columns}), vectorized.astype({column: str for column in columns})
+
+def run(sizes: list, seed: int):
+    print(f"{'rows':>9} {'legacy (s)':>11} {'vectorized (s)':>15} {'speedup':>8}")
+
+    for size in sizes:
+        raw_data = generate_raw_operations(size, seed)
+
+        start = time.perf_counter()
+        legacy = legacy_transform_security_operations(raw_data)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = CsvSecuritiesTransformer(raw_data).transform_security_operations()
+        vectorized_time = time.perf_counter() - start
+
+        pd.testing.assert_frame_equal(*as_text(legacy, vectorized), check_dtype=False)
+        print(f"{size:>9} {legacy_time:>11.3f} {vectorized_time:>15.3f} {legacy_time / vectorized_time:>7.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Row by row vs vectorized CsvSecuritiesTransformer.transform_security_operations")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    run(args.rows, args.seed)
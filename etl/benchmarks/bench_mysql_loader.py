@@ -0,0 +1,66 @@
+# Usage (from the etl directory, needs a MySQL server with local_infile=ON) :
+#   python -m benchmarks.bench_mysql_loader --user root --password root --database personnal_finance_db
+import argparse
+import time
+from sqlalchemy import text
+from load.mysql_loader import MySQLLoader, STAGING_MODES
+from benchmarks.generators import generate_security_prices
+
+CREATE_TMP_SECURITY_PRICES_SQL = """
+CREATE TEMPORARY TABLE tmp_security_prices (
+    isin VARCHAR(12) NOT NULL,
+    date DATE NOT NULL,
+    open_price DECIMAL(10,4),
+    close_price DECIMAL(10,4),
+    high DECIMAL(10,4),
+    low DECIMAL(10,4),
+    volume BIGINT
+);
+"""
+
+def run(db_config: dict, rows: int, modes: list, chunksizes: list):
+    security_prices = generate_security_prices(rows)
+    print(f"{'mode':>10} {'chunksize':>10} {'rows':>9} {'staging (s)':>12} {'rows/s':>10}")
+
+    for mode in modes:
+        for chunksize in (chunksizes if mode == "multi" else [None]):
+            loader = MySQLLoader(db_config, {"security_prices": security_prices}, staging_mode=mode, chunksize=chunksize)
+
+            # only the staging step differs between modes : the temp table is dropped with the transaction
+            with loader.engine.connect() as conn:
+                transaction = conn.begin()
+                conn.execute(text(CREATE_TMP_SECURITY_PRICES_SQL))
+
+                start = time.perf_counter()
+                loader.stage_dataframe(conn, security_prices, "tmp_security_prices")
+                duration = time.perf_counter() - start
+
+                staged = conn.execute(text("SELECT COUNT(*) FROM tmp_security_prices")).scalar()
+                transaction.rollback()
+                conn.execute(text("DROP TEMPORARY TABLE IF EXISTS tmp_security_prices"))
+
+            if staged != len(security_prices):
+                raise AssertionError(f"{mode} staged {staged} rows instead of {len(security_prices)}")
+            print(f"{mode:>10} {str(chunksize or '-'):>10} {staged:>9} {duration:>12.2f} {staged / duration:>10.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MySQLLoader staging modes on security_prices")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="root")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--database", default="personnal_finance_db")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--modes", nargs="+", default=list(STAGING_MODES), choices=STAGING_MODES)
+    parser.add_argument("--chunksizes", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+
+    db_config = {
+        "user"          : args.user,
+        "password"      : args.password,
+        "host"          : args.host,
+        "port"          : args.port,
+        "database"      : args.database,
+        "local_infile"  : True
+    }
+    run(db_config, args.rows, args.modes, args.chunksizes)
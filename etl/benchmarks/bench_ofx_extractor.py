@@ -0,0 +1,61 @@
+# Usage (from the etl directory) : python -m benchmarks.bench_ofx_extractor
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from extract.ofx_extractor import OfxExtractor
+from benchmarks.generators import generate_ofx_file
+
+def legacy_extract_all(path: str) -> dict:
+    # previous behaviour : one ofxparse parse for accounts, another one for transactions
+    return {
+        "accounts"      : OfxExtractor(path).extract_accounts(),
+        "transactions"  : OfxExtractor(path).extract_transactions()
+    }
+
+def consume_chunks(path: str, chunk_size: int) -> int:
+    return sum(len(chunk["transactions"]) for chunk in OfxExtractor(path, streaming=True, chunk_size=chunk_size).iter_chunks())
+
+def measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, duration, peak
+
+def run(sizes: list, chunk_size: int, seed: int):
+    print(f"{'rows':>9} {'size (MB)':>10} {'mode':>16} {'time (s)':>9} {'peak (MB)':>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = os.path.join(directory, f"bench_{size}.ofx")
+            generate_ofx_file(path, size, seed=seed)
+            file_size = os.path.getsize(path) / 1e6
+
+            results = {}
+            for mode, function, args in [
+                ("ofxparse x2", legacy_extract_all, (path,)),
+                ("ofxparse", lambda p: OfxExtractor(p).extract_all(), (path,)),
+                ("streaming", lambda p: OfxExtractor(p, streaming=True, chunk_size=chunk_size).extract_all(), (path,)),
+                ("streaming chunks", consume_chunks, (path, chunk_size))
+            ]:
+                result, duration, peak = measure(function, *args)
+                results[mode] = result
+                print(f"{size:>9} {file_size:>10.1f} {mode:>16} {duration:>9.2f} {peak / 1e6:>10.1f}")
+
+            for key in ("accounts", "transactions"):
+                pd.testing.assert_frame_equal(results["ofxparse"][key], results["streaming"][key], check_dtype=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ofxparse extraction vs single pass streaming extraction")
+    parser.add_argument("--rows", type=int, nargs="+", default=[2000, 10000, 20000])
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    run(args.rows, args.chunk_size, args.seed)
@@ -0,0 +1,74 @@
+# Usage (from the etl directory) : python -m benchmarks.bench_payee_matcher
+import argparse
+import random
+import string
+import time
+from transform.payee_matcher import PayeeMatcher
+
+WORDS = ["CARREFOUR", "AUCHAN", "LECLERC", "SNCF", "AMAZON", "PHARMACIE", "BOULANGERIE", "RESTAURANT", "GARAGE", "CINEMA"]
+
+def generate_payees(count: int, rng: random.Random) -> list:
+    payees = set()
+    while len(payees) < count:
+        suffix = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(3, 10)))
+        payees.add(f"{rng.choice(WORDS)} {suffix}")
+
+    # same order as MySQLExtractor.get_clean_payees
+    return sorted(payees, key=len, reverse=True)
+
+def generate_transactions(count: int, payees: list, rng: random.Random) -> list:
+    transactions = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            payee = rng.choice(payees)
+        else:
+            payee = rng.choice(WORDS) + " " + "".join(rng.choices(string.ascii_uppercase, k=8))
+        transactions.append(f"X{rng.randint(1000, 9999)} {payee} {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}")
+
+    return transactions
+
+def legacy_match(payee: str, db_payees: list):
+    for db_payee in db_payees:
+        if db_payee in payee:
+            return db_payee
+    return None
+
+def run(payee_counts: list, transaction_count: int, unique_ratio: float, seed: int):
+    rng = random.Random(seed)
+    print(f"{'payees':>8} {'rows':>8} {'unique':>8} {'legacy (s)':>12} {'build (s)':>10} {'matcher (s)':>12} {'speedup':>8}")
+
+    for payee_count in payee_counts:
+        payees = generate_payees(payee_count, rng)
+        distinct = generate_transactions(max(1, int(transaction_count * unique_ratio)), payees, rng)
+        rows = [rng.choice(distinct) for _ in range(transaction_count)]
+
+        # legacy : one scan of the payee list per row
+        start = time.perf_counter()
+        legacy = [legacy_match(row, payees) for row in rows]
+        legacy_time = time.perf_counter() - start
+
+        # matcher : automaton built once, one lookup per distinct raw payee
+        start = time.perf_counter()
+        matcher = PayeeMatcher(payees)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cache = {row: matcher.match(row) for row in set(rows)}
+        indexed = [cache[row] for row in rows]
+        match_time = time.perf_counter() - start
+
+        if legacy != indexed:
+            raise AssertionError(f"Results differ for {payee_count} payees")
+
+        speedup = legacy_time / (build_time + match_time)
+        print(f"{payee_count:>8} {transaction_count:>8} {len(set(rows)):>8} {legacy_time:>12.3f} {build_time:>10.3f} {match_time:>12.3f} {speedup:>7.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Legacy payee scan vs PayeeMatcher")
+    parser.add_argument("--payees", type=int, nargs="+", default=[100, 1000, 10000, 30000])
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--unique-ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    run(args.payees, args.transactions, args.unique_ratio, args.seed)
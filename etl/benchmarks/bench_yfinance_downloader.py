@@ -0,0 +1,90 @@
+# Usage (from the etl directory) : python -m benchmarks.bench_yfinance_downloader
+# No network : yf.download is replaced by a local stand-in with a fixed latency per call.
+import argparse
+import datetime
+import threading
+import time
+import numpy as np
+import pandas as pd
+from extract.yfinance_downloader import YFinanceDownloader
+
+class FakeDownload:
+    # same output layout as yf.download(group_by="column", auto_adjust=True) : (Price, Ticker) columns
+    def __init__(self, latency: float, failure_rate: float = 0.0, seed: int = 42):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, tickers, start, end, **kwargs) -> pd.DataFrame:
+        with self.lock:
+            self.calls += 1
+            fail = self.rng.random() < self.failure_rate
+        time.sleep(self.latency)
+        if fail:
+            raise ConnectionError("Too Many Requests")
+
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        dates = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1), name="Date")
+        columns = pd.MultiIndex.from_product([["Close", "High", "Low", "Open", "Volume"], tickers], names=["Price", "Ticker"])
+
+        # deterministic prices : the same ticker/date always gets the same values
+        values = np.array([[hash((ticker, date)) % 10000 / 100 for ticker in tickers] for date in dates]).reshape(len(dates), len(tickers))
+        return pd.DataFrame(np.tile(values, 5), index=dates, columns=columns)
+
+def generate_securities(count: int) -> pd.DataFrame:
+    today = datetime.date(2024, 6, 28)
+    return pd.DataFrame({
+        "isin"              : [f"FR{number:010d}" for number in range(count)],
+        "ticker"            : [f"TICK{number}.PA" for number in range(count)],
+        # most securities are up to date but a few days, some are new ones with a long history
+        "start_import_date" : [today - datetime.timedelta(days=3 if number % 10 else 3 + number) for number in range(count)],
+        "end_import_date"   : today
+    })
+
+def legacy_download(securities_df: pd.DataFrame, download_fn) -> pd.DataFrame:
+    # previous behaviour : one call per security, one after another
+    downloader = YFinanceDownloader(download_fn, rate_limit=0, max_retries=0)
+    data = []
+    for _, row in securities_df.iterrows():
+        data += downloader.download_group({
+            "start"     : pd.Timestamp(row["start_import_date"]),
+            "end"       : pd.Timestamp(row["end_import_date"]),
+            "securities": [(row["isin"], row["ticker"], pd.Timestamp(row["start_import_date"]))]
+        })
+    return pd.concat(data, ignore_index=True)
+
+def run(count: int, latency: float, workers: int, batch_size: int):
+    securities = generate_securities(count)
+
+    legacy_fn = FakeDownload(latency)
+    start = time.perf_counter()
+    legacy = legacy_download(securities, legacy_fn)
+    legacy_time = time.perf_counter() - start
+
+    batched_fn = FakeDownload(latency)
+    downloader = YFinanceDownloader(batched_fn, max_workers=workers, batch_size=batch_size, rate_limit=0)
+    start = time.perf_counter()
+    batched = downloader.download_prices(securities)
+    batched_time = time.perf_counter() - start
+
+    sort_columns = ["isin", "date"]
+    pd.testing.assert_frame_equal(
+        legacy.sort_values(sort_columns).reset_index(drop=True),
+        batched.sort_values(sort_columns).reset_index(drop=True)
+    )
+
+    print(f"{'mode':>10} {'calls':>6} {'rows':>8} {'time (s)':>9}")
+    print(f"{'legacy':>10} {legacy_fn.calls:>6} {len(legacy):>8} {legacy_time:>9.2f}")
+    print(f"{'batched':>10} {batched_fn.calls:>6} {len(batched):>8} {batched_time:>9.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sequential vs batched/concurrent price downloads")
+    parser.add_argument("--securities", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per download call")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    run(args.securities, args.latency, args.workers, args.batch_size)
@@ -0,0 +1,106 @@
+# Deterministic synthetic sources for the benchmarks : same seed, same files.
+# Files are written chunk by chunk, from a few rows to 10M rows without holding them in memory.
+import numpy as np
+import pandas as pd
+from transform.payee_matcher import PayeeMatcher
+from transform.memo_pattern_matcher import MemoPatternMatcher
+from transform.category_map import CategoryMap
+
+PAYEES = ["CB CARREFOUR", "PRLV SEPA EDF", "VIR INST MR DUPONT", "CB SNCF INTERNET", "CB AMAZON PAYMENTS", "RETRAIT DAB"]
+OPERATIONS = ["ACHAT COMPTANT", "VENTE COMPTANT", "Achat Bourse", "TAXE TRANSAC FINANCIERES", "COUPONS"]
+CHUNK_ROWS = 100000
+
+def generate_ofx_file(path: str, transaction_count: int, account_count: int = 2, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    start_date = pd.Timestamp("2015-01-01")
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nSECURITY:NONE\nENCODING:USASCII\nCHARSET:1252\nCOMPRESSION:NONE\nOLDFILEUID:NONE\nNEWFILEUID:NONE\n\n")
+        file.write("<OFX>\n<SIGNONMSGSRSV1>\n<SONRS>\n<STATUS>\n<CODE>0\n<SEVERITY>INFO\n</STATUS>\n<DTSERVER>20240630120000\n<LANGUAGE>FRA\n</SONRS>\n</SIGNONMSGSRSV1>\n<BANKMSGSRSV1>\n")
+
+        per_account = transaction_count // account_count
+        for account_number in range(account_count):
+            file.write("<STMTTRNRS>\n<TRNUID>00000000\n<STATUS>\n<CODE>0\n<SEVERITY>INFO\n</STATUS>\n<STMTRS>\n<CURDEF>EUR\n")
+            file.write(f"<BANKACCTFROM>\n<BANKID>30004\n<BRANCHID>00001\n<ACCTID>{10000000000 + account_number}\n<ACCTTYPE>CHECKING\n</BANKACCTFROM>\n")
+            file.write("<BANKTRANLIST>\n<DTSTART>20150101\n<DTEND>20240630\n")
+            for start in range(0, per_account, CHUNK_ROWS):
+                numbers = np.arange(start, min(start + CHUNK_ROWS, per_account))
+                dates = start_date + pd.to_timedelta(numbers * 3400 // max(per_account, 1), unit="D")
+                amounts = np.round(rng.uniform(-250, 150, len(numbers)), 2)
+                payees = rng.choice(PAYEES, len(numbers))
+                file.write("".join(
+                    f"<STMTTRN>\n<TRNTYPE>{'DEBIT' if amount < 0 else 'CREDIT'}\n<DTPOSTED>{posted}\n"
+                    f"<TRNAMT>{amount:+.2f}\n<FITID>{account_number}{number:010d}\n"
+                    f"<NAME>{payee} {day}\n<MEMO>{'CB' if amount < 0 else 'VIR'} {number}\n</STMTTRN>\n"
+                    for number, posted, day, amount, payee in zip(numbers, dates.strftime("%Y%m%d"), dates.strftime("%d/%m"), amounts, payees)
+                ))
+            file.write(f"</BANKTRANLIST>\n<LEDGERBAL>\n<BALAMT>{rng.uniform(0, 10000):.2f}\n<DTASOF>20240630\n</LEDGERBAL>\n</STMTRS>\n</STMTTRNRS>\n")
+
+        file.write("</BANKMSGSRSV1>\n</OFX>\n")
+
+def generate_raw_operations(count: int, seed: int = 42, start: int = 0) -> pd.DataFrame:
+    # rows start to start + count of a broker export, as returned by CsvSecuritiesExtractor
+    rng = np.random.default_rng(seed)
+    isins = np.array([f"FR{number:010d}" for number in range(200)])
+
+    net_amounts = rng.uniform(10, 20000, count)
+    fees = rng.uniform(0, 20, count)
+
+    return pd.DataFrame({
+        "Date"          : pd.date_range(pd.Timestamp("2010-01-01") + pd.Timedelta(minutes=start), periods=count, freq="min").strftime("%d/%m/%Y"),
+        "Opération"     : rng.choice(OPERATIONS, count),
+        "Valeur"        : "SECURITY NAME",
+        "ISIN"          : rng.choice(isins, count),
+        "Quantité"      : rng.integers(1, 500, count),
+        "Montant Net"   : [f"{amount:.2f} €".replace(".", ",") for amount in net_amounts],
+        "Frais"         : [f"{amount:.2f} €".replace(".", ",") for amount in fees],
+        "account_id"    : "12345678901"
+    })
+
+def generate_securities_csv(path: str, operation_count: int, account_id: str = "12345678901", seed: int = 42):
+    # layout read by CsvSecuritiesExtractor : account id on line 3, column names after 4 skipped lines
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        file.write(f"Export des opérations\nCompte-titres\nN° de compte : {account_id}\n\n")
+        for chunk_number, start in enumerate(range(0, operation_count, CHUNK_ROWS)):
+            operations = generate_raw_operations(min(CHUNK_ROWS, operation_count - start), seed + chunk_number, start)
+            operations.drop(columns="account_id").to_csv(file, sep=";", index=False, header=chunk_number == 0, lineterminator="\n")
+
+def generate_security_prices(count: int, isin_count: int = None, seed: int = 42) -> pd.DataFrame:
+    # daily prices of isin_count securities, enough of them to stay within the pandas date range
+    rng = np.random.default_rng(seed)
+    isin_count = isin_count or max(100, -(-count // 5000))
+    per_isin = count // isin_count
+    dates = pd.bdate_range("1990-01-01", periods=per_isin)
+
+    close_prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, per_isin * isin_count)))
+
+    return pd.DataFrame({
+        "isin"          : np.repeat([f"FR{number:010d}" for number in range(isin_count)], per_isin),
+        "date"          : np.tile(dates, isin_count),
+        "open_price"    : np.round(close_prices * rng.uniform(0.99, 1.01, len(close_prices)), 4),
+        "close_price"   : np.round(close_prices, 4),
+        "high"          : np.round(close_prices * 1.02, 4),
+        "low"           : np.round(close_prices * 0.98, 4),
+        "volume"        : rng.integers(0, 1_000_000, len(close_prices))
+    })
+
+def generate_reference_data() -> dict:
+    # payees, memo patterns and categories matching the generated files, as OfxTransformer arguments
+    categories = pd.DataFrame({
+        "id"        : [1, 2, 3, 4, 5],
+        "name"      : ["Retrait", "Non catégorisé", "Courses", "Énergie", "Transport"],
+        "parent_id" : [None, None, None, None, 4]
+    })
+    links = pd.DataFrame({
+        "id"            : [1, 2, 3],
+        "payee"         : ["CB CARREFOUR", "PRLV SEPA EDF", "CB SNCF INTERNET"],
+        "is_expense"    : [1, 1, 1],
+        "category_id"   : [3, 4, 5]
+    })
+    payment_methods = pd.DataFrame({"id": [1, 2, 3], "name": ["CARTE", "VIREMENT", "RETRAIT"]})
+
+    return {
+        "payee_matcher"             : PayeeMatcher(sorted(PAYEES, key=len, reverse=True)),
+        "payment_method_matcher"    : MemoPatternMatcher([("CB %", 1), ("VIR %", 2), ("RETRAIT%", 3)]),
+        "category_map"              : CategoryMap(categories, links, payment_methods)
+    }
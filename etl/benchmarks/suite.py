@@ -0,0 +1,191 @@
+# Usage (from the etl directory) :
+#   python -m benchmarks.suite --rows 1000 100000 1000000 --output before.json
+#   python -m benchmarks.suite --compare before.json after.json
+# Extract, transform and load of generated OFX files, broker CSV exports and price histories,
+# each stage timed on its own. No MySQL server needed : loads go to a SQLite stand-in.
+import argparse
+import datetime
+import decimal
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from extract.ofx_extractor import OfxExtractor
+from extract.csv_securities_extractor import CsvSecuritiesExtractor
+from transform.ofx_transformer import OfxTransformer
+from transform.csv_securities_transformer import CsvSecuritiesTransformer
+from load.mysql_loader import MySQLLoader, STAGING_MODES
+from benchmarks.generators import generate_ofx_file, generate_securities_csv, generate_security_prices, generate_reference_data
+
+DATASETS = ("ofx", "csv", "prices")
+
+# MySQLLoader only needs a db_config to build its (never connected) engine : its staging step runs on SQLite
+STAND_IN_DB_CONFIG = {"user": "bench", "password": "bench", "host": "localhost", "port": 3306, "database": "bench"}
+
+# target tables of the stand-in : columns, key of the anti-join merge (same as MySQLLoader)
+STAND_IN_TABLES = {
+    "transactions"          : (["id", "account_id", "date", "payee", "clean_payee", "memo", "amount", "is_expense", "payment_method_id", "category_id", "parent_category_id"],
+                               ["id"]),
+    "security_operations"   : (["date", "isin", "operation_type", "quantity", "net_amount", "gross_amount", "net_unit_price", "gross_unit_price", "fees", "account_id"],
+                               ["date", "isin", "quantity", "operation_type", "account_id"]),
+    "security_prices"       : (["date", "isin", "open_price", "close_price", "high", "low", "volume"],
+                               ["date", "isin"])
+}
+
+# amounts parsed from the OFX files are Decimal, sent as text as pymysql does
+sqlite3.register_adapter(decimal.Decimal, str)
+
+class SQLiteStandIn:
+    # Local stand-in of the database : DataFrames are staged into a temp table by
+    # MySQLLoader.stage_dataframe, then merged with the anti-join of MySQLLoader (SQLite syntax).
+    def __init__(self, path: str, staging_mode: str = "to_sql", chunksize: int = None):
+        self.engine = create_engine(f"sqlite:///{path}")
+        self.loader = MySQLLoader(STAND_IN_DB_CONFIG, {}, staging_mode=staging_mode, chunksize=chunksize)
+
+    def load(self, table: str, df: pd.DataFrame) -> int:
+        # returns the number of rows inserted
+        columns, keys = STAND_IN_TABLES[table]
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS tmp_{table}")
+            self.loader.stage_dataframe(conn, df[columns], f"tmp_{table}")
+            # target table with the column types of the staged rows, the merge key is indexed
+            conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM tmp_{table} WHERE 0")
+            conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS idx_{table}_key ON {table} ({', '.join(keys)})")
+            result = conn.exec_driver_sql(f"""
+                INSERT INTO {table} ({', '.join(columns)})
+                SELECT {', '.join(f'tmp.{column}' for column in columns)}
+                FROM tmp_{table} tmp
+                LEFT JOIN {table} act ON {' AND '.join(f'tmp.{key} = act.{key}' for key in keys)}
+                WHERE act.rowid IS NULL
+            """)
+            return result.rowcount
+
+def timed(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def record(results: list, dataset: str, size: int, stage: str, rows: int, seconds: float):
+    results.append({
+        "dataset"           : dataset,
+        "size"              : size,
+        "stage"             : stage,
+        "rows"              : rows,
+        "seconds"           : round(seconds, 4),
+        "rows_per_second"   : round(rows / seconds) if seconds > 0 else None
+    })
+    print(f"{dataset:>7} {size:>9} {stage:>10} {rows:>9} {seconds:>9.3f} {results[-1]['rows_per_second'] or 0:>11}")
+
+def bench_load(results: list, dataset: str, size: int, stand_in: SQLiteStandIn, table: str, df: pd.DataFrame):
+    inserted, seconds = timed(stand_in.load, table, df)
+    record(results, dataset, size, "load", inserted, seconds)
+    # the same rows again : every one of them is a duplicate found by the merge
+    _, seconds = timed(stand_in.load, table, df)
+    record(results, dataset, size, "reload", len(df), seconds)
+
+def bench_ofx(results: list, directory: str, size: int, stand_in: SQLiteStandIn, seed: int):
+    path = os.path.join(directory, f"bench_{size}.ofx")
+    generate_ofx_file(path, size, seed=seed)
+    reference_data = generate_reference_data()
+
+    # streaming parser : the one able to read the largest files
+    raw_data, seconds = timed(OfxExtractor(path, streaming=True).extract_all)
+    record(results, "ofx", size, "extract", len(raw_data["transactions"]), seconds)
+    clean_data, seconds = timed(OfxTransformer(raw_data, None, **reference_data).transform_all)
+    record(results, "ofx", size, "transform", len(clean_data["transactions"]), seconds)
+    bench_load(results, "ofx", size, stand_in, "transactions", clean_data["transactions"])
+
+def bench_csv(results: list, directory: str, size: int, stand_in: SQLiteStandIn, seed: int):
+    path = os.path.join(directory, f"bench_{size}.csv")
+    generate_securities_csv(path, size, seed=seed)
+
+    raw_data, seconds = timed(CsvSecuritiesExtractor(path).extract_securities)
+    record(results, "csv", size, "extract", len(raw_data), seconds)
+    clean_data, seconds = timed(CsvSecuritiesTransformer(raw_data).transform_all)
+    record(results, "csv", size, "transform", len(clean_data["security_operations"]), seconds)
+    bench_load(results, "csv", size, stand_in, "security_operations", clean_data["security_operations"])
+
+def bench_prices(results: list, directory: str, size: int, stand_in: SQLiteStandIn, seed: int):
+    # prices come from yfinance : only their load is measured
+    bench_load(results, "prices", size, stand_in, "security_prices", generate_security_prices(size, seed=seed))
+
+def environment(seed: int, staging_mode: str) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit"        : commit,
+        "date"          : datetime.datetime.now().isoformat(timespec="seconds"),
+        "python"        : platform.python_version(),
+        "pandas"        : pd.__version__,
+        "numpy"         : np.__version__,
+        "platform"      : platform.platform(),
+        "seed"          : seed,
+        "staging_mode"  : staging_mode
+    }
+
+def run(sizes: list, datasets: list, seed: int, staging_mode: str, chunksize: int, output: str):
+    benchmarks = {"ofx": bench_ofx, "csv": bench_csv, "prices": bench_prices}
+    results = []
+    print(f"{'dataset':>7} {'size':>9} {'stage':>10} {'rows':>9} {'time (s)':>9} {'rows/s':>11}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            for dataset in datasets:
+                # empty database for each run : load measures an insert, reload a full duplicate check
+                stand_in = SQLiteStandIn(os.path.join(directory, f"{dataset}_{size}.sqlite"), staging_mode, chunksize)
+                benchmarks[dataset](results, directory, size, stand_in, seed)
+                stand_in.engine.dispose()
+
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump({"environment": environment(seed, staging_mode), "results": results}, file, indent=2)
+        print(f"Results written to {output}")
+
+def compare(before_path: str, after_path: str, tolerance: float) -> int:
+    # returns the number of stages slower than before by more than tolerance
+    with open(before_path, encoding="utf-8") as file:
+        before = json.load(file)
+    with open(after_path, encoding="utf-8") as file:
+        after = json.load(file)
+
+    before_times = {(result["dataset"], result["size"], result["stage"]): result["seconds"] for result in before["results"]}
+    print(f"{before['environment']['commit']} -> {after['environment']['commit']}")
+    print(f"{'dataset':>7} {'size':>9} {'stage':>10} {'before (s)':>11} {'after (s)':>10} {'ratio':>7}")
+
+    regressions = 0
+    for result in after["results"]:
+        key = (result["dataset"], result["size"], result["stage"])
+        if key not in before_times or not before_times[key]:
+            continue
+        ratio = result["seconds"] / before_times[key]
+        slower = ratio > 1 + tolerance
+        regressions += slower
+        print(f"{key[0]:>7} {key[1]:>9} {key[2]:>10} {before_times[key]:>11.3f} {result['seconds']:>10.3f} {ratio:>6.2f}x{'  REGRESSION' if slower else ''}")
+
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract / transform / load benchmark on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000], help="sizes of the generated sources, up to 10M")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=DATASETS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--staging-mode", default="to_sql", choices=[mode for mode in STAGING_MODES if mode != "load_data"])
+    parser.add_argument("--chunksize", type=int, default=None, help="rows per INSERT of the 'multi' staging mode")
+    parser.add_argument("--output", default=None, help="JSON file receiving the environment and the results")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files instead of running")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="--compare : slowdown above which a stage is a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.tolerance) else 0)
+    run(args.rows, args.datasets, args.seed, args.staging_mode, args.chunksize, args.output)
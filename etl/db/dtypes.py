@@ -0,0 +1,76 @@
+import importlib.util
+import pandas as pd
+
+# Column types of the DataFrames passed from the extractors to the transformers and loaders :
+# - bank ids are nullable int64, as the INT column they go to. OFX account ids (ACCTID) and
+#   transaction ids (FITID) are free text in the OFX specification : they are kept as strings
+# - labels repeated on many rows (account type, currency, payee, ISIN...) are categoricals
+# - dates are datetime64
+# - free text is an Arrow-backed string (pandas "python" strings when pyarrow is missing)
+# Amounts are left out : Decimal values from the OFX files stay exact up to the DECIMAL columns.
+STRING = pd.StringDtype("pyarrow" if importlib.util.find_spec("pyarrow") else "python")
+
+ID = "Int64"
+CATEGORY = "category"
+DATETIME = "datetime64"
+# dd/mm/YYYY dates of the broker exports
+DAY_FIRST_DATETIME = "datetime64 (day first)"
+DAY_FIRST_FORMAT = "%d/%m/%Y"
+
+OFX_ACCOUNTS = {
+    "routing_number"    : ID,
+    "account_id"        : STRING,
+    "account_type"      : CATEGORY,
+    "currency"          : CATEGORY,
+    "date"              : DATETIME
+}
+
+OFX_TRANSACTIONS = {
+    **OFX_ACCOUNTS,
+    "payee"             : CATEGORY,
+    "memo"              : STRING,
+    "transaction_id"    : STRING
+}
+
+# broker export, column names of the file. Amounts are parsed by CsvSecuritiesTransformer.
+CSV_SECURITY_OPERATIONS = {
+    "Date"              : DAY_FIRST_DATETIME,
+    "Opération"         : CATEGORY,
+    "Valeur"            : CATEGORY,
+    "ISIN"              : CATEGORY,
+    "account_id"        : ID
+}
+
+def to_ids(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_integer_dtype(values):
+        return values.astype(ID)
+    # OFX values are text : blanks are missing ids, anything else must be a number
+    values = values.astype(STRING).str.strip().replace("", pd.NA)
+    if STRING.storage == "pyarrow":
+        # parsed by Arrow, ArrowInvalid (a ValueError) on a value which is not a number
+        return values.astype("int64[pyarrow]").astype(ID)
+    return pd.to_numeric(values).astype(ID)
+
+def to_datetimes(values: pd.Series, format: str = None) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    # datetime objects and YYYYMMDDHHMMSS server dates (OFX), dd/mm/YYYY (broker export) parsed with
+    # an explicit format : a date which does not match raises instead of being read month first
+    return pd.to_datetime(values, format=format)
+
+def read_csv_dtypes(schema: dict) -> dict:
+    # the types pandas.read_csv builds directly, the others are converted by apply_schema
+    return {column: dtype for column, dtype in schema.items() if dtype in (CATEGORY, STRING)}
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    # columns of the schema found in df are converted in place, the other ones are left as they are
+    for column, dtype in schema.items():
+        if column not in df:
+            continue
+        if dtype == ID:
+            df[column] = to_ids(df[column])
+        elif dtype in (DATETIME, DAY_FIRST_DATETIME):
+            df[column] = to_datetimes(df[column], format=DAY_FIRST_FORMAT if dtype == DAY_FIRST_DATETIME else None)
+        elif df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+    return df
@@ -0,0 +1,147 @@
+import logging
+import os
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL
+
+# pool settings, each one can be overridden by a key of the same name in db_config
+DEFAULT_POOL_CONFIG = {
+    "pool_size"     : 5,
+    "max_overflow"  : 10,
+    "pool_pre_ping" : True,
+    "pool_recycle"  : 3600
+}
+
+def clear_found_rows(dialect, connection_record, cargs, cparams):
+    # SQLAlchemy connects with CLIENT_FOUND_ROWS : the rowcount of an UPDATE is then the rows matched,
+    # and an INSERT ... ON DUPLICATE KEY UPDATE counts its unchanged duplicates. Without it, rowcount
+    # is the rows actually inserted or changed, as reported by the loaders.
+    from pymysql.constants import CLIENT
+    cparams["client_flag"] = cparams.get("client_flag", 0) & ~CLIENT.FOUND_ROWS
+
+class EngineRegistry:
+    # One SQLAlchemy engine (and connection pool) per db_config for the whole process
+    def __init__(self):
+        self.engines = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def build_key(self, db_config: dict) -> tuple:
+        pool_config = {name: db_config.get(name, default) for name, default in DEFAULT_POOL_CONFIG.items()}
+
+        return (
+            db_config["user"],
+            db_config["password"],
+            db_config["host"],
+            db_config["port"],
+            db_config["database"],
+            bool(db_config.get("local_infile", False)),
+            tuple(sorted(pool_config.items()))
+        )
+
+    def build_url(self, db_config: dict) -> URL:
+        return URL.create(
+            "mysql+pymysql",
+            username=db_config["user"],
+            password=db_config["password"],
+            host=db_config["host"],
+            port=db_config["port"],
+            database=db_config["database"]
+        )
+
+    def track_pool(self, key: tuple, engine):
+        counters = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0, "executes": 0}
+        self.counters[key] = counters
+
+        def on_connect(dbapi_connection, connection_record):
+            counters["connects"] += 1
+
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            counters["checkouts"] += 1
+
+        def on_checkin(dbapi_connection, connection_record):
+            counters["checkins"] += 1
+
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            counters["invalidations"] += 1
+
+        # one per statement (or executemany batch) sent : the database round trips of the per-stage metrics
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            counters["executes"] += 1
+
+        event.listen(engine, "connect", on_connect)
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "checkin", on_checkin)
+        event.listen(engine, "invalidate", on_invalidate)
+        event.listen(engine, "before_cursor_execute", on_execute)
+
+    def get_engine(self, db_config: dict):
+        key = self.build_key(db_config)
+
+        with self.lock:
+            engine = self.engines.get(key)
+            if engine is None:
+                pool_config = dict(key[-1])
+                engine = create_engine(
+                    self.build_url(db_config),
+                    echo=False,  # set to True for SQL debug
+                    future=True,
+                    # needed by the LOAD DATA LOCAL INFILE staging mode of MySQLLoader
+                    connect_args={"local_infile": True} if db_config.get("local_infile") else {},
+                    **pool_config
+                )
+                event.listen(engine, "do_connect", clear_found_rows)
+                self.track_pool(key, engine)
+                self.engines[key] = engine
+                logging.info(f"Engine created for {engine.url.render_as_string(hide_password=True)} - {pool_config}")
+
+        return engine
+
+    def pool_metrics(self) -> list:
+        metrics = []
+        with self.lock:
+            for key, engine in self.engines.items():
+                pool = engine.pool
+                metrics.append({
+                    "url"           : engine.url.render_as_string(hide_password=True),
+                    "pool_size"     : pool.size(),
+                    "checked_in"    : pool.checkedin(),
+                    "checked_out"   : pool.checkedout(),
+                    "overflow"      : pool.overflow(),
+                    **self.counters[key]
+                })
+
+        return metrics
+
+    def execute_count(self) -> int:
+        with self.lock:
+            return sum(counters["executes"] for counters in self.counters.values())
+
+    def log_pool_metrics(self):
+        for metrics in self.pool_metrics():
+            logging.info(f"REPORT : pool {metrics['url']} - {metrics['connects']} connection(s) opened, "
+                         f"{metrics['checkouts']} checkout(s), {metrics['invalidations']} invalidation(s), "
+                         f"{metrics['checked_out']} still checked out")
+
+    def dispose_all(self):
+        with self.lock:
+            for engine in self.engines.values():
+                engine.dispose()
+            self.engines.clear()
+            self.counters.clear()
+
+    def reset_after_fork(self):
+        # pooled connections belong to the parent process : drop them without closing them
+        self.lock = threading.Lock()
+        for engine in self.engines.values():
+            engine.dispose(close=False)
+        self.engines.clear()
+        self.counters.clear()
+
+registry = EngineRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry.reset_after_fork)
+
+def get_engine(db_config: dict):
+    return registry.get_engine(db_config)
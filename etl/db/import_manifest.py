@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+CREATE_FILES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS imported_files (
+    content_hash    TEXT PRIMARY KEY,
+    file_name       TEXT NOT NULL,
+    source          TEXT NOT NULL,
+    imported_at     REAL NOT NULL
+);
+"""
+
+# one row per account of each imported file. first_date is NULL for the last dates recorded by
+# the previous versions of the manifest (account_watermarks) : every earlier date is imported.
+CREATE_RANGES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS imported_ranges (
+    source          TEXT NOT NULL,
+    account_id      TEXT NOT NULL,
+    first_date      TEXT,
+    last_date       TEXT NOT NULL
+);
+"""
+
+MIGRATE_WATERMARKS_SQL = """
+INSERT INTO imported_ranges (source, account_id, first_date, last_date)
+SELECT source, account_id, NULL, last_date
+FROM account_watermarks;
+"""
+
+def file_hash(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def to_dates(values: pd.Series) -> pd.Series:
+    # day of each value (NaT when unreadable), time zones dropped. Text is a dd/mm/YYYY date of the broker exports.
+    dates = values if pd.api.types.is_datetime64_any_dtype(values) else pd.to_datetime(values, errors="coerce", format="%d/%m/%Y")
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    return dates.dt.normalize()
+
+def date_ranges(df: pd.DataFrame, account_column: str, date_column: str) -> dict:
+    # {account_id: (first date, last date) (ISO)} of the rows of a file
+    dates = to_dates(df[date_column])
+    valid = dates.notna() & df[account_column].notna()
+    if not valid.any():
+        return {}
+
+    ranges = dates[valid].groupby(df.loc[valid, account_column].astype(str)).agg(["min", "max"])
+    return {account_id: (first.date().isoformat(), last.date().isoformat()) for account_id, first, last in ranges.itertuples()}
+
+def merge_date_ranges(ranges: dict, other: dict) -> dict:
+    # date ranges of two parts (chunks) of the same file
+    merged = dict(ranges)
+    for account_id, (first, last) in other.items():
+        if account_id in merged:
+            first, last = min(first, merged[account_id][0]), max(last, merged[account_id][1])
+        merged[account_id] = (first, last)
+    return merged
+
+def trim_to_imported_ranges(df: pd.DataFrame, account_column: str, date_column: str, imported_ranges: dict) -> pd.DataFrame:
+    # drops the rows dated inside a date range already imported for their account : an older file
+    # imported after a newer one is kept. The first and last days of a range are kept, a file
+    # exported during that day may hold transactions the previous one had not.
+    # Rows without a readable date are kept.
+    if not imported_ranges or df.empty:
+        return df
+
+    dates = to_dates(df[date_column]).to_numpy(dtype="datetime64[ns]")
+    accounts = df[account_column].astype(str).to_numpy()
+    imported = np.zeros(len(df), dtype=bool)
+    for account_id, ranges in imported_ranges.items():
+        rows = accounts == account_id
+        if not rows.any():
+            continue
+        for first, last in ranges:
+            # NaT is never inside a range
+            inside = rows & (dates < np.datetime64(last, "ns"))
+            if first is not None:
+                inside &= dates > np.datetime64(first, "ns")
+            imported |= inside
+    return df[~imported]
+
+class ImportManifest:
+    # Local record (SQLite file) of the source files already loaded into the database :
+    # - the content hash of each file, identical files are not processed again
+    # - the dates loaded for each account (first and last date of each file), rows of overlapping
+    #   files dated inside these ranges are dropped
+    # Only files loaded without error are recorded.
+    def __init__(self, path: str):
+        self.path = path
+
+        with self.connect() as conn:
+            conn.execute(CREATE_FILES_TABLE_SQL)
+            conn.execute(CREATE_RANGES_TABLE_SQL)
+            # manifests written before the date ranges
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'account_watermarks'").fetchone():
+                conn.execute(MIGRATE_WATERMARKS_SQL)
+                conn.execute("DROP TABLE account_watermarks")
+
+    @contextmanager
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def contains(self, content_hash: str) -> bool:
+        with self.connect() as conn:
+            row = conn.execute("SELECT 1 FROM imported_files WHERE content_hash = ?", (content_hash,)).fetchone()
+        return row is not None
+
+    def imported_ranges(self, source: str) -> dict:
+        # {account_id: [(first date, last date)]}, first date is None for a range open to the past
+        with self.connect() as conn:
+            rows = conn.execute("SELECT DISTINCT account_id, first_date, last_date FROM imported_ranges WHERE source = ?", (source,)).fetchall()
+        ranges = {}
+        for account_id, first_date, last_date in rows:
+            ranges.setdefault(account_id, []).append((first_date, last_date))
+        return ranges
+
+    def record(self, content_hash: str, file_name: str, source: str, file_date_ranges: dict):
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO imported_files (content_hash, file_name, source, imported_at) VALUES (?, ?, ?, ?)",
+                (content_hash, file_name, source, time.time())
+            )
+            conn.executemany(
+                "INSERT INTO imported_ranges (source, account_id, first_date, last_date) VALUES (?, ?, ?, ?)",
+                [(source, account_id, first_date, last_date) for account_id, (first_date, last_date) in file_date_ranges.items()]
+            )
+        logging.info(f"Import manifest : {file_name} recorded")
@@ -0,0 +1,177 @@
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from db.engine_registry import registry
+from db.profiling import profiler
+
+# peak memory of the process, not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def peak_rss_bytes() -> int:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Stage:
+    # Metrics of one stage, the wrapped code fills rows_in / rows_out / bytes_read when it knows them
+    def __init__(self, name: str, labels: dict, rows_in: int = None, bytes_read: int = None):
+        self.name = name
+        self.labels = labels
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.bytes_read = bytes_read
+        self.status = "ok"
+        self.error = None
+
+    def fail(self, error):
+        self.status = "error"
+        self.error = str(error)
+
+class MetricsRecorder:
+    # Per-stage metrics of the process : one JSON line per stage, and at the end of a run (or of a
+    # --watch cycle) a summary in the logs and a Prometheus text-format file (node_exporter textfile collector).
+    # Stages run in worker processes are kept in memory and sent back to the main process (drain / add).
+    def __init__(self):
+        self.jsonl_path = None
+        self.prometheus_path = None
+        self.lock = threading.Lock()
+        self.start_run()
+
+    def configure(self, jsonl_path: str = None, prometheus_path: str = None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.start_run()
+
+    def start_run(self):
+        self.run_id = datetime.datetime.now().strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+        self.started_at = time.monotonic()
+        self.records = []
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int = None, bytes_read: int = None, **labels):
+        stage = Stage(name, labels, rows_in, bytes_read)
+        round_trips = registry.execute_count()
+        start = time.perf_counter()
+        try:
+            # stages selected by the profiling mode run under the profilers
+            with profiler.capture(name):
+                yield stage
+        except Exception as e:
+            stage.fail(e)
+            raise
+        finally:
+            self.add([{
+                "time"              : datetime.datetime.now().isoformat(timespec="milliseconds"),
+                "stage"             : stage.name,
+                "labels"            : stage.labels,
+                "status"            : stage.status,
+                "error"             : stage.error,
+                "seconds"           : round(time.perf_counter() - start, 6),
+                "rows_in"           : stage.rows_in,
+                "rows_out"          : stage.rows_out,
+                "bytes_read"        : stage.bytes_read,
+                "db_round_trips"    : registry.execute_count() - round_trips,
+                "peak_rss_bytes"    : peak_rss_bytes(),
+                "pid"               : os.getpid()
+            }])
+
+    def add(self, records: list):
+        with self.lock:
+            for record in records:
+                record["run_id"] = self.run_id
+                self.records.append(record)
+            if self.jsonl_path and records:
+                with open(self.jsonl_path, "a", encoding="utf-8") as file:
+                    file.writelines(json.dumps(record, default=str) + "\n" for record in records)
+
+    def drain(self) -> list:
+        # records of a worker process, handed over to the main process with the transformed data
+        with self.lock:
+            records, self.records = self.records, []
+        return records
+
+    def count(self, name: str, value: int, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summarize(self) -> dict:
+        # {stage: totals of its records}
+        summary = {}
+        for record in self.records:
+            totals = summary.setdefault(record["stage"], {"runs": 0, "errors": 0, "seconds": 0, "rows_in": 0, "rows_out": 0, "bytes_read": 0, "db_round_trips": 0})
+            totals["runs"] += 1
+            totals["errors"] += record["status"] != "ok"
+            for metric in ("seconds", "rows_in", "rows_out", "bytes_read", "db_round_trips"):
+                totals[metric] += record[metric] or 0
+        return summary
+
+    def log_summary(self, summary: dict):
+        peak = peak_rss_bytes()
+        logging.info(f"REPORT : run {self.run_id} - {time.monotonic() - self.started_at:.1f}s"
+                     + (f" - peak memory {peak / 2**20:.0f} MB" if peak else ""))
+        for (name, labels), value in sorted(self.counters.items()):
+            logging.info(f"REPORT : {name}{''.join(f' {label}={label_value}' for label, label_value in labels)} : {value}")
+        # slowest stages first : the hot spots of the run
+        for name, totals in sorted(summary.items(), key=lambda item: item[1]["seconds"], reverse=True):
+            logging.info(f"REPORT : {name} - {totals['seconds']:.2f}s in {totals['runs']} run(s), {totals['errors']} error(s) - "
+                         f"{totals['rows_in']} row(s) in, {totals['rows_out']} out - {totals['bytes_read']} byte(s) read - "
+                         f"{totals['db_round_trips']} DB round trip(s)")
+
+    def write_prometheus(self, summary: dict):
+        lines = []
+        def metric(name: str, kind: str, help_text: str, samples: list):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{label}="{escape_label(label_value)}"' for label, label_value in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        stages = sorted(summary.items())
+        metric("etl_stage_seconds", "gauge", "Time spent in the stage during the last run", [((("stage", name),), round(totals["seconds"], 6)) for name, totals in stages])
+        for total, help_text in (("runs", "Runs of the stage"), ("errors", "Runs of the stage in error"), ("rows_in", "Rows received by the stage"),
+                                 ("rows_out", "Rows produced or written by the stage"), ("bytes_read", "Bytes read from the source files"),
+                                 ("db_round_trips", "Statements sent to the database")):
+            metric(f"etl_stage_{total}", "gauge", f"{help_text} during the last run", [((("stage", name),), totals[total]) for name, totals in stages])
+        for name in sorted({name for name, _ in self.counters}):
+            metric(f"etl_{name}", "gauge", f"{name.replace('_', ' ').capitalize()} during the last run",
+                   [(labels, value) for (counter, labels), value in sorted(self.counters.items()) if counter == name])
+        metric("etl_run_seconds", "gauge", "Duration of the last run", [((), round(time.monotonic() - self.started_at, 3))])
+        peak = peak_rss_bytes()
+        if peak:
+            metric("etl_peak_rss_bytes", "gauge", "Peak resident memory of the process", [((), peak)])
+        metric("etl_last_run_timestamp_seconds", "gauge", "End of the last run", [((), round(time.time()))])
+
+        # written next to its final name then renamed : the collector never reads a partial file
+        tmp_path = f"{self.prometheus_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="\n") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prometheus_path)
+
+    def finish_run(self):
+        # summary of the stages since the start of the run, then a new run begins
+        with self.lock:
+            summary = self.summarize()
+            self.log_summary(summary)
+            if self.prometheus_path:
+                try:
+                    self.write_prometheus(summary)
+                except OSError as e:
+                    logging.error(f"ERROR : Unable to write metrics to {self.prometheus_path} - {e}")
+            self.start_run()
+
+metrics = MetricsRecorder()
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+SERIES_COLUMNS = {
+    "date"          : "datetime64[D]",
+    "open_price"    : "float64",
+    "close_price"   : "float64",
+    "high"          : "float64",
+    "low"           : "float64",
+    "volume"        : "int64"
+}
+
+class PriceStore:
+    # Local copy of the downloaded price history : one directory per ISIN holding one .npy file
+    # per column (sorted by date) and a meta.json with the ticker and the date ranges already
+    # fetched ([start, end) pairs, end excluded). Reads are memory-mapped, no copy is made.
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self.lock = threading.Lock()
+        os.makedirs(root_dir, exist_ok=True)
+
+    def series_dir(self, isin: str) -> str:
+        return os.path.join(self.root_dir, isin)
+
+    def read_meta(self, isin: str) -> dict:
+        path = os.path.join(self.series_dir(isin), "meta.json")
+        if not os.path.exists(path):
+            return {"ticker": None, "covered": []}
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def covered_ranges(self, isin: str, ticker: str = None) -> list:
+        meta = self.read_meta(isin)
+        # a new ticker for the same ISIN is another series : nothing is covered yet
+        if ticker is not None and meta["ticker"] not in (None, ticker):
+            return []
+        return [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in meta["covered"]]
+
+    def missing_ranges(self, isin: str, ticker: str, start, end) -> list:
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        missing = []
+        for covered_start, covered_end in self.covered_ranges(isin, ticker):
+            if covered_end <= start or covered_start >= end:
+                continue
+            if covered_start > start:
+                missing.append((start, covered_start))
+            start = max(start, covered_end)
+        if start < end:
+            missing.append((start, end))
+        return missing
+
+    def read(self, isin: str, start = None, end = None) -> dict:
+        # {column: read-only memory-mapped array}, rows with start <= date < end
+        directory = self.series_dir(isin) if isin else None
+        if directory is None or not os.path.exists(os.path.join(directory, "date.npy")):
+            return {column: np.empty(0, dtype=dtype) for column, dtype in SERIES_COLUMNS.items()}
+
+        series = {column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r") for column in SERIES_COLUMNS}
+        dates = series["date"]
+        first = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start), "D"), side="left")
+        last = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end), "D"), side="left")
+        return {column: values[first:last] for column, values in series.items()}
+
+    def read_frame(self, isin: str, start = None, end = None) -> pd.DataFrame:
+        prices = pd.DataFrame(self.read(isin, start, end))
+        prices["date"] = prices["date"].astype("datetime64[ns]")
+        prices.insert(0, "isin", isin)
+        return prices
+
+    def write(self, isin: str, ticker: str, prices: pd.DataFrame, start, end):
+        # prices : rows downloaded for [start, end), which becomes a covered range
+        start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+
+        with self.lock:
+            meta = self.read_meta(isin)
+            if meta["ticker"] not in (None, ticker):
+                logging.info(f"Ticker changed for isin={isin} ({meta['ticker']} -> {ticker}) : price store series reset")
+                meta = {"ticker": ticker, "covered": []}
+                current = self.read_frame(None)
+            else:
+                current = self.read_frame(isin)
+
+            new = prices[list(SERIES_COLUMNS)].copy()
+            new["date"] = pd.to_datetime(new["date"]).dt.normalize()
+            new["volume"] = new["volume"].fillna(0)
+            # pandas has no day resolution : dates are converted back to datetime64[D] when saved
+            new = new.astype({column: dtype for column, dtype in SERIES_COLUMNS.items() if column != "date"})
+
+            # downloaded rows replace the stored ones of the same date
+            merged = pd.concat([current.drop(columns="isin"), new], ignore_index=True)
+            merged = merged.drop_duplicates(subset="date", keep="last").sort_values("date")
+
+            directory = self.series_dir(isin)
+            os.makedirs(directory, exist_ok=True)
+            for column, dtype in SERIES_COLUMNS.items():
+                self.save_array(os.path.join(directory, f"{column}.npy"), merged[column].to_numpy().astype(dtype))
+
+            meta["ticker"] = ticker
+            covered = self.covered_ranges(isin, ticker)
+            if start < end:
+                covered.append((start, end))
+            meta["covered"] = self.merge_ranges(covered)
+            self.save_meta(isin, meta)
+
+    def merge_ranges(self, ranges: list) -> list:
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [[start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")] for start, end in merged]
+
+    def save_array(self, path: str, values: np.ndarray):
+        # written aside then renamed : memory-mapped readers keep the previous file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.save(file, values)
+        os.replace(tmp_path, path)
+
+    def save_meta(self, isin: str, meta: dict):
+        path = os.path.join(self.series_dir(isin), "meta.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(f"{path}.tmp", path)
@@ -0,0 +1,112 @@
+import cProfile
+import collections
+import fnmatch
+import logging
+import os
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+class StackSampler(threading.Thread):
+    # Samples the stack of one thread every interval seconds. The samples are written as folded
+    # stacks ("caller;callee count" lines) read by flamegraph.pl, speedscope or inferno.
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+class StageProfiler:
+    # Profiling mode of the per-stage metrics : the stages whose name matches one of the patterns
+    # are run under cProfile (.prof, for pstats / snakeviz) and a stack sampler (.folded), and
+    # optionally tracemalloc (.memory.folded : bytes still allocated at the end of the stage).
+    # Off by default : a stage then only pays for one test.
+    def __init__(self):
+        self.configure()
+
+    def configure(self, patterns: list = None, directory: str = None, memory: bool = False, interval: float = 0.005):
+        self.patterns = [pattern for pattern in patterns or [] if pattern]
+        self.directory = directory
+        self.memory = memory
+        self.interval = interval
+        # one profiled stage at a time : nested stages are part of the profile of the outer one
+        self.active = False
+        self.counter = 0
+        if self.patterns and not self.directory:
+            logging.error("Profiling needs a directory for its files")
+            raise ValueError("Profiling needs a directory for its files")
+
+    def settings(self) -> tuple:
+        # arguments of configure, for the worker processes
+        return self.patterns, self.directory, self.memory, self.interval
+
+    def capture(self, name: str):
+        if not self.patterns or self.active or not any(fnmatch.fnmatch(name, pattern) for pattern in self.patterns):
+            return nullcontext()
+        return self.profile(name)
+
+    @contextmanager
+    def profile(self, name: str):
+        self.active = True
+        self.counter += 1
+        os.makedirs(self.directory, exist_ok=True)
+        base_path = os.path.join(self.directory, f"{name}.{os.getpid()}.{self.counter}")
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        profile = cProfile.Profile()
+        if self.memory:
+            tracemalloc.start(25)
+        sampler.start()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            sampler.stop()
+            snapshot = None
+            if self.memory:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            self.active = False
+
+            try:
+                profile.dump_stats(f"{base_path}.prof")
+                self.write_folded(f"{base_path}.folded", sampler.stacks.items())
+                if snapshot is not None:
+                    self.write_folded(f"{base_path}.memory.folded", self.memory_stacks(snapshot))
+                    logging.info(f"Profile of {name} : peak of {peak / 2**20:.1f} MB traced")
+                logging.info(f"Profile of {name} written to {base_path}.*")
+            except OSError as e:
+                logging.error(f"ERROR : Unable to write profile of {name} - {e}")
+
+    def memory_stacks(self, snapshot) -> list:
+        # (folded stack, bytes) of the allocations made during the stage and still alive at its end
+        stacks = []
+        for statistic in snapshot.statistics("traceback"):
+            frames = [f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in statistic.traceback]
+            stacks.append((";".join(frames), statistic.size))
+        return stacks
+
+    def write_folded(self, path: str, stacks):
+        with open(path, "w", encoding="utf-8", newline="\n") as file:
+            file.writelines(f"{stack} {count}\n" for stack, count in stacks)
+
+profiler = StageProfiler()
@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CREATE_CACHE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS securities_info (
+    ticker      TEXT PRIMARY KEY,
+    type        TEXT,
+    market      TEXT,
+    is_found    INTEGER NOT NULL,
+    fetched_at  REAL NOT NULL
+);
+"""
+
+class SecuritiesInfoCache:
+    # Persistent cache of the securities metadata lookups (SQLite file).
+    # Tickers without data are cached too (negative entries), with a shorter TTL.
+    def __init__(self, path: str, ttl: float = 30 * 24 * 3600, negative_ttl: float = 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+
+        with self.connect() as conn:
+            conn.execute(CREATE_CACHE_TABLE_SQL)
+
+    @contextmanager
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, tickers: list) -> dict:
+        # {ticker: {"type", "market"} or None for a known bad ticker}, expired entries are left out
+        if not tickers:
+            return {}
+
+        now = time.time()
+        entries = {}
+        with self.lock, self.connect() as conn:
+            for start in range(0, len(tickers), 500):
+                batch = tickers[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT ticker, type, market, is_found, fetched_at FROM securities_info WHERE ticker IN ({', '.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+
+                for ticker, type, market, is_found, fetched_at in rows:
+                    if now - fetched_at > (self.ttl if is_found else self.negative_ttl):
+                        continue
+                    entries[ticker] = {"type": type, "market": market} if is_found else None
+
+        return entries
+
+    def put_many(self, entries: dict):
+        # entries : {ticker: {"type", "market"} or None when the ticker has no data}
+        if not entries:
+            return
+
+        now = time.time()
+        rows = [
+            (ticker, info["type"], info["market"], 1, now) if info is not None else (ticker, None, None, 0, now)
+            for ticker, info in entries.items()
+        ]
+        with self.lock, self.connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO securities_info (ticker, type, market, is_found, fetched_at) VALUES (?, ?, ?, ?, ?)", rows)
@@ -1,30 +1,62 @@
-import linecache
 import logging
 import pandas as pd
 import re
+from db.dtypes import apply_schema, read_csv_dtypes, CSV_SECURITY_OPERATIONS, ID
+
+# lines before the column names of a broker export, the account id is on the third one
+HEADER_LINES = 4
 
 class CsvSecuritiesExtractor:
-    def __init__(self, file_path: str, sep=";", encoding="utf-8"):
+    def __init__(self, file_path: str, sep=";", encoding="utf-8", chunk_size: int = 100000):
         self.file_path = file_path
         self.sep = sep
         self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.account_id = None
         
-    def extract_account_id(self):
-        account_id = None
-        tmp_account_id = linecache.getline(self.file_path,3).strip()
-        match = re.search(r"\d{11}", tmp_account_id)
-        if match:
-            account_id = match.group()
-        else:
+    def read_header(self, file):
+        # header lines read once from the open file, the operations follow them
+        header = [file.readline() for _ in range(HEADER_LINES)]
+        if self.account_id is None:
+            self.account_id = self.parse_account_id(header[2])
+        
+    def parse_account_id(self, line: str):
+        match = re.search(r"\d{11}", line.strip())
+        if match is None:
             logging.error("ERROR : No account_id found")
             raise ValueError("No account_id found in file")
         
-        return account_id
+        return match.group()
+        
+    def extract_account_id(self):
+        if self.account_id is None:
+            with open(self.file_path, "r", encoding=self.encoding) as file:
+                self.read_header(file)
+        
+        return self.account_id
+        
+    def read_operations(self, file, chunk_size: int = None):
+        return pd.read_csv(file, sep=self.sep, usecols=lambda col: not col.startswith("Unnamed"),
+                           dtype=read_csv_dtypes(CSV_SECURITY_OPERATIONS), chunksize=chunk_size)
+        
+    def add_account_id(self, df: pd.DataFrame) -> pd.DataFrame:
+        df["account_id"] = pd.Series(int(self.account_id), index=df.index, dtype=ID)
+        return apply_schema(df, CSV_SECURITY_OPERATIONS)
 
     def extract_securities(self):
-        df = pd.read_csv(self.file_path, sep=self.sep, encoding=self.encoding, skiprows=4, usecols=lambda col: not col.startswith("Unnamed"))
-        
-        df["account_id"] = self.extract_account_id()
+        with open(self.file_path, "r", encoding=self.encoding, newline="") as file:
+            self.read_header(file)
+            df = self.add_account_id(self.read_operations(file))
         
         logging.info(f"CSV file loaded: {self.file_path}")
         return df
+        
+    def iter_chunks(self):
+        # bounded memory : one DataFrame of chunk_size operations at a time, the file is read once
+        with open(self.file_path, "r", encoding=self.encoding, newline="") as file:
+            self.read_header(file)
+            with self.read_operations(file, self.chunk_size) as reader:
+                for chunk in reader:
+                    yield self.add_account_id(chunk)
+        
+        logging.info(f"CSV file loaded: {self.file_path}")
@@ -1,5 +1,6 @@
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import text
+from db.engine_registry import get_engine
 import logging
 
 class MySQLExtractor:
@@ -9,13 +10,11 @@ class MySQLExtractor:
         self.host = db_config["host"]
         self.port = db_config["port"]
         self.database = db_config["database"]
-        self.engine = create_engine(
-            f"mysql+pymysql://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
-        )
+        self.engine = get_engine(db_config)
 
-    def extract_query(self, query: str):
+    def extract_query(self, query: str, params: dict = None):
         try:
-            df = pd.read_sql(query, self.engine)
+            df = pd.read_sql(text(query) if params else query, self.engine, params=params)
             return df
         except Exception as e:
             logging.error(f"Failed to execute query - {e}")
@@ -27,6 +26,75 @@ class MySQLExtractor:
         
         return payees["payee"].to_list()
 
+    def get_payment_method_patterns(self) -> list:
+        query = "SELECT transaction_memo_pattern, payment_method_id FROM payment_methods_transaction_link ORDER BY id;"
+        patterns = self.extract_query(query)
+        
+        return list(patterns.itertuples(index=False, name=None))
+
+    def get_transactions_memos(self, after_id: int, limit: int) -> pd.DataFrame:
+        # keyset pagination on the primary key : each chunk is an index range scan
+        query = """
+        SELECT id, memo, payment_method_id
+        FROM transactions
+        WHERE id > :after_id
+        ORDER BY id
+        LIMIT :limit;
+        """
+        return self.extract_query(query, {"after_id": after_id, "limit": limit})
+
+    def get_categories(self) -> pd.DataFrame:
+        query = "SELECT id, name, parent_id FROM categories;"
+        return self.extract_query(query)
+
+    def get_categories_links(self) -> pd.DataFrame:
+        query = "SELECT id, payee, is_expense, category_id FROM categories_transaction_link;"
+        return self.extract_query(query)
+
+    def get_payment_methods(self) -> pd.DataFrame:
+        query = "SELECT id, name FROM payment_methods;"
+        return self.extract_query(query)
+
+    def get_category_map_snapshot(self) -> pd.DataFrame:
+        query = "SELECT entry, entry_key, is_expense, category_id, parent_category_id FROM category_map_snapshot;"
+        return self.extract_query(query)
+
+    def get_transactions_categories(self, after_id: int, limit: int) -> pd.DataFrame:
+        # keyset pagination on the primary key, as get_transactions_memos
+        query = """
+        SELECT id, clean_payee, is_expense, payment_method_id, user_tag_category_id, category_id, parent_category_id
+        FROM transactions
+        WHERE id > :after_id
+        ORDER BY id
+        LIMIT :limit;
+        """
+        return self.extract_query(query, {"after_id": after_id, "limit": limit})
+
+    def get_transactions_to_reclassify(self, payees: list, withdrawal_payment_method_ids: list, withdrawal_category_id) -> pd.DataFrame:
+        # transactions whose category may change : not resolved yet, tagged by the user, of a
+        # changed payee, or whose withdrawal payment method disagrees with the category
+        columns = "id, clean_payee, is_expense, payment_method_id, user_tag_category_id, category_id, parent_category_id"
+        is_withdrawal = "FALSE"
+        params = {"withdrawal_category_id": withdrawal_category_id}
+        if withdrawal_payment_method_ids:
+            is_withdrawal = f"COALESCE(payment_method_id IN ({', '.join(f':payment_method_{i}' for i in range(len(withdrawal_payment_method_ids)))}), FALSE)"
+            params.update({f"payment_method_{i}": id for i, id in enumerate(withdrawal_payment_method_ids)})
+        query = f"""
+        SELECT {columns}
+        FROM transactions
+        WHERE category_id IS NULL
+            OR user_tag_category_id IS NOT NULL
+            OR {is_withdrawal} <> (category_id <=> :withdrawal_category_id);
+        """
+        transactions = [self.extract_query(query, params)]
+
+        for start in range(0, len(payees), 500):
+            batch = payees[start:start + 500]
+            query = f"SELECT {columns} FROM transactions WHERE clean_payee IN ({', '.join(f':payee_{i}' for i in range(len(batch)))});"
+            transactions.append(self.extract_query(query, {f"payee_{i}": payee for i, payee in enumerate(batch)}))
+
+        return pd.concat(transactions, ignore_index=True).drop_duplicates("id").reset_index(drop=True)
+
     def get_securities_to_update(self):
         query = "SELECT ticker FROM securities WHERE ticker <> 'Undefined' AND (type = 'Undefined' OR market IS NULL)"
         tickers = self.extract_query(query)
@@ -81,3 +149,85 @@ class MySQLExtractor:
         WHERE isd.end_import_date > COALESCE(lid.last_import_date, DATE('1900-01-01')) AND isd.ticker IS NOT NULL;
         """
         return self.extract_query(query)
+    
+    def get_last_balances(self) -> pd.DataFrame:
+        query = """
+        SELECT account_id, date, value
+        FROM (
+            SELECT  account_id,
+                    date,
+                    value,
+                    ROW_NUMBER() OVER (PARTITION BY account_id ORDER BY date DESC) AS row_id
+            FROM balances
+        ) b
+        WHERE row_id = 1;
+        """
+        return self.extract_query(query)
+    
+    def get_monthly_cash_flows(self) -> pd.DataFrame:
+        query = """
+        SELECT  account_id,
+                LAST_DAY(date) AS month_last_day,
+                SUM(CASE WHEN is_expense THEN -amount ELSE amount END) AS cash_flow
+        FROM transactions
+        GROUP BY account_id, LAST_DAY(date);
+        """
+        return self.extract_query(query)
+    
+    def get_min_transaction_date(self):
+        query = "SELECT MIN(date) AS min_date FROM transactions;"
+        return self.extract_query(query)["min_date"].iloc[0]
+    
+    def get_monthly_stock_values(self) -> pd.DataFrame:
+        query = """
+        WITH last_stock_market_days AS (
+            SELECT  LAST_DAY(date) AS month_last_day,
+                    MAX(date) AS month_last_stock_market_day
+            FROM security_prices
+            GROUP BY LAST_DAY(date)
+        )
+        SELECT  p.account_id,
+                lsmd.month_last_day,
+                SUM(p.capital_value) AS value
+        FROM securities_wallet_evolution_materialized p
+        INNER JOIN last_stock_market_days lsmd ON p.date = lsmd.month_last_stock_market_day
+        GROUP BY p.account_id, lsmd.month_last_day;
+        """
+        return self.extract_query(query)
+    
+    def get_balance_history(self) -> pd.DataFrame:
+        query = "SELECT account_id, month_last_day, source, value FROM balance_history_monthly;"
+        return self.extract_query(query)
+    
+    def get_loans(self) -> pd.DataFrame:
+        query = "SELECT id, amount, flat_rate_value, subscription_date, first_installment_date, total_month_duration FROM loan;"
+        return self.extract_query(query)
+    
+    def get_loan_early_payments(self) -> pd.DataFrame:
+        query = "SELECT loan_id, date, amount FROM loan_early_payments;"
+        return self.extract_query(query)
+    
+    def get_loan_amortization_state(self) -> pd.DataFrame:
+        query = "SELECT loan_id, fingerprint FROM loan_amortization_state;"
+        return self.extract_query(query)
+    
+    def get_planned_transactions(self) -> pd.DataFrame:
+        query = "SELECT id, is_expense, amount, start_date, end_date, frequency, payee FROM planned_transactions;"
+        return self.extract_query(query)
+    
+    def get_planned_transactions_candidates(self) -> pd.DataFrame:
+        # transactions of the planned payees only (idx_transactions_clean_payee)
+        query = """
+        SELECT t.id, t.date, t.amount, t.is_expense, t.clean_payee
+        FROM transactions t
+        WHERE t.clean_payee IN (SELECT payee FROM planned_transactions);
+        """
+        return self.extract_query(query)
+    
+    def get_planned_transactions_status(self) -> pd.DataFrame:
+        query = """
+        SELECT  planned_transaction_id, is_expense, due_amount, paid_amount, total_due_amount, total_paid_amount,
+                payee, due_month_last_day, paid_month_last_day, status
+        FROM planned_transactions_status;
+        """
+        return self.extract_query(query)
@@ -1,10 +1,11 @@
 import logging
-from ofxparse import OfxParser
 import pandas as pd
 from pathlib import Path
+from extract.ofx_stream_parser import OfxStreamParser, ACCOUNT_COLUMNS, TRANSACTION_COLUMNS
+from db.dtypes import apply_schema, OFX_ACCOUNTS, OFX_TRANSACTIONS
 
 class OfxExtractor:
-    def __init__(self, file_path : str):
+    def __init__(self, file_path : str, streaming: bool = False, chunk_size: int = 10000):
         
         self.file_path = Path(file_path)
         
@@ -18,32 +19,47 @@ class OfxExtractor:
         
         self.file_directory = self.file_path.parent
         self.file_name = self.file_path.name 
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        self.ofx = None
+        
+    def parse(self):
+        # the file is parsed only once for accounts and transactions
+        if self.ofx is None:
+            from ofxparse import OfxParser
+            
+            with open(self.file_path, 'r', encoding='utf-8') as file:
+                self.ofx = OfxParser.parse(file)
+        
+        return self.ofx
         
     def extract_transactions(self) -> pd.DataFrame:
-        with open(self.file_path, 'r', encoding='utf-8') as file:
-            ofx = OfxParser.parse(file)
+        ofx = self.parse()
             
-        data = []
+        # one list per column : no dict per transaction
+        data = {column: [] for column in TRANSACTION_COLUMNS}
         for account in ofx.accounts:
-            for transaction in account.statement.transactions:
-                data.append({
-                    "routing_number"    : account.routing_number,
-                    "account_id"        : account.account_id,
-                    "account_type"      : account.account_type,
-                    "currency"          : account.curdef,
-                    "balance"           : account.statement.balance,
-                    "date"              : transaction.date,
-                    "payee"             : transaction.payee,
-                    "memo"              : transaction.memo,
-                    "amount"            : transaction.amount,
-                    "transaction_id"    : transaction.id
-                })
+            transactions = account.statement.transactions
+            account_values = {
+                "routing_number"    : account.routing_number,
+                "account_id"        : account.account_id,
+                "account_type"      : account.account_type,
+                "currency"          : account.curdef,
+                "balance"           : account.statement.balance
+            }
+            for column, value in account_values.items():
+                data[column].extend([value] * len(transactions))
+            for transaction in transactions:
+                data["date"].append(transaction.date)
+                data["payee"].append(transaction.payee)
+                data["memo"].append(transaction.memo)
+                data["amount"].append(transaction.amount)
+                data["transaction_id"].append(transaction.id)
                 
-        return pd.DataFrame(data)
+        return apply_schema(pd.DataFrame(data, columns=TRANSACTION_COLUMNS), OFX_TRANSACTIONS)
     
     def extract_accounts(self) -> pd.DataFrame:
-        with open(self.file_path, 'r', encoding='utf-8') as file:
-            ofx = OfxParser.parse(file)
+        ofx = self.parse()
             
         data = []
         for account in ofx.accounts:
@@ -56,9 +72,46 @@ class OfxExtractor:
                 "date"              : ofx.signon.dtserver
             })
                 
-        return pd.DataFrame(data)
+        return apply_schema(pd.DataFrame(data, columns=ACCOUNT_COLUMNS), OFX_ACCOUNTS)
+    
+    def iter_chunks(self):
+        # bounded memory : one {"accounts", "transactions"} dict of DataFrames per chunk of transactions.
+        # Accounts of a chunk are the statements closed in it (with their balance) plus the accounts
+        # of its transactions (balance unknown yet)
+        for chunk in OfxStreamParser(self.file_path, chunk_size=self.chunk_size):
+            transactions = pd.DataFrame(chunk["transactions"], columns=TRANSACTION_COLUMNS)
+            
+            open_accounts = transactions[["routing_number", "account_id", "account_type", "currency"]].drop_duplicates()
+            open_accounts = open_accounts.assign(balance=None, date=None)
+            accounts = pd.concat([pd.DataFrame(chunk["accounts"], columns=ACCOUNT_COLUMNS), open_accounts], ignore_index=True)
+            
+            yield {
+                "accounts"      : apply_schema(accounts, OFX_ACCOUNTS),
+                "transactions"  : apply_schema(transactions, OFX_TRANSACTIONS)
+            }
+    
+    def extract_all_streaming(self) -> dict:
+        accounts = {column: [] for column in ACCOUNT_COLUMNS}
+        transactions = {column: [] for column in TRANSACTION_COLUMNS}
+        for chunk in OfxStreamParser(self.file_path, chunk_size=self.chunk_size):
+            for column in ACCOUNT_COLUMNS:
+                accounts[column].extend(chunk["accounts"][column])
+            for column in TRANSACTION_COLUMNS:
+                transactions[column].extend(chunk["transactions"][column])
+        
+        # the ledger balance is only known once the statement is closed
+        balances = dict(zip(accounts["account_id"], accounts["balance"]))
+        transactions["balance"] = [balances.get(account_id) for account_id in transactions["account_id"]]
+        
+        return {
+            "accounts"      : apply_schema(pd.DataFrame(accounts, columns=ACCOUNT_COLUMNS), OFX_ACCOUNTS),
+            "transactions"  : apply_schema(pd.DataFrame(transactions, columns=TRANSACTION_COLUMNS), OFX_TRANSACTIONS)
+        }
     
     def extract_all(self) -> dict:
+        if self.streaming:
+            return self.extract_all_streaming()
+        
         data = {
             "accounts"      : self.extract_accounts(),
             "transactions"  : self.extract_transactions()
@@ -0,0 +1,181 @@
+import datetime
+import decimal
+import html
+import re
+
+TAG_PATTERN = re.compile(r"(</?[a-z0-9_\.]+>)", re.IGNORECASE)
+
+STATEMENT_TAGS = ("STMTRS", "CCSTMTRS")
+
+ACCOUNT_FIELDS = {
+    "BANKID"    : "routing_number",
+    "ACCTID"    : "account_id",
+    "ACCTTYPE"  : "account_type",
+    "CURDEF"    : "currency"
+}
+
+TRANSACTION_FIELDS = {
+    "DTPOSTED"  : "date",
+    "NAME"      : "payee",
+    "MEMO"      : "memo",
+    "TRNAMT"    : "amount",
+    "FITID"     : "transaction_id"
+}
+
+ACCOUNT_COLUMNS = ["routing_number", "account_id", "account_type", "currency", "balance", "date"]
+TRANSACTION_COLUMNS = ["routing_number", "account_id", "account_type", "currency", "balance", "date", "payee", "memo", "amount", "transaction_id"]
+
+def parse_ofx_datetime(value: str):
+    # same rules as OfxParser.parseOfxDateTime
+    res = re.search(r"\[(?P<tz>[-+]?\d+\.?\d*)\:\w*\]$", value)
+    tz = float(res.group("tz")) if res else 0
+    time_zone_offset = datetime.timedelta(hours=tz)
+
+    res = re.search(r"^[0-9]*\.([0-9]{0,5})", value)
+    msec = datetime.timedelta(seconds=float("0." + res.group(1))) if res else datetime.timedelta(seconds=0)
+
+    try:
+        local_date = datetime.datetime.strptime(value[:14], "%Y%m%d%H%M%S")
+    except ValueError:
+        if value[:8] == "00000000":
+            return None
+        local_date = datetime.datetime.strptime(value[:8], "%Y%m%d")
+
+    return local_date - time_zone_offset + msec
+
+def to_decimal(value: str) -> decimal.Decimal:
+    # same rules as OfxParser.toDecimal
+    if re.search(r".*\..*,", value):
+        value = value.replace(".", "")
+    if re.search(r".*,.*\.", value):
+        value = value.replace(",", "")
+    if "." not in value and "," in value:
+        value = value.replace(",", ".")
+    value = value.replace(" ", "").replace("+", "")
+
+    try:
+        return decimal.Decimal(value)
+    except decimal.InvalidOperation:
+        # some banks use a null transaction for interest rate changes
+        if value in ("null", "-null"):
+            return 0
+        raise ValueError(f"Invalid transaction amount : '{value}'")
+
+class OfxStreamParser:
+    # Single pass tokenizer over an OFX file (SGML or XML flavour).
+    # Only the values used by OfxExtractor are kept : accounts are emitted when their statement
+    # is closed (the ledger balance comes after the transaction list), transactions are emitted
+    # as soon as chunk_size of them are buffered, with their balance left to None.
+    def __init__(self, file_path: str, chunk_size: int = 10000, block_size: int = 1 << 16, encoding: str = "utf-8"):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        self.encoding = encoding
+
+    def iter_tokens(self):
+        with open(self.file_path, "r", encoding=self.encoding) as file:
+            carry = ""
+            while True:
+                block = file.read(self.block_size)
+                if not block:
+                    break
+
+                data = carry + block
+                # everything after the last "<" (unfinished tag or text) waits for the next block
+                cut = max(data.rfind("<"), 0)
+                carry = data[cut:]
+
+                for token in TAG_PATTERN.split(data[:cut]):
+                    if token:
+                        yield token
+
+            for token in TAG_PATTERN.split(carry):
+                if token:
+                    yield token
+
+    def new_chunk(self) -> dict:
+        return {
+            "accounts"      : {column: [] for column in ACCOUNT_COLUMNS},
+            "transactions"  : {column: [] for column in TRANSACTION_COLUMNS}
+        }
+
+    def __iter__(self):
+        chunk = self.new_chunk()
+        transaction_count = 0
+
+        dtserver = None
+        in_sonrs = False
+        account = None
+        transaction = None
+        in_ledger_balance = False
+        balance = None
+        current_tag = None
+
+        for token in self.iter_tokens():
+            if token[0] == "<" and token[-1] == ">" and TAG_PATTERN.fullmatch(token):
+                is_closing_tag = token[1] == "/"
+                tag = token[2:-1].upper() if is_closing_tag else token[1:-1].upper()
+                current_tag = None if is_closing_tag else tag
+
+                if tag == "SONRS":
+                    in_sonrs = not is_closing_tag
+                elif tag in STATEMENT_TAGS:
+                    if not is_closing_tag:
+                        account = {"routing_number": "", "account_id": "", "account_type": "", "currency": None}
+                        balance = None
+                    elif account is not None:
+                        for column, value in account.items():
+                            chunk["accounts"][column].append(value)
+                        chunk["accounts"]["balance"].append(balance)
+                        chunk["accounts"]["date"].append(dtserver)
+                        account = None
+                elif tag == "STMTTRN" and account is not None:
+                    if not is_closing_tag:
+                        transaction = {"date": None, "payee": "", "memo": "", "amount": None, "transaction_id": ""}
+                        seen_fields = set()
+                    elif transaction is not None:
+                        for column, value in account.items():
+                            chunk["transactions"][column].append(value)
+                        chunk["transactions"]["balance"].append(None)
+                        for column, value in transaction.items():
+                            chunk["transactions"][column].append(value)
+                        transaction = None
+
+                        transaction_count += 1
+                        if transaction_count >= self.chunk_size:
+                            yield chunk
+                            chunk = self.new_chunk()
+                            transaction_count = 0
+                elif tag == "LEDGERBAL":
+                    in_ledger_balance = not is_closing_tag
+                continue
+
+            # text token : value of the last opened element
+            if current_tag is None:
+                continue
+            value = html.unescape(token).strip()
+            if value == "":
+                continue
+
+            if in_sonrs and current_tag == "DTSERVER" and dtserver is None:
+                dtserver = value
+            elif transaction is not None:
+                column = TRANSACTION_FIELDS.get(current_tag)
+                # first occurrence wins, as OfxParser's find()
+                if column is not None and column not in seen_fields:
+                    seen_fields.add(column)
+                    if column == "date":
+                        value = parse_ofx_datetime(value)
+                    elif column == "amount":
+                        value = to_decimal(value)
+                    transaction[column] = value
+            elif account is not None:
+                column = ACCOUNT_FIELDS.get(current_tag)
+                if column is not None and account[column] in ("", None):
+                    account[column] = value
+                elif in_ledger_balance and current_tag == "BALAMT" and balance is None:
+                    balance = to_decimal(value)
+            current_tag = None
+
+        if transaction_count or chunk["accounts"]["account_id"]:
+            yield chunk
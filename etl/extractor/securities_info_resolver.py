@@ -0,0 +1,60 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from extract.yfinance_downloader import RateLimiter
+from db.securities_info_cache import SecuritiesInfoCache
+
+INFO_COLUMNS = ["ticker", "type", "market"]
+# returned by fetch when the lookup itself failed (network, rate limit...) : unlike a ticker
+# without data, it is not cached and is looked up again on the next run
+FETCH_FAILED = object()
+
+def fetch_fast_info(ticker: str) -> dict:
+    import yfinance as yf
+
+    asset = yf.Ticker(ticker)
+    return {
+        "type": asset.fast_info.get("quoteType"),
+        "market": asset.fast_info.get("exchange")
+    }
+
+class SecuritiesInfoResolver:
+    # Looks up the type and market of many tickers : cached entries first (positive and negative),
+    # the others on a pool of max_workers threads, rate limited.
+    # info_fn(ticker) returns {"type", "market"}, fetch_fast_info (yfinance) by default.
+    def __init__(self, info_fn = None, cache: SecuritiesInfoCache = None, max_workers: int = 8, rate_limit: float = 4.0):
+        self.info_fn = info_fn or fetch_fast_info
+        self.cache = cache
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate_limit)
+
+    def fetch(self, ticker: str):
+        self.rate_limiter.wait()
+        try:
+            info = self.info_fn(ticker)
+        except Exception as e:
+            logging.error(f"Unable to get securities info for ticker={ticker} : {e}")
+            return FETCH_FAILED
+
+        # type is mandatory in securities : without it the ticker is a negative entry
+        if not info or not info.get("type"):
+            logging.error(f"No securities info found for ticker={ticker}")
+            return None
+        return {"type": info["type"], "market": info.get("market")}
+
+    def resolve(self, tickers: list) -> pd.DataFrame:
+        tickers = list(dict.fromkeys(tickers))
+        entries = self.cache.get_many(tickers) if self.cache is not None else {}
+        to_fetch = [ticker for ticker in tickers if ticker not in entries]
+        logging.info(f"Securities info : {len(entries)} ticker(s) found in cache - {len(to_fetch)} to look up")
+
+        if to_fetch:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                fetched = dict(zip(to_fetch, executor.map(self.fetch, to_fetch)))
+            fetched = {ticker: info for ticker, info in fetched.items() if info is not FETCH_FAILED}
+            if self.cache is not None:
+                self.cache.put_many(fetched)
+            entries.update(fetched)
+
+        data = [{"ticker": ticker, **entries[ticker]} for ticker in tickers if entries.get(ticker) is not None]
+        return pd.DataFrame(data, columns=INFO_COLUMNS)
@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+PRICE_COLUMNS = ["isin", "date", "open_price", "close_price", "high", "low", "volume"]
+
+YFINANCE_COLUMNS = {
+    "Date"      : "date",
+    "Open"      : "open_price",
+    "Close"     : "close_price",
+    "High"      : "high",
+    "Low"       : "low",
+    "Volume"    : "volume"
+}
+
+class RateLimiter:
+    # At most `rate` calls per `period` seconds, shared by every download thread
+    def __init__(self, rate: float, period: float = 1.0):
+        self.interval = period / rate if rate else 0
+        self.next_call = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_call - now
+            self.next_call = max(self.next_call, now) + self.interval
+
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+class YFinanceDownloader:
+    # Downloads the prices of many securities with few yf.download calls :
+    # - securities with compatible date windows (same end date, start dates less than
+    #   window_tolerance_days apart) are downloaded together, up to batch_size tickers per call
+    # - calls run on a pool of max_workers threads, rate limited and retried with exponential backoff
+    # - a group which still fails is downloaded again ticker by ticker
+    # download_fn has the signature of yf.download (tickers, start, end, ...).
+    def __init__(self, download_fn = None, max_workers: int = 4, batch_size: int = 50, rate_limit: float = 2.0,
+                 max_retries: int = 3, backoff: float = 1.0, window_tolerance_days: int = 7):
+        if download_fn is None:
+            import yfinance as yf
+            download_fn = yf.download
+
+        self.download_fn = download_fn
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.window_tolerance = pd.Timedelta(days=window_tolerance_days)
+        # (isin, ticker, start, end) of the securities the last download_prices call could not download,
+        # and among them the ones yfinance answered without any price (delisted, no trading day...)
+        self.failures = []
+        self.no_data = []
+
+    def group_windows(self, securities_df: pd.DataFrame) -> list:
+        # each group : {"start", "end", "securities": [(isin, ticker, start)]}
+        securities = securities_df[["isin", "ticker", "start_import_date", "end_import_date"]].copy()
+        securities["start_import_date"] = pd.to_datetime(securities["start_import_date"])
+        securities["end_import_date"] = pd.to_datetime(securities["end_import_date"])
+        securities = securities.sort_values(["end_import_date", "start_import_date"], kind="stable")
+
+        groups = []
+        group = None
+        for isin, ticker, start, end in securities.itertuples(index=False):
+            if (group is None
+                or end != group["end"]
+                or start - group["start"] > self.window_tolerance
+                or len(group["securities"]) >= self.batch_size
+                or ticker in group["tickers"]):
+                group = {"start": start, "end": end, "securities": [], "tickers": set()}
+                groups.append(group)
+
+            group["securities"].append((isin, ticker, start))
+            group["tickers"].add(ticker)
+
+        return groups
+
+    def call_download(self, tickers: list, start, end) -> pd.DataFrame:
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                return self.download_fn(
+                    tickers= tickers,
+                    start= start,
+                    end= end,
+                    progress= False,
+                    group_by="column",
+                    auto_adjust=True,
+                    threads=False
+                )
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logging.warning(f"Download failed for {tickers} ({e}) - retry in {delay:.1f}s")
+                time.sleep(delay)
+
+    def split_tickers(self, hist: pd.DataFrame, securities: list) -> tuple:
+        # (price frames, securities without any price in hist)
+        frames = []
+        missing = []
+        for isin, ticker, start in securities:
+            if isinstance(hist.columns, pd.MultiIndex):
+                if ticker not in hist.columns.get_level_values(-1):
+                    missing.append((isin, ticker, start))
+                    continue
+                prices = hist.xs(ticker, axis=1, level=-1)
+            else:
+                prices = hist
+
+            prices = prices.reset_index().rename(columns=YFINANCE_COLUMNS).rename_axis(columns=None)
+            # a multi ticker download returns the union of the dates : rows of other tickers are empty,
+            # and a ticker yfinance could not download keeps its columns with no value at all
+            prices = prices.dropna(subset=["open_price", "close_price", "high", "low"], how="all")
+            prices = prices[prices["date"] >= start]
+            if prices.empty:
+                missing.append((isin, ticker, start))
+                continue
+            prices["isin"] = isin
+
+            frames.append(prices[PRICE_COLUMNS])
+            logging.info(f"Data found for isin={isin}/ticker={ticker}")
+
+        return frames, missing
+
+    def download_group(self, group: dict) -> list:
+        securities = group["securities"]
+        tickers = [ticker for _, ticker, _ in securities]
+        try:
+            hist = self.call_download(tickers if len(tickers) > 1 else tickers[0], group["start"], group["end"])
+            frames, missing = self.split_tickers(hist, securities)
+            error = None
+        except Exception as e:
+            frames, missing = [], securities
+            error = e
+
+        if not missing:
+            return frames
+        if len(securities) == 1:
+            isin, ticker, _ = securities[0]
+            logging.error(f"Unable to download data for isin={isin}/ticker={ticker} : {error or 'no data returned'}")
+            self.failures.append((isin, ticker, group["start"], group["end"]))
+            if error is None:
+                self.no_data.append((isin, ticker, group["start"], group["end"]))
+            return frames
+
+        # a ticker missing from a group download may be a transient error : asked again on its own
+        logging.warning(f"Download failed for {len(missing)} of {len(tickers)} tickers - downloading them one by one")
+        for isin, ticker, start in missing:
+            frames += self.download_group({"start": start, "end": group["end"], "securities": [(isin, ticker, start)]})
+        return frames
+
+    def download_prices(self, securities_df: pd.DataFrame) -> pd.DataFrame:
+        groups = self.group_windows(securities_df)
+        self.failures = []
+        self.no_data = []
+        logging.info(f"Downloading prices of {len(securities_df)} securities in {len(groups)} request(s)")
+
+        frames = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for group_frames in executor.map(self.download_group, groups):
+                frames += group_frames
+
+        if not frames:
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
@@ -1,58 +1,56 @@
 import logging
 import pandas as pd
-import yfinance as yf
+from extract.yfinance_downloader import YFinanceDownloader, PRICE_COLUMNS
+from extract.securities_info_resolver import SecuritiesInfoResolver, fetch_fast_info
+from db.price_store import PriceStore
 
 class YFinanceExtractor:
-    def __init__(self):
-        pass
+    def __init__(self, downloader: YFinanceDownloader = None, price_store: PriceStore = None, info_resolver: SecuritiesInfoResolver = None, settle_days: int = 5):
+        self.downloader = downloader or YFinanceDownloader()
+        self.price_store = price_store
+        # prices older than settle_days are final : a long weekend or a late provider is over by then
+        self.settle_days = settle_days
+        self.info_resolver = info_resolver or SecuritiesInfoResolver(fetch_fast_info)
         
     def extract_securities_info(self, tickers: list):
-        data = []
-        for ticker in tickers:
-            asset = yf.Ticker(ticker)
-            data.append({
-                "ticker": ticker,
-                "type": asset.fast_info.get("quoteType"),
-                "market": asset.fast_info.get("exchange")
-            })
-        return pd.DataFrame(data)
+        return self.info_resolver.resolve(tickers)
     
     def extract_security_prices(self, securities_df: pd.DataFrame) ->pd.DataFrame:
-        data = []
-        for _, row in securities_df.iterrows():
-            try:
-                ticker = row["ticker"]
-                start = row["start_import_date"]
-                end = row["end_import_date"]
-                isin = row["isin"]
-                
-                hist = yf.download(
-                    tickers= ticker,
-                    start= start,
-                    end= end,
-                    progress= False,
-                    group_by="column",
-                    auto_adjust=True
-                )
-                hist.reset_index(inplace=True)
-                hist["isin"] = isin
-                
-                hist.columns = ["_".join([str(c) for c in col if c != ""]) for col in hist.columns]
-                
-                hist = hist.rename(columns={
-                    f"Date": "date",
-                    f"Open_{ticker}": "open_price",
-                    f"Close_{ticker}": "close_price",
-                    f"High_{ticker}": "high",
-                    f"Low_{ticker}": "low",
-                    f"Volume_{ticker}": "volume"
-                })
-                
-                hist = hist[["isin", "date", "open_price", "close_price", "high", "low", "volume"]]
-                
-                data.append(hist)
-                logging.info(f"Data found for isin={isin}/ticker={ticker}")
-            except Exception as e:
-                logging.error(f"Unable to download data for isin={isin}/ticker={ticker} : {e}")
+        if self.price_store is None:
+            return self.downloader.download_prices(securities_df)
         
-        return pd.concat(data, ignore_index=True)
+        #1. only download the date ranges missing from the price store
+        missing = []
+        for isin, ticker, start, end in securities_df[["isin", "ticker", "start_import_date", "end_import_date"]].itertuples(index=False):
+            for missing_start, missing_end in self.price_store.missing_ranges(isin, ticker, start, end):
+                missing.append({"isin": isin, "ticker": ticker, "start_import_date": missing_start, "end_import_date": missing_end})
+        logging.info(f"Price store : {len(missing)} date range(s) to download for {len(securities_df)} securities")
+        
+        #2. save downloaded prices. Dates older than settle_days are covered, with or without prices
+        # (no trading day, delisted or newly listed security). The recent dates are only covered up to
+        # the last date received, and never today whose prices may still change : the dates yfinance did
+        # not return yet are asked again on the next run. Failed downloads are not covered.
+        if missing:
+            missing = pd.DataFrame(missing)
+            prices = self.downloader.download_prices(missing)
+            no_data = {(isin, pd.Timestamp(start)) for isin, _, start, _ in self.downloader.no_data}
+            failures = {(isin, pd.Timestamp(start)) for isin, _, start, _ in self.downloader.failures} - no_data
+            today = pd.Timestamp.today().normalize()
+            settled = today - pd.Timedelta(days=self.settle_days)
+            
+            for isin, ticker, start, end in missing.itertuples(index=False):
+                if (isin, pd.Timestamp(start)) in failures:
+                    continue
+                isin_prices = prices[(prices["isin"] == isin) & (prices["date"] >= start) & (prices["date"] < end)]
+                covered_end = min(pd.Timestamp(end), settled)
+                if not isin_prices.empty:
+                    covered_end = max(covered_end, pd.Timestamp(isin_prices["date"].max()).normalize() + pd.Timedelta(days=1))
+                covered_end = min(covered_end, pd.Timestamp(end), today)
+                if covered_end > pd.Timestamp(start) or not isin_prices.empty:
+                    self.price_store.write(isin, ticker, isin_prices, start, covered_end)
+        
+        #3. prices of the requested windows, read back from the store
+        data = [self.price_store.read_frame(isin, start, end) for isin, start, end in securities_df[["isin", "start_import_date", "end_import_date"]].itertuples(index=False)]
+        if not data:
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        return pd.concat(data, ignore_index=True)[PRICE_COLUMNS]
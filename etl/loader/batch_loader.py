@@ -0,0 +1,88 @@
+import logging
+import time
+import pandas as pd
+from load.mysql_loader import MySQLLoader
+from db.metrics import metrics
+
+class BatchLoader:
+    # Concatenates the transformed DataFrames of several source files and loads them with a
+    # single MySQLLoader : one temp table and one merge per table for the whole batch.
+    # A batch is full after max_rows rows or max_seconds since its first file.
+    def __init__(self, db_config: dict, max_rows: int = None, max_seconds: float = None):
+        if not max_rows and not max_seconds:
+            logging.error("A batch needs max_rows or max_seconds")
+            raise ValueError("A batch needs max_rows or max_seconds")
+
+        self.db_config = db_config
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.reset()
+
+    def reset(self):
+        self.files = []
+        self.clean_data = []
+        self.row_count = 0
+        self.started_at = None
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def add(self, file, clean_data: dict):
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+
+        self.files.append(file)
+        self.clean_data.append(clean_data)
+        self.row_count += sum(len(df) for df in clean_data.values())
+
+    def is_full(self) -> bool:
+        if not self.files:
+            return False
+        if self.max_rows and self.row_count >= self.max_rows:
+            return True
+        if self.max_seconds and time.monotonic() - self.started_at >= self.max_seconds:
+            return True
+        return False
+
+    def concat(self) -> dict:
+        frames = {}
+        for clean_data in self.clean_data:
+            for table, df in clean_data.items():
+                frames.setdefault(table, []).append(df)
+
+        # files overlapping each other (same accounts, same transactions...) must not insert twice
+        return {table: pd.concat(dfs, ignore_index=True).drop_duplicates() for table, dfs in frames.items()}
+
+    def flush(self) -> list:
+        # returns (file, error) for each file of the batch, error is None when the file is loaded
+        if not self.files:
+            return []
+
+        files, clean_data_list, concat_data, row_count = self.files, self.clean_data, self.concat(), self.row_count
+        logging.info(f"Loading batch of {len(files)} file(s) - {row_count} row(s) into MySQL")
+        self.reset()
+
+        try:
+            loader = MySQLLoader(self.db_config, concat_data)
+            with metrics.stage("batch.load", rows_in=row_count, files=len(files)) as stage:
+                loader.load_all()
+                stage.rows_out = loader.rows_written
+                if loader.errors:
+                    stage.fail(f"Unable to load {loader.errors}")
+        except Exception as e:
+            logging.error(f"ERROR : Unable to load batch - {e}")
+            return [(file, e) for file in files]
+
+        if not loader.errors:
+            return [(file, None) for file in files]
+
+        # the failing file can't be told apart : every file is loaded again on its own,
+        # rows already merged by the batch are skipped by the merge step
+        logging.error(f"ERROR : Batch load failed for {loader.errors} - loading files one by one")
+        results = []
+        for file, clean_data in zip(files, clean_data_list):
+            loader = MySQLLoader(self.db_config, clean_data)
+            loader.load_all()
+            results.append((file, f"Unable to load {loader.errors}" if loader.errors else None))
+
+        return results
@@ -1,9 +1,20 @@
+import csv
 import logging
-from sqlalchemy import create_engine, text
+import os
+import tempfile
+from sqlalchemy import text
+from db.engine_registry import get_engine
+from db.metrics import metrics
 import pandas as pd
 
+# how DataFrames are staged into the temp tables
+STAGING_MODES = ("to_sql", "multi", "load_data")
+# how staged rows are merged into the target tables :
+# anti_join scans the target table, upsert uses its unique keys (case-insensitive collation)
+MERGE_MODES = ("anti_join", "upsert")
+
 class MySQLLoader:
-    def __init__(self, db_config: dict, df: dict):
+    def __init__(self, db_config: dict, df: dict, staging_mode: str = None, chunksize: int = None, merge_mode: str = None):
         self.user = db_config["user"]
         self.password = db_config["password"]
         self.host = db_config["host"]
@@ -11,12 +22,90 @@ class MySQLLoader:
         self.database = db_config["database"]
         self.df = df
         
-        # Create SQLAlchemy engine
-        self.engine = create_engine(
-            f"mysql+pymysql://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}",
-            echo=False,  # set to True for SQL debug
-            future=True
-        )
+        # default staging settings can be set for every loader in db_config
+        staging_mode = staging_mode or db_config.get("staging_mode", "to_sql")
+        if staging_mode not in STAGING_MODES:
+            logging.error(f"Invalid staging mode : {staging_mode}")
+            raise ValueError(f"Staging mode must be one of {STAGING_MODES}")
+        if staging_mode == "load_data" and not db_config.get("local_infile"):
+            logging.error("Staging mode 'load_data' needs 'local_infile' in db_config")
+            raise ValueError("Staging mode 'load_data' needs 'local_infile' in db_config")
+        self.staging_mode = staging_mode
+        self.chunksize = chunksize or db_config.get("staging_chunksize", 1000)
+        
+        # "upsert" relies on the unique keys of sql/schema.sql (see sql/migrations for existing databases)
+        merge_mode = merge_mode or db_config.get("merge_mode", "anti_join")
+        if merge_mode not in MERGE_MODES:
+            logging.error(f"Invalid merge mode : {merge_mode}")
+            raise ValueError(f"Merge mode must be one of {MERGE_MODES}")
+        self.merge_mode = merge_mode
+        
+        # Shared SQLAlchemy engine (one connection pool per db_config)
+        self.engine = get_engine(db_config)
+        
+        # tables that could not be loaded, each load method logs its own error and goes on
+        self.errors = []
+        # rows inserted or updated in the target tables, reported by the per-stage metrics
+        self.rows_written = 0
+    
+    def create_tmp_table(self, conn, table_name: str, create_tmp_table_sql: str):
+        # pooled connections are shared by every loader : a temp table lives as long as its connection
+        conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {table_name}"))
+        conn.execute(text(create_tmp_table_sql))
+    
+    def stage_dataframe(self, conn, df: pd.DataFrame, table_name: str):
+        if self.staging_mode == "multi":
+            # multi-row INSERT statements of chunksize rows
+            df.to_sql(table_name, con=conn, if_exists="append", index=False, method="multi", chunksize=self.chunksize)
+        elif self.staging_mode == "load_data":
+            self.load_data_infile(conn, df, table_name)
+        else:
+            df.to_sql(table_name, con=conn, if_exists="append", index=False)
+    
+    def merge(self, conn, sql: str):
+        # last statement of a load method : staged rows into the target table. The engines connect
+        # without CLIENT_FOUND_ROWS (db.engine_registry) : duplicates left as they are by an upsert
+        # are not counted.
+        result = conn.execute(text(sql))
+        self.rows_written += max(result.rowcount, 0)
+    
+    def run_load(self, name: str, load):
+        # one stage per load method, named after the DataFrame it loads
+        rows_in = len(self.df[name]) if name in self.df else 0
+        rows_written = self.rows_written
+        errors = len(self.errors)
+        with metrics.stage(f"load.{name}", rows_in=rows_in) as stage:
+            load()
+            stage.rows_out = self.rows_written - rows_written
+            # load methods log their error and go on
+            if len(self.errors) > errors:
+                stage.fail(f"Unable to add data to {self.errors[-1]}")
+    
+    def load_data_infile(self, conn, df: pd.DataFrame, table_name: str):
+        if df.empty:
+            return
+        
+        # booleans must be sent as 0/1, NULL is written as the unquoted word NULL
+        df = df.astype({column: int for column in df.columns if df[column].dtype == bool})
+        
+        # pymysql only sends LOCAL INFILE data from a path : the CSV is written to a temp file
+        file = tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8", newline="", delete=False)
+        try:
+            with file:
+                df.to_csv(file, header=False, index=False, na_rep="NULL", quoting=csv.QUOTE_MINIMAL, lineterminator="\n", date_format="%Y-%m-%d %H:%M:%S")
+            
+            columns = ", ".join(f"`{column}`" for column in df.columns)
+            load_sql = f"""
+            LOAD DATA LOCAL INFILE '{file.name.replace(os.sep, "/")}'
+            INTO TABLE {table_name}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n'
+            ({columns});
+            """
+            conn.exec_driver_sql(load_sql)
+        finally:
+            os.remove(file.name)
     
     def load_account_types(self):
         try:
@@ -34,23 +123,32 @@ class MySQLLoader:
                     is_checking_account BOOLEAN NOT NULL
                 );
                 """
-                conn.execute(text(create_tmp_table_sql))
+                self.create_tmp_table(conn, "tmp_account_types", create_tmp_table_sql)
                 
                 #2. insert data into temp table
-                df.to_sql("tmp_account_types", con=conn, if_exists="append", index=False)
+                self.stage_dataframe(conn, df, "tmp_account_types")
                 
                 #3. insert unique data into table
-                insert_sql = """
-                INSERT INTO account_type (name, is_checking_account)
-                SELECT tmp.name, tmp.is_checking_account
-                FROM tmp_account_types tmp
-                LEFT JOIN account_type act ON LOWER(tmp.name) = LOWER(act.name)
-                WHERE act.name IS NULL;
-                """
-                conn.execute(text(insert_sql))
+                if self.merge_mode == "upsert":
+                    insert_sql = """
+                    INSERT INTO account_type (name, is_checking_account)
+                    SELECT tmp.name, tmp.is_checking_account
+                    FROM tmp_account_types tmp
+                    ON DUPLICATE KEY UPDATE name = account_type.name;
+                    """
+                else:
+                    insert_sql = """
+                    INSERT INTO account_type (name, is_checking_account)
+                    SELECT tmp.name, tmp.is_checking_account
+                    FROM tmp_account_types tmp
+                    LEFT JOIN account_type act ON LOWER(tmp.name) = LOWER(act.name)
+                    WHERE act.name IS NULL;
+                    """
+                self.merge(conn, insert_sql)
                 logging.info("Data added to account_type")
         except Exception as e:
             logging.error(f"ERROR : Unable to add data to account_type - {e}")
+            self.errors.append("account_type")
     
     def load_accounts(self):
         try:
@@ -71,30 +169,46 @@ class MySQLLoader:
                     bank_id INT NOT NULL
                 );
                 """
-                conn.execute(text(create_tmp_table_sql))
+                self.create_tmp_table(conn, "tmp_accounts", create_tmp_table_sql)
                 
                 #2. insert data into temp table
-                df.to_sql("tmp_accounts", con=conn, if_exists="append", index=False)
+                self.stage_dataframe(conn, df, "tmp_accounts")
                 
                 #3. insert unique data into table
-                insert_sql = """
-                INSERT INTO accounts (id, name, account_type_id, currency_id, bank_id)
-                SELECT 
-                    tmp.id, 
-                    tmp.name, 
-                    at.id,
-                    c.id,
-                    tmp.bank_id
-                FROM tmp_accounts tmp
-                LEFT JOIN account_type at   ON LOWER(tmp.account_type_name) = LOWER(at.name)
-                LEFT JOIN currency c        ON LOWER(tmp.currency_abbreviation) = LOWER(c.abbreviation)
-                LEFT JOIN accounts act      ON tmp.id = act.id
-                WHERE act.name IS NULL;
-                """
-                conn.execute(text(insert_sql))
+                if self.merge_mode == "upsert":
+                    insert_sql = """
+                    INSERT INTO accounts (id, name, account_type_id, currency_id, bank_id)
+                    SELECT 
+                        tmp.id, 
+                        tmp.name, 
+                        at.id,
+                        c.id,
+                        tmp.bank_id
+                    FROM tmp_accounts tmp
+                    LEFT JOIN account_type at   ON tmp.account_type_name = at.name
+                    LEFT JOIN currency c        ON tmp.currency_abbreviation = c.abbreviation
+                    ON DUPLICATE KEY UPDATE id = accounts.id;
+                    """
+                else:
+                    insert_sql = """
+                    INSERT INTO accounts (id, name, account_type_id, currency_id, bank_id)
+                    SELECT 
+                        tmp.id, 
+                        tmp.name, 
+                        at.id,
+                        c.id,
+                        tmp.bank_id
+                    FROM tmp_accounts tmp
+                    LEFT JOIN account_type at   ON LOWER(tmp.account_type_name) = LOWER(at.name)
+                    LEFT JOIN currency c        ON LOWER(tmp.currency_abbreviation) = LOWER(c.abbreviation)
+                    LEFT JOIN accounts act      ON tmp.id = act.id
+                    WHERE act.name IS NULL;
+                    """
+                self.merge(conn, insert_sql)
                 logging.info("Data added to accounts")
         except Exception as e:
             logging.error(f"ERROR : Unable to add data to accounts - {e}")
+            self.errors.append("accounts")
     
     def load_balances(self):
         try:
@@ -113,23 +227,32 @@ class MySQLLoader:
                     value DECIMAL(10,2) NOT NULL
                 );
                 """
-                conn.execute(text(create_tmp_table_sql))
+                self.create_tmp_table(conn, "tmp_balances", create_tmp_table_sql)
                 
                 #2. insert data into temp table
-                df.to_sql("tmp_balances", con=conn, if_exists="append", index=False)
+                self.stage_dataframe(conn, df, "tmp_balances")
                 
                 #3. insert unique data into table
-                insert_sql = """
-                INSERT INTO balances (account_id, date, value)
-                SELECT tmp.account_id, tmp.date, tmp.value
-                FROM tmp_balances tmp
-                LEFT JOIN balances act ON tmp.account_id = act.account_id AND tmp.date = act.date
-                WHERE act.account_id IS NULL;
-                """
-                conn.execute(text(insert_sql))
+                if self.merge_mode == "upsert":
+                    insert_sql = """
+                    INSERT INTO balances (account_id, date, value)
+                    SELECT tmp.account_id, tmp.date, tmp.value
+                    FROM tmp_balances tmp
+                    ON DUPLICATE KEY UPDATE account_id = balances.account_id;
+                    """
+                else:
+                    insert_sql = """
+                    INSERT INTO balances (account_id, date, value)
+                    SELECT tmp.account_id, tmp.date, tmp.value
+                    FROM tmp_balances tmp
+                    LEFT JOIN balances act ON tmp.account_id = act.account_id AND tmp.date = act.date
+                    WHERE act.account_id IS NULL;
+                    """
+                self.merge(conn, insert_sql)
                 logging.info("Data added to balances")
         except Exception as e:
             logging.error(f"ERROR : Unable to add data to balances - {e}")
+            self.errors.append("balances")
     
     def load_banks(self):
         try:
@@ -147,23 +270,32 @@ class MySQLLoader:
                     name VARCHAR(45) NOT NULL
                 );
                 """
-                conn.execute(text(create_tmp_table_sql))
+                self.create_tmp_table(conn, "tmp_banks", create_tmp_table_sql)
                 
                 #2. insert data into temp table
-                df.to_sql("tmp_banks", con=conn, if_exists="append", index=False)
+                self.stage_dataframe(conn, df, "tmp_banks")
                 
                 #3. insert unique data into table
-                insert_sql = """
-                INSERT INTO banks (id, name)
-                SELECT tmp.id, tmp.name
-                FROM tmp_banks tmp
-                LEFT JOIN banks act ON tmp.id = act.id
-                WHERE act.id IS NULL;
-                """
-                conn.execute(text(insert_sql))
+                if self.merge_mode == "upsert":
+                    insert_sql = """
+                    INSERT INTO banks (id, name)
+                    SELECT tmp.id, tmp.name
+                    FROM tmp_banks tmp
+                    ON DUPLICATE KEY UPDATE id = banks.id;
+                    """
+                else:
+                    insert_sql = """
+                    INSERT INTO banks (id, name)
+                    SELECT tmp.id, tmp.name
+                    FROM tmp_banks tmp
+                    LEFT JOIN banks act ON tmp.id = act.id
+                    WHERE act.id IS NULL;
+                    """
+                self.merge(conn, insert_sql)
                 logging.info("Data added to banks")
         except Exception as e:
             logging.error(f"ERROR : Unable to add data to banks - {e}")
+            self.errors.append("banks")
     
     def load_currency(self):
         try:
@@ -182,23 +314,32 @@ class MySQLLoader:
                     symbol VARCHAR(4) NOT NULL
                 );
                 """
-                conn.execute(text(create_tmp_table_sql))
+                self.create_tmp_table(conn, "tmp_currency", create_tmp_table_sql)
                 
                 #2. insert data into temp table
-                df.to_sql("tmp_currency", con=conn, if_exists="append", index=False)
+                self.stage_dataframe(conn, df, "tmp_currency")
                 
                 #3. insert unique data into table
-                insert_sql = """
-                INSERT INTO currency (name, abbreviation, symbol)
-                SELECT tmp.name, tmp.abbreviation, tmp.symbol
-                FROM tmp_currency tmp
-                LEFT JOIN currency act ON LOWER(tmp.abbreviation) = LOWER(act.abbreviation)
-                WHERE act.id IS NULL;
-                """
-                conn.execute(text(insert_sql))
+                if self.merge_mode == "upsert":
+                    insert_sql = """
+                    INSERT INTO currency (name, abbreviation, symbol)
+                    SELECT tmp.name, tmp.abbreviation, tmp.symbol
+                    FROM tmp_currency tmp
+                    ON DUPLICATE KEY UPDATE abbreviation = currency.abbreviation;
+                    """
+                else:
+                    insert_sql = """
+                    INSERT INTO currency (name, abbreviation, symbol)
+                    SELECT tmp.name, tmp.abbreviation, tmp.symbol
+                    FROM tmp_currency tmp
+                    LEFT JOIN currency act ON LOWER(tmp.abbreviation) = LOWER(act.abbreviation)
+                    WHERE act.id IS NULL;
+                    """
+                self.merge(conn, insert_sql)
                 logging.info("Data added to currency")
         except Exception as e:
             logging.error(f"ERROR : Unable to add data to currency - {e}")
+            self.errors.append("currency")
     
     def load_securities(self):
         try:
@@ -219,24 +360,34 @@ class MySQLLoader:
                     currency_abbr VARCHAR(4) NOT NULL
                 );
                 """
-                conn.execute(text(create_tmp_table_sql))
+                self.create_tmp_table(conn, "tmp_securities", create_tmp_table_sql)
                 
                 #2. insert data into temp table
-                df.to_sql("tmp_securities", con=conn, if_exists="append", index=False)
+                self.stage_dataframe(conn, df, "tmp_securities")
                 
                 #3. insert unique data into table
-                insert_sql = """
-                INSERT INTO securities (isin, ticker, name, type, currency_id)
-                SELECT tmp.isin, tmp.ticker, tmp.name, tmp.type, c.id
-                FROM tmp_securities tmp
-                LEFT JOIN currency c ON LOWER(tmp.currency_abbr) = LOWER(c.abbreviation)
-                LEFT JOIN securities act ON LOWER(tmp.name) = LOWER(act.name)
-                WHERE act.isin IS NULL;
-                """
-                conn.execute(text(insert_sql))
+                if self.merge_mode == "upsert":
+                    insert_sql = """
+                    INSERT INTO securities (isin, ticker, name, type, currency_id)
+                    SELECT tmp.isin, tmp.ticker, tmp.name, tmp.type, c.id
+                    FROM tmp_securities tmp
+                    LEFT JOIN currency c ON tmp.currency_abbr = c.abbreviation
+                    ON DUPLICATE KEY UPDATE isin = securities.isin;
+                    """
+                else:
+                    insert_sql = """
+                    INSERT INTO securities (isin, ticker, name, type, currency_id)
+                    SELECT tmp.isin, tmp.ticker, tmp.name, tmp.type, c.id
+                    FROM tmp_securities tmp
+                    LEFT JOIN currency c ON LOWER(tmp.currency_abbr) = LOWER(c.abbreviation)
+                    LEFT JOIN securities act ON LOWER(tmp.name) = LOWER(act.name)
+                    WHERE act.isin IS NULL;
+                    """
+                self.merge(conn, insert_sql)
                 logging.info("Data added to securities")
         except Exception as e:
             logging.error(f"ERROR : Unable to add data to securities - {e}")
+            self.errors.append("securities")
             
     def load_securities_optional_info(self):
         try:
@@ -255,10 +406,10 @@ class MySQLLoader:
                     market VARCHAR(64)
                 );
                 """
-                conn.execute(text(create_tmp_table_sql))
+                self.create_tmp_table(conn, "tmp_securities", create_tmp_table_sql)
                 
                 #2. insert data into temp table
-                df.to_sql("tmp_securities", con=conn, if_exists="append", index=False)
+                self.stage_dataframe(conn, df, "tmp_securities")
                 
                 #3. update optional data into table
                 insert_sql = """
@@ -267,10 +418,11 @@ class MySQLLoader:
                 SET s.type = tmp.type,
                     s.market = tmp.market;
                 """
-                conn.execute(text(insert_sql))
+                self.merge(conn, insert_sql)
                 logging.info("Data added to securities")
         except Exception as e:
             logging.error(f"ERROR : Unable to add data to securities - {e}")
+            self.errors.append("securities_info")
     
     def load_security_operations(self):
         try:
@@ -296,23 +448,32 @@ class MySQLLoader:
                     account_id BIGINT NOT NULL
                 );
                 """
-                conn.execute(text(create_tmp_table_sql))
+                self.create_tmp_table(conn, "tmp_security_operations", create_tmp_table_sql)
                 
                 #2. insert data into temp table
-                df.to_sql("tmp_security_operations", con=conn, if_exists="append", index=False)
+                self.stage_dataframe(conn, df, "tmp_security_operations")
                 
                 #3. insert unique data into table
-                insert_sql = """
-                INSERT INTO security_operations (date, isin, operation_type, quantity, net_amount, gross_amount, net_unit_price, gross_unit_price, fees, account_id)
-                SELECT tmp.date, tmp.isin, tmp.operation_type, tmp.quantity, tmp.net_amount, tmp.gross_amount, tmp.net_unit_price, tmp.gross_unit_price, tmp.fees, tmp.account_id
-                FROM tmp_security_operations tmp
-                LEFT JOIN security_operations act ON tmp.date = act.date AND tmp.isin = act.isin AND tmp.quantity = act.quantity AND tmp.account_id = act.account_id
-                WHERE act.id IS NULL;
-                """
-                conn.execute(text(insert_sql))
+                if self.merge_mode == "upsert":
+                    insert_sql = """
+                    INSERT INTO security_operations (date, isin, operation_type, quantity, net_amount, gross_amount, net_unit_price, gross_unit_price, fees, account_id)
+                    SELECT tmp.date, tmp.isin, tmp.operation_type, tmp.quantity, tmp.net_amount, tmp.gross_amount, tmp.net_unit_price, tmp.gross_unit_price, tmp.fees, tmp.account_id
+                    FROM tmp_security_operations tmp
+                    ON DUPLICATE KEY UPDATE id = security_operations.id;
+                    """
+                else:
+                    insert_sql = """
+                    INSERT INTO security_operations (date, isin, operation_type, quantity, net_amount, gross_amount, net_unit_price, gross_unit_price, fees, account_id)
+                    SELECT tmp.date, tmp.isin, tmp.operation_type, tmp.quantity, tmp.net_amount, tmp.gross_amount, tmp.net_unit_price, tmp.gross_unit_price, tmp.fees, tmp.account_id
+                    FROM tmp_security_operations tmp
+                    LEFT JOIN security_operations act ON tmp.date = act.date AND tmp.isin = act.isin AND tmp.quantity = act.quantity AND tmp.operation_type = act.operation_type AND tmp.account_id = act.account_id
+                    WHERE act.id IS NULL;
+                    """
+                self.merge(conn, insert_sql)
                 logging.info("Data added to security_operations")
         except Exception as e:
             logging.error(f"ERROR : Unable to add data to security_operations - {e}")
+            self.errors.append("security_operations")
     
     def load_security_prices(self):
         try:
@@ -335,23 +496,32 @@ class MySQLLoader:
                     volume BIGINT
                 );
                 """
-                conn.execute(text(create_tmp_table_sql))
+                self.create_tmp_table(conn, "tmp_security_prices", create_tmp_table_sql)
                 
                 #2. insert data into temp table
-                df.to_sql("tmp_security_prices", con=conn, if_exists="append", index=False)
+                self.stage_dataframe(conn, df, "tmp_security_prices")
                 
                 #3. insert unique data into table
-                insert_sql = """
-                INSERT INTO security_prices (date, isin, open_price, close_price, high, low, volume)
-                SELECT tmp.date, tmp.isin, tmp.open_price, tmp.close_price, tmp.high, tmp.low, tmp.volume
-                FROM tmp_security_prices tmp
-                LEFT JOIN security_prices act ON tmp.date = act.date AND tmp.isin = act.isin
-                WHERE act.id IS NULL;
-                """
-                conn.execute(text(insert_sql))
+                if self.merge_mode == "upsert":
+                    insert_sql = """
+                    INSERT INTO security_prices (date, isin, open_price, close_price, high, low, volume)
+                    SELECT tmp.date, tmp.isin, tmp.open_price, tmp.close_price, tmp.high, tmp.low, tmp.volume
+                    FROM tmp_security_prices tmp
+                    ON DUPLICATE KEY UPDATE id = security_prices.id;
+                    """
+                else:
+                    insert_sql = """
+                    INSERT INTO security_prices (date, isin, open_price, close_price, high, low, volume)
+                    SELECT tmp.date, tmp.isin, tmp.open_price, tmp.close_price, tmp.high, tmp.low, tmp.volume
+                    FROM tmp_security_prices tmp
+                    LEFT JOIN security_prices act ON tmp.date = act.date AND tmp.isin = act.isin
+                    WHERE act.id IS NULL;
+                    """
+                self.merge(conn, insert_sql)
                 logging.info("Data added to security_prices")
         except Exception as e:
             logging.error(f"ERROR : Unable to add data to security_prices - {e}")
+            self.errors.append("security_prices")
     
     def load_transactions(self):
         try:
@@ -372,47 +542,363 @@ class MySQLLoader:
                     clean_payee VARCHAR(128),
                     memo VARCHAR(256),
                     amount DECIMAL(10,2) NOT NULL,
-                    is_expense TINYINT(1) NOT NULL
+                    is_expense TINYINT(1) NOT NULL,
+                    payment_method_id INT,
+                    category_id INT,
+                    parent_category_id INT
                 );
                 """
-                conn.execute(text(create_tmp_table_sql))
+                self.create_tmp_table(conn, "tmp_transactions", create_tmp_table_sql)
                 
                 #2. insert data into temp table
-                df.to_sql("tmp_transactions", con=conn, if_exists="append", index=False)
+                self.stage_dataframe(conn, df, "tmp_transactions")
                 
                 #3. insert unique data into table
-                insert_sql = """
-                INSERT INTO transactions (id, account_id, date, payee, clean_payee, memo, amount, is_expense)
-                SELECT tmp.id, tmp.account_id, tmp.date, tmp.payee, tmp.clean_payee, tmp.memo, tmp.amount, tmp.is_expense
-                FROM tmp_transactions tmp
-                LEFT JOIN transactions act ON tmp.id = act.id
-                WHERE act.id IS NULL;
-                """
-                conn.execute(text(insert_sql))
+                if self.merge_mode == "upsert":
+                    insert_sql = """
+                    INSERT INTO transactions (id, account_id, date, payee, clean_payee, memo, amount, is_expense, payment_method_id, category_id, parent_category_id)
+                    SELECT tmp.id, tmp.account_id, tmp.date, tmp.payee, tmp.clean_payee, tmp.memo, tmp.amount, tmp.is_expense, tmp.payment_method_id, tmp.category_id, tmp.parent_category_id
+                    FROM tmp_transactions tmp
+                    ON DUPLICATE KEY UPDATE id = transactions.id;
+                    """
+                else:
+                    insert_sql = """
+                    INSERT INTO transactions (id, account_id, date, payee, clean_payee, memo, amount, is_expense, payment_method_id, category_id, parent_category_id)
+                    SELECT tmp.id, tmp.account_id, tmp.date, tmp.payee, tmp.clean_payee, tmp.memo, tmp.amount, tmp.is_expense, tmp.payment_method_id, tmp.category_id, tmp.parent_category_id
+                    FROM tmp_transactions tmp
+                    LEFT JOIN transactions act ON tmp.id = act.id
+                    WHERE act.id IS NULL;
+                    """
+                self.merge(conn, insert_sql)
                 logging.info("Data added to transactions")
         except Exception as e:
             logging.error(f"ERROR : Unable to add data to transactions - {e}")
+            self.errors.append("transactions")
+    
+    def load_transactions_payment_methods(self):
+        try:
+            df = self.df["transactions_payment_methods"]
+        except KeyError as e:
+            logging.error(f"ERROR : No DataFrame found for transactions payment methods")
+            return
+            
+        try :
+            with self.engine.begin() as conn:
+                #1. create temp table
+                create_tmp_table_sql = """
+                CREATE TEMPORARY TABLE tmp_transactions_payment_methods (
+                    id BIGINT NOT NULL PRIMARY KEY,
+                    payment_method_id INT
+                );
+                """
+                self.create_tmp_table(conn, "tmp_transactions_payment_methods", create_tmp_table_sql)
+                
+                #2. insert data into temp table
+                self.stage_dataframe(conn, df, "tmp_transactions_payment_methods")
+                
+                #3. update changed payment methods
+                update_sql = """
+                UPDATE transactions t
+                INNER JOIN tmp_transactions_payment_methods tmp ON t.id = tmp.id
+                SET t.payment_method_id = tmp.payment_method_id
+                WHERE NOT (t.payment_method_id <=> tmp.payment_method_id);
+                """
+                self.merge(conn, update_sql)
+                logging.info("Payment methods updated in transactions")
+        except Exception as e:
+            logging.error(f"ERROR : Unable to update payment methods in transactions - {e}")
+            self.errors.append("transactions_payment_methods")
+    
+    def load_transactions_categories(self):
+        try:
+            df = self.df["transactions_categories"]
+        except KeyError as e:
+            logging.error(f"ERROR : No DataFrame found for transactions categories")
+            return
+            
+        try :
+            with self.engine.begin() as conn:
+                #1. create temp table
+                create_tmp_table_sql = """
+                CREATE TEMPORARY TABLE tmp_transactions_categories (
+                    id BIGINT NOT NULL PRIMARY KEY,
+                    category_id INT,
+                    parent_category_id INT
+                );
+                """
+                self.create_tmp_table(conn, "tmp_transactions_categories", create_tmp_table_sql)
+                
+                #2. insert data into temp table
+                self.stage_dataframe(conn, df, "tmp_transactions_categories")
+                
+                #3. update changed categories
+                update_sql = """
+                UPDATE transactions t
+                INNER JOIN tmp_transactions_categories tmp ON t.id = tmp.id
+                SET t.category_id = tmp.category_id,
+                    t.parent_category_id = tmp.parent_category_id
+                WHERE NOT (t.category_id <=> tmp.category_id AND t.parent_category_id <=> tmp.parent_category_id);
+                """
+                self.merge(conn, update_sql)
+                logging.info("Categories updated in transactions")
+        except Exception as e:
+            logging.error(f"ERROR : Unable to update categories in transactions - {e}")
+            self.errors.append("transactions_categories")
+    
+    def load_category_map_snapshot(self):
+        try:
+            df = self.df["category_map_snapshot"]
+        except KeyError as e:
+            logging.error(f"ERROR : No DataFrame found for category_map_snapshot table")
+            return
+            
+        try :
+            with self.engine.begin() as conn:
+                #1. create temp table
+                create_tmp_table_sql = """
+                CREATE TEMPORARY TABLE tmp_category_map_snapshot (
+                    entry VARCHAR(32) NOT NULL,
+                    entry_key VARCHAR(256) NOT NULL,
+                    is_expense TINYINT(1) NOT NULL,
+                    category_id INT,
+                    parent_category_id INT
+                );
+                """
+                self.create_tmp_table(conn, "tmp_category_map_snapshot", create_tmp_table_sql)
+                
+                #2. insert data into temp table
+                self.stage_dataframe(conn, df, "tmp_category_map_snapshot")
+                
+                #3. replace the whole snapshot
+                conn.execute(text("DELETE FROM category_map_snapshot;"))
+                insert_sql = """
+                INSERT INTO category_map_snapshot (entry, entry_key, is_expense, category_id, parent_category_id)
+                SELECT tmp.entry, tmp.entry_key, tmp.is_expense, tmp.category_id, tmp.parent_category_id
+                FROM tmp_category_map_snapshot tmp;
+                """
+                self.merge(conn, insert_sql)
+                logging.info("Data added to category_map_snapshot")
+        except Exception as e:
+            logging.error(f"ERROR : Unable to add data to category_map_snapshot - {e}")
+            self.errors.append("category_map_snapshot")
+    
+    def load_balance_history(self):
+        try:
+            df = self.df["balance_history"]
+            refresh_df = self.df["balance_history_refresh"]
+        except KeyError as e:
+            logging.error(f"ERROR : No DataFrame found for balance_history_monthly table")
+            return
+            
+        try :
+            with self.engine.begin() as conn:
+                #1. create temp tables
+                create_tmp_table_sql = """
+                CREATE TEMPORARY TABLE tmp_balance_history (
+                    account_id BIGINT NOT NULL,
+                    month_last_day DATE NOT NULL,
+                    source VARCHAR(16) NOT NULL,
+                    value DECIMAL(12,2)
+                );
+                """
+                self.create_tmp_table(conn, "tmp_balance_history", create_tmp_table_sql)
+                create_tmp_refresh_sql = """
+                CREATE TEMPORARY TABLE tmp_balance_history_refresh (
+                    account_id BIGINT NOT NULL,
+                    source VARCHAR(16) NOT NULL,
+                    from_month_last_day DATE NOT NULL
+                );
+                """
+                self.create_tmp_table(conn, "tmp_balance_history_refresh", create_tmp_refresh_sql)
+                
+                #2. insert data into temp tables
+                self.stage_dataframe(conn, df, "tmp_balance_history")
+                self.stage_dataframe(conn, refresh_df, "tmp_balance_history_refresh")
+                
+                #3. replace the months from the earliest changed one of each account
+                delete_sql = """
+                DELETE bh FROM balance_history_monthly bh
+                INNER JOIN tmp_balance_history_refresh r
+                    ON bh.account_id = r.account_id AND bh.source = r.source AND bh.month_last_day >= r.from_month_last_day;
+                """
+                conn.execute(text(delete_sql))
+                insert_sql = """
+                INSERT INTO balance_history_monthly (account_id, month_last_day, source, value)
+                SELECT tmp.account_id, tmp.month_last_day, tmp.source, tmp.value
+                FROM tmp_balance_history tmp;
+                """
+                self.merge(conn, insert_sql)
+                logging.info("Data added to balance_history_monthly")
+        except Exception as e:
+            logging.error(f"ERROR : Unable to add data to balance_history_monthly - {e}")
+            self.errors.append("balance_history_monthly")
+    
+    def load_loan_amortization(self):
+        try:
+            df = self.df["loan_amortization_schedule"]
+            refresh_df = self.df["loan_amortization_refresh"]
+        except KeyError as e:
+            logging.error(f"ERROR : No DataFrame found for loan_amortization_schedule table")
+            return
+            
+        try :
+            with self.engine.begin() as conn:
+                #1. create temp tables
+                create_tmp_table_sql = """
+                CREATE TEMPORARY TABLE tmp_loan_amortization_schedule (
+                    loan_id INT NOT NULL,
+                    month_last_day DATE NOT NULL,
+                    month_duration INT NOT NULL,
+                    start_month_total_due_amount DECIMAL(14,4),
+                    interest DECIMAL(14,4),
+                    month_due_amount DECIMAL(14,4),
+                    amount_repaid DECIMAL(14,4),
+                    end_month_total_due_amount DECIMAL(14,4)
+                );
+                """
+                self.create_tmp_table(conn, "tmp_loan_amortization_schedule", create_tmp_table_sql)
+                create_tmp_refresh_sql = """
+                CREATE TEMPORARY TABLE tmp_loan_amortization_refresh (
+                    loan_id INT NOT NULL PRIMARY KEY,
+                    fingerprint CHAR(40)
+                );
+                """
+                self.create_tmp_table(conn, "tmp_loan_amortization_refresh", create_tmp_refresh_sql)
+                
+                #2. insert data into temp tables
+                self.stage_dataframe(conn, df, "tmp_loan_amortization_schedule")
+                self.stage_dataframe(conn, refresh_df, "tmp_loan_amortization_refresh")
+                
+                #3. replace the schedules of the refreshed loans (fingerprint NULL : loan removed)
+                delete_sql = """
+                DELETE s FROM loan_amortization_schedule s
+                INNER JOIN tmp_loan_amortization_refresh r ON s.loan_id = r.loan_id;
+                """
+                conn.execute(text(delete_sql))
+                insert_sql = """
+                INSERT INTO loan_amortization_schedule (
+                    loan_id, month_last_day, month_duration, start_month_total_due_amount, interest,
+                    month_due_amount, amount_repaid, end_month_total_due_amount
+                )
+                SELECT
+                    tmp.loan_id, tmp.month_last_day, tmp.month_duration, tmp.start_month_total_due_amount, tmp.interest,
+                    tmp.month_due_amount, tmp.amount_repaid, tmp.end_month_total_due_amount
+                FROM tmp_loan_amortization_schedule tmp;
+                """
+                self.merge(conn, insert_sql)
+                
+                #4. save the fingerprints of the refreshed loans
+                delete_state_sql = """
+                DELETE st FROM loan_amortization_state st
+                INNER JOIN tmp_loan_amortization_refresh r ON st.loan_id = r.loan_id
+                WHERE r.fingerprint IS NULL;
+                """
+                conn.execute(text(delete_state_sql))
+                upsert_state_sql = """
+                INSERT INTO loan_amortization_state (loan_id, fingerprint, computed_at)
+                SELECT r.loan_id, r.fingerprint, NOW()
+                FROM tmp_loan_amortization_refresh r
+                WHERE r.fingerprint IS NOT NULL
+                ON DUPLICATE KEY UPDATE fingerprint = VALUES(fingerprint), computed_at = VALUES(computed_at);
+                """
+                conn.execute(text(upsert_state_sql))
+                logging.info("Data added to loan_amortization_schedule")
+        except Exception as e:
+            logging.error(f"ERROR : Unable to add data to loan_amortization_schedule - {e}")
+            self.errors.append("loan_amortization_schedule")
+    
+    def load_planned_transactions_status(self):
+        try:
+            df = self.df["planned_transactions_status"]
+            refresh_df = self.df["planned_transactions_status_refresh"]
+        except KeyError as e:
+            logging.error(f"ERROR : No DataFrame found for planned_transactions_status table")
+            return
+            
+        try :
+            with self.engine.begin() as conn:
+                #1. create temp tables
+                create_tmp_table_sql = """
+                CREATE TEMPORARY TABLE tmp_planned_transactions_status (
+                    planned_transaction_id INT NOT NULL,
+                    is_expense TINYINT(1) NOT NULL,
+                    due_amount DECIMAL(10,2),
+                    paid_amount DECIMAL(10,2),
+                    total_due_amount DECIMAL(12,2),
+                    total_paid_amount DECIMAL(12,2),
+                    payee VARCHAR(128),
+                    due_month_last_day DATE NOT NULL,
+                    paid_month_last_day DATE,
+                    status VARCHAR(32) NOT NULL
+                );
+                """
+                self.create_tmp_table(conn, "tmp_planned_transactions_status", create_tmp_table_sql)
+                create_tmp_refresh_sql = """
+                CREATE TEMPORARY TABLE tmp_planned_transactions_status_refresh (
+                    planned_transaction_id INT NOT NULL PRIMARY KEY
+                );
+                """
+                self.create_tmp_table(conn, "tmp_planned_transactions_status_refresh", create_tmp_refresh_sql)
+                
+                #2. insert data into temp tables
+                self.stage_dataframe(conn, df, "tmp_planned_transactions_status")
+                self.stage_dataframe(conn, refresh_df, "tmp_planned_transactions_status_refresh")
+                
+                #3. replace the occurrences of the changed planned transactions
+                delete_sql = """
+                DELETE s FROM planned_transactions_status s
+                INNER JOIN tmp_planned_transactions_status_refresh r ON s.planned_transaction_id = r.planned_transaction_id;
+                """
+                conn.execute(text(delete_sql))
+                insert_sql = """
+                INSERT INTO planned_transactions_status (
+                    planned_transaction_id, is_expense, due_amount, paid_amount, total_due_amount, total_paid_amount,
+                    payee, due_month_last_day, paid_month_last_day, status
+                )
+                SELECT
+                    tmp.planned_transaction_id, tmp.is_expense, tmp.due_amount, tmp.paid_amount, tmp.total_due_amount, tmp.total_paid_amount,
+                    tmp.payee, tmp.due_month_last_day, tmp.paid_month_last_day, tmp.status
+                FROM tmp_planned_transactions_status tmp;
+                """
+                self.merge(conn, insert_sql)
+                logging.info("Data added to planned_transactions_status")
+        except Exception as e:
+            logging.error(f"ERROR : Unable to add data to planned_transactions_status - {e}")
+            self.errors.append("planned_transactions_status")
     
     def load_all(self):
         if "account_types" in self.df:
-            self.load_account_types()
+            self.run_load("account_types", self.load_account_types)
         if "banks" in self.df:
-            self.load_banks()
+            self.run_load("banks", self.load_banks)
         if "currency" in self.df:
-            self.load_currency()
+            self.run_load("currency", self.load_currency)
         
         if "accounts" in self.df:
-            self.load_accounts()
+            self.run_load("accounts", self.load_accounts)
         if "securities" in self.df:
-            self. load_securities()
+            self.run_load("securities", self.load_securities)
         if "securities_info" in self.df:
-            self. load_securities_optional_info()
+            self.run_load("securities_info", self.load_securities_optional_info)
         
         if "balances" in self.df:
-            self.load_balances()
+            self.run_load("balances", self.load_balances)
         if "security_operations" in self.df:
-            self.load_security_operations()
+            self.run_load("security_operations", self.load_security_operations)
         if "security_prices" in self.df:
-            self.load_security_prices()
+            self.run_load("security_prices", self.load_security_prices)
         if "transactions" in self.df:
-            self.load_transactions()
+            self.run_load("transactions", self.load_transactions)
+        if "transactions_payment_methods" in self.df:
+            self.run_load("transactions_payment_methods", self.load_transactions_payment_methods)
+        if "transactions_categories" in self.df:
+            self.run_load("transactions_categories", self.load_transactions_categories)
+        # saved once the transactions are reclassified : a failed run is retried at the next one
+        if "category_map_snapshot" in self.df and "transactions_categories" not in self.errors:
+            self.run_load("category_map_snapshot", self.load_category_map_snapshot)
+        if "balance_history_refresh" in self.df:
+            self.run_load("balance_history", self.load_balance_history)
+        if "loan_amortization_refresh" in self.df:
+            self.run_load("loan_amortization_schedule", self.load_loan_amortization)
+        if "planned_transactions_status_refresh" in self.df:
+            self.run_load("planned_transactions_status", self.load_planned_transactions_status)
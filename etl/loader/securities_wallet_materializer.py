@@ -0,0 +1,281 @@
+import logging
+import datetime
+import pandas as pd
+from sqlalchemy import text
+from db.engine_registry import get_engine
+
+# positions of a whole ISIN are rebuilt from this date
+FULL_REFRESH_DATE = datetime.date(1000, 1, 1)
+
+STATE_SQL = """
+SELECT
+    o.isin,
+    o.operations_fingerprint,
+    COALESCE(p.price_count, 0) AS price_count,
+    p.last_price_date,
+    st.operations_fingerprint AS state_operations_fingerprint,
+    st.price_count AS state_price_count,
+    st.last_price_date AS state_last_price_date,
+    (
+        SELECT COUNT(*) FROM security_prices sp
+        WHERE sp.isin = o.isin AND sp.date > st.last_price_date
+    ) AS new_price_count
+FROM (
+    -- every column used by securities_wallet_evolution, order independent
+    SELECT
+        isin,
+        CONCAT(COUNT(*), '-', SUM(CRC32(CONCAT_WS('|', account_id, date, operation_type, quantity, net_unit_price)))) AS operations_fingerprint
+    FROM security_operations
+    GROUP BY isin
+) o
+LEFT JOIN (
+    SELECT isin, COUNT(*) AS price_count, MAX(date) AS last_price_date
+    FROM security_prices
+    GROUP BY isin
+) p ON o.isin = p.isin
+LEFT JOIN securities_wallet_refresh_state st ON o.isin = st.isin
+"""
+
+# same steps as the securities_wallet_evolution view (sql/views.sql), restricted to the ISINs
+# and price dates flagged in securities_wallet_refresh_state
+INSERT_POSITIONS_SQL = """
+INSERT INTO securities_wallet_positions (
+    date, account_id, isin, total_quantity, cost_price, unit_cost_price,
+    open_price, close_price, capital_value, capital_gain_value, capital_gain_rate
+)
+WITH refresh AS (
+    SELECT isin, refresh_from_date
+    FROM securities_wallet_refresh_state
+    WHERE refresh_from_date IS NOT NULL
+),
+wallet_qty_securities AS (
+    SELECT
+        date,
+        isin,
+        operation_type,
+        account_id,
+        SUM(
+            CASE
+                WHEN operation_type = 'purchase' THEN quantity
+                ELSE -quantity
+            END
+        ) OVER(PARTITION BY isin, account_id ORDER BY date) AS total_quantity
+    FROM security_operations
+    WHERE operation_type <> 'tax' AND isin IN (SELECT isin FROM refresh)
+),
+wallet_price_securities AS (
+    SELECT
+        date,
+        isin,
+        SUM(quantity * net_unit_price) OVER(PARTITION BY isin ORDER BY date) AS net_amount,
+        SUM(quantity * net_unit_price) OVER(PARTITION BY isin ORDER BY date)
+        / SUM(quantity) OVER(PARTITION BY isin ORDER BY date) AS net_unit_price
+    FROM security_operations
+    WHERE operation_type = 'purchase' AND isin IN (SELECT isin FROM refresh)
+),
+wallet_securities_evolution AS (
+    SELECT
+        sp.date,
+        wqs.account_id,
+        wqs.isin,
+        wqs.total_quantity,
+        wps.net_unit_price AS unit_cost_price,
+        wqs.total_quantity * wps.net_unit_price AS cost_price,
+        sp.open_price,
+        sp.close_price,
+        wqs.total_quantity * sp.close_price AS capital_value,
+        wqs.total_quantity * sp.close_price - wqs.total_quantity * wps.net_unit_price AS capital_gain_value,
+        sp.close_price / wps.net_unit_price - 1 AS capital_gain_rate,
+        ROW_NUMBER() OVER(PARTITION BY wqs.isin, sp.date ORDER BY wqs.date DESC) AS row_id
+    FROM wallet_qty_securities wqs
+    INNER JOIN refresh r
+        ON wqs.isin = r.isin
+    LEFT JOIN wallet_price_securities wps
+        ON wqs.isin = wps.isin AND wqs.date = wps.date
+    LEFT JOIN wallet_qty_securities sold
+        ON wqs.isin = sold.isin AND wqs.account_id = sold.account_id AND sold.total_quantity = 0
+    INNER JOIN security_prices sp
+        ON wqs.isin = sp.isin
+        AND wqs.date <= sp.date
+        AND COALESCE(sold.date, NOW()) >= sp.date
+        AND sp.date >= r.refresh_from_date
+    WHERE wqs.total_quantity > 0
+)
+SELECT
+    date, account_id, isin, total_quantity, cost_price, unit_cost_price,
+    open_price, close_price, capital_value, capital_gain_value, capital_gain_rate
+FROM wallet_securities_evolution
+WHERE row_id = 1;
+"""
+
+DELETE_POSITIONS_SQL = """
+DELETE p FROM securities_wallet_positions p
+INNER JOIN securities_wallet_refresh_state r ON p.isin = r.isin
+WHERE r.refresh_from_date IS NOT NULL AND p.date >= r.refresh_from_date;
+"""
+
+UPDATE_CAPITAL_RATE_SQL = """
+UPDATE securities_wallet_positions p
+INNER JOIN (
+    SELECT date, SUM(capital_value) AS total_capital_value
+    FROM securities_wallet_positions
+    WHERE date >= :from_date
+    GROUP BY date
+) t ON p.date = t.date
+SET p.capital_rate = p.capital_value / t.total_capital_value
+WHERE p.date >= :from_date;
+"""
+
+INSERT_GLOBAL_RATES_SQL = """
+INSERT INTO securities_wallet_global_rates (date, global_gain_rate, global_gain_rate_since_yesterday)
+SELECT
+    date,
+    SUM(cost_price * capital_gain_rate) / NULLIF(SUM(cost_price), 0),
+    0
+FROM securities_wallet_positions
+WHERE date >= :from_date
+GROUP BY date;
+"""
+
+UPDATE_GLOBAL_RATES_SQL = """
+UPDATE securities_wallet_global_rates g
+INNER JOIN (
+    SELECT
+        date,
+        COALESCE(global_gain_rate - LAG(global_gain_rate, 1) OVER (ORDER BY date), 0) AS global_gain_rate_since_yesterday
+    FROM securities_wallet_global_rates
+) d ON g.date = d.date
+SET g.global_gain_rate_since_yesterday = d.global_gain_rate_since_yesterday
+WHERE g.date >= :from_date;
+"""
+
+CONSISTENCY_COLUMNS = [
+    "account_id", "total_quantity", "cost_price", "unit_cost_price", "open_price", "close_price",
+    "capital_value", "capital_rate", "capital_gain_value", "capital_gain_rate",
+    "global_gain_rate", "global_gain_rate_since_yesterday"
+]
+
+class SecuritiesWalletMaterializer:
+    # Maintains securities_wallet_positions / securities_wallet_global_rates, the materialized
+    # securities_wallet_evolution view. Only stale ISINs are recomputed :
+    # - operations changed (fingerprint) : the whole ISIN
+    # - only prices added after the last refreshed price : from the first new price date
+    # Global rates and capital rates are recomputed from the earliest refreshed date.
+    def __init__(self, db_config: dict):
+        self.engine = get_engine(db_config)
+
+    def refresh_dates(self, conn) -> tuple:
+        state = pd.read_sql(text(STATE_SQL), conn)
+
+        refresh = {}
+        for row in state.itertuples(index=False):
+            if row.operations_fingerprint != row.state_operations_fingerprint:
+                refresh[row.isin] = FULL_REFRESH_DATE
+            elif row.price_count != row.state_price_count:
+                if row.state_price_count + row.new_price_count == row.price_count:
+                    refresh[row.isin] = pd.Timestamp(row.state_last_price_date).date() + datetime.timedelta(days=1)
+                else:
+                    # prices added or removed before the last refreshed price
+                    refresh[row.isin] = FULL_REFRESH_DATE
+
+        return refresh, state
+
+    def refresh(self) -> int:
+        with self.engine.begin() as conn:
+            refresh, state = self.refresh_dates(conn)
+
+            # ISINs without operations anymore
+            removed = conn.execute(text("""
+                DELETE p FROM securities_wallet_positions p
+                LEFT JOIN security_operations so ON p.isin = so.isin
+                WHERE so.isin IS NULL;
+            """)).rowcount
+            conn.execute(text("""
+                DELETE st FROM securities_wallet_refresh_state st
+                LEFT JOIN security_operations so ON st.isin = so.isin
+                WHERE so.isin IS NULL;
+            """))
+
+            if not refresh and not removed:
+                logging.info("REPORT : securities wallet positions up to date")
+                return 0
+
+            if refresh:
+                conn.execute(
+                    text("""
+                    INSERT INTO securities_wallet_refresh_state (isin, refresh_from_date)
+                    VALUES (:isin, :refresh_from_date)
+                    ON DUPLICATE KEY UPDATE refresh_from_date = VALUES(refresh_from_date);
+                    """),
+                    [{"isin": isin, "refresh_from_date": from_date} for isin, from_date in refresh.items()]
+                )
+
+            #1. positions of the stale ISINs
+            conn.execute(text(DELETE_POSITIONS_SQL))
+            inserted = conn.execute(text(INSERT_POSITIONS_SQL)).rowcount if refresh else 0
+
+            #2. rates depending on every ISIN of a date
+            from_date = min(refresh.values()) if refresh and not removed else FULL_REFRESH_DATE
+            conn.execute(text("DELETE FROM securities_wallet_global_rates WHERE date >= :from_date"), {"from_date": from_date})
+            conn.execute(text(INSERT_GLOBAL_RATES_SQL), {"from_date": from_date})
+            conn.execute(text(UPDATE_GLOBAL_RATES_SQL), {"from_date": from_date})
+            conn.execute(text(UPDATE_CAPITAL_RATE_SQL), {"from_date": from_date})
+
+            #3. save the state of the refreshed ISINs
+            refreshed_state = state[state["isin"].isin(list(refresh))]
+            if not refreshed_state.empty:
+                conn.execute(
+                    text("""
+                    UPDATE securities_wallet_refresh_state
+                    SET operations_fingerprint = :operations_fingerprint,
+                        price_count = :price_count,
+                        last_price_date = :last_price_date,
+                        refresh_from_date = NULL,
+                        refreshed_at = NOW()
+                    WHERE isin = :isin;
+                    """),
+                    [
+                        {
+                            "isin"                  : row.isin,
+                            "operations_fingerprint": row.operations_fingerprint,
+                            "price_count"           : int(row.price_count),
+                            "last_price_date"       : None if pd.isna(row.last_price_date) else row.last_price_date
+                        }
+                        for row in refreshed_state.itertuples(index=False)
+                    ]
+                )
+
+        full_count = sum(1 for from_date in refresh.values() if from_date == FULL_REFRESH_DATE)
+        logging.info(f"REPORT : securities wallet positions - {len(refresh)} isin(s) refreshed ({full_count} fully) - "
+                     f"{inserted} position(s) written - {removed} position(s) of removed isin(s) deleted")
+        return inserted
+
+    def check_consistency(self, isins: list = None, tolerance: float = 1e-4) -> pd.DataFrame:
+        # compares the materialized view with securities_wallet_evolution, returns the differing rows
+        where = ""
+        params = {}
+        if isins:
+            where = f"WHERE isin IN ({', '.join(f':isin_{i}' for i in range(len(isins)))})"
+            params = {f"isin_{i}": isin for i, isin in enumerate(isins)}
+
+        with self.engine.connect() as conn:
+            expected = pd.read_sql(text(f"SELECT * FROM securities_wallet_evolution {where}"), conn, params=params)
+            materialized = pd.read_sql(text(f"SELECT * FROM securities_wallet_evolution_materialized {where}"), conn, params=params)
+
+        # capital_rate and the global rates depend on every ISIN of a date : only comparable on the whole wallet
+        columns = CONSISTENCY_COLUMNS if not isins else [column for column in CONSISTENCY_COLUMNS if column != "capital_rate" and not column.startswith("global")]
+        merged = expected.merge(materialized, on=["isin", "date"], how="outer", suffixes=("_view", "_materialized"), indicator=True)
+
+        mismatch = merged["_merge"] != "both"
+        for column in columns:
+            view_values = pd.to_numeric(merged[f"{column}_view"], errors="coerce").astype(float)
+            materialized_values = pd.to_numeric(merged[f"{column}_materialized"], errors="coerce").astype(float)
+            both_null = view_values.isna() & materialized_values.isna()
+            mismatch |= ~both_null & ~((view_values - materialized_values).abs() <= tolerance)
+
+        differences = merged[mismatch]
+        if differences.empty:
+            logging.info(f"REPORT : securities wallet consistency check - {len(expected)} row(s) identical")
+        else:
+            logging.error(f"ERROR : securities wallet consistency check - {len(differences)} row(s) differ out of {len(expected)}")
+        return differences
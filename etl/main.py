@@ -1,8 +1,144 @@
+import argparse
+import datetime
 import logging
 import os
-from pipelines.main_pipeline import MainPipeline
+import sys
+
+# pipelines are imported by the command which runs them : pandas, SQLAlchemy, ofxparse and
+# yfinance are only loaded when a step needs them (see benchmarks/bench_cli_startup.py)
+
+data_directory = os.path.join(os.path.dirname(__file__), "data")
+
+# per-stage metrics : one JSON line per stage, Prometheus text format rewritten at the end of each run
+metrics_jsonl_path = os.path.join(os.path.dirname(__file__), "metrics.jsonl")
+metrics_prometheus_path = os.path.join(os.path.dirname(__file__), "metrics.prom")
+# profiling mode : one sub-directory per run
+profiles_directory = os.path.join(os.path.dirname(__file__), "profiles")
+
+db_config = {
+    "user"      : "root",
+    "password"  : "root",
+    "host"      : "localhost",
+    "port"      : 3306,
+    "database"  : "personnal_finance_db",
+    # connection pool shared by all extractors, transformers and loaders
+    "pool_size"     : 5,
+    "pool_pre_ping" : True,
+    "pool_recycle"  : 3600
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    # options shared by the commands loading files
+    files = argparse.ArgumentParser(add_help=False)
+    files.add_argument("--workers", type=int, default=1, help="number of processes extracting and transforming files in parallel")
+    files.add_argument("--batch-rows", type=int, default=None, help="load files together until a batch holds this many rows")
+    files.add_argument("--batch-seconds", type=float, default=None, help="load files together until a batch is this old")
+    files.add_argument("--ignore-import-manifest", action="store_true", help="process every file again, even the ones already imported")
+    files.add_argument("--ofx-chunk-size", type=int, default=None, help="stream the OFX files, transformed and loaded by chunks of this many transactions")
+    files.add_argument("--csv-chunk-size", type=int, default=None, help="stream the securities CSV files, transformed and loaded by chunks of this many operations")
+
+    wallet = argparse.ArgumentParser(add_help=False)
+    wallet.add_argument("--check-wallet", action="store_true", help="compare the materialized securities wallet with the securities_wallet_evolution view")
+
+    chunks = argparse.ArgumentParser(add_help=False)
+    chunks.add_argument("--chunk-size", type=int, default=10000, help="number of transactions read per chunk")
+
+    # also set by the ETL_PROFILE (comma separated stages) and ETL_PROFILE_MEMORY=1 environment variables
+    profiling = argparse.ArgumentParser(add_help=False)
+    profiling.add_argument("--profile", nargs="*", metavar="STAGE", default=None,
+                           help="profile the stages matching these names (wildcards allowed, e.g. 'ofx.*' 'load.transactions'), every stage without a name")
+    profiling.add_argument("--profile-memory", action="store_true", help="--profile : also trace the memory allocations of the profiled stages (slow)")
+
+    parser = argparse.ArgumentParser(description="Personal finance ETL")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.add_parser("ofx", parents=[files, profiling], help="load the OFX files of data/to_process, then refresh what depends on the transactions")
+    commands.add_parser("csv", parents=[files, wallet, profiling], help="load the securities CSV files of data/to_process, then refresh the wallet")
+    commands.add_parser("prices", parents=[wallet, profiling], help="download the securities prices, then refresh the wallet")
+
+    all_steps = commands.add_parser("all", parents=[files, wallet, profiling], help="every step (default command)")
+    all_steps.add_argument("--watch", action="store_true", help="keep running and process the files as they arrive in data/to_process")
+    all_steps.add_argument("--poll-seconds", type=float, default=5, help="--watch : delay between two looks at data/to_process")
+    all_steps.add_argument("--settle-seconds", type=float, default=2, help="--watch : files are processed once data/to_process has not changed for this long")
+    # former options, now commands, kept for the existing scheduled tasks
+    all_steps.add_argument("--backfill-payment-methods", action="store_true", help=argparse.SUPPRESS)
+    all_steps.add_argument("--reclassify-categories", action="store_true", help=argparse.SUPPRESS)
+    all_steps.add_argument("--backfill-chunk-size", dest="chunk_size", type=int, default=10000, help=argparse.SUPPRESS)
+
+    replay = commands.add_parser("replay", parents=[files, wallet, profiling], help="load archived files again (import manifest ignored)")
+    replay.add_argument("patterns", nargs="*", default=["*"], help="names of the archived files (wildcards allowed), all of them by default")
+
+    commands.add_parser("backfill-payment-methods", parents=[chunks, profiling], help="resolve the payment method of the transactions already loaded")
+    commands.add_parser("reclassify-categories", parents=[chunks, profiling], help="resolve the categories of every transaction already loaded")
+    return parser
+
+def parse_args(argv: list) -> argparse.Namespace:
+    # without a command (former command line), every step is run
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        argv = ["all"] + argv
+    return build_parser().parse_args(argv)
+
+def build_main_pipeline(args: argparse.Namespace, import_manifest: bool = True, watch: bool = False):
+    from pipelines.main_pipeline import MainPipeline
+
+    import_manifest = import_manifest and not getattr(args, "ignore_import_manifest", False)
+    return MainPipeline(data_dir=data_directory, db_config=db_config, workers=getattr(args, "workers", 1),
+                        ofx_chunk_size=getattr(args, "ofx_chunk_size", None), csv_chunk_size=getattr(args, "csv_chunk_size", None),
+                        batch_rows=getattr(args, "batch_rows", None), batch_seconds=getattr(args, "batch_seconds", None),
+                        price_store_dir=os.path.join(data_directory, "price_store"),
+                        securities_info_cache_path=os.path.join(data_directory, "securities_info_cache.sqlite"),
+                        check_wallet=getattr(args, "check_wallet", False),
+                        import_manifest_path=os.path.join(data_directory, "import_manifest.sqlite") if import_manifest else None,
+                        # clean payees, payment methods and categories edited meanwhile are picked up every 10 minutes
+                        reference_data_ttl=600 if watch else None,
+                        # --batch-rows / --batch-seconds batches gather the files of several cycles
+                        hold_batches=watch)
+
+def configure_profiling(args: argparse.Namespace):
+    from db.profiling import profiler
+
+    patterns = args.profile
+    if patterns is None:
+        patterns = os.environ.get("ETL_PROFILE", "").split(",")
+    elif not patterns:
+        patterns = ["*"]
+    memory = args.profile_memory or os.environ.get("ETL_PROFILE_MEMORY") == "1"
+    profiler.configure(patterns, os.path.join(profiles_directory, datetime.datetime.now().strftime("%Y%m%d_%H%M%S")), memory)
+
+def run_command(args: argparse.Namespace):
+    from db.metrics import metrics
+    metrics.configure(metrics_jsonl_path, metrics_prometheus_path)
+    configure_profiling(args)
+
+    if args.command == "backfill-payment-methods" or getattr(args, "backfill_payment_methods", False):
+        from pipelines.payment_method_backfill_pipeline import PaymentMethodBackfillPipeline
+        PaymentMethodBackfillPipeline(db_config, chunk_size=args.chunk_size).run()
+        metrics.finish_run()
+    elif args.command == "reclassify-categories" or getattr(args, "reclassify_categories", False):
+        from pipelines.category_reclassification_pipeline import CategoryReclassificationPipeline
+        CategoryReclassificationPipeline(db_config, full=True, chunk_size=args.chunk_size).run()
+        metrics.finish_run()
+    elif args.command == "ofx":
+        pipeline = build_main_pipeline(args)
+        pipeline.run(pipeline.run_ofx)
+    elif args.command == "csv":
+        pipeline = build_main_pipeline(args)
+        pipeline.run(pipeline.run_csv)
+    elif args.command == "prices":
+        pipeline = build_main_pipeline(args)
+        pipeline.run(pipeline.run_prices)
+    elif args.command == "replay":
+        # files already in the manifest would be skipped, or trimmed to nothing
+        pipeline = build_main_pipeline(args, import_manifest=False)
+        pipeline.run(lambda: pipeline.run_replay(args.patterns))
+    elif args.watch:
+        from pipelines.watch_pipeline import WatchPipeline
+        WatchPipeline(build_main_pipeline(args, watch=True), poll_seconds=args.poll_seconds, settle_seconds=args.settle_seconds).run()
+    else:
+        build_main_pipeline(args).run()
 
 if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+
     logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(filename)s - %(funcName)s - %(message)s',
@@ -10,13 +146,4 @@ if __name__ == "__main__":
     filemode="a"
     )
 
-    data_directory = os.path.join(os.path.dirname(__file__), "data")
-    
-    db_config = {
-        "user"      : "root",
-        "password"  : "root",
-        "host"      : "localhost",
-        "port"      : 3306,
-        "database"  : "personnal_finance_db"
-    }
-    MainPipeline(data_dir=data_directory, db_config=db_config).run()
\ No newline at end of file
+    run_command(args)
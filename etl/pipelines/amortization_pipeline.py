@@ -0,0 +1,42 @@
+from extract.mysql_extractor import MySQLExtractor
+from transform.amortization_engine import AmortizationEngine, loan_fingerprints
+from load.mysql_loader import MySQLLoader
+import pandas as pd
+import logging
+
+class AmortizationPipeline:
+    # Keeps loan_amortization_schedule up to date : a loan is recomputed only when its row or its
+    # early payments change (fingerprint saved in loan_amortization_state)
+    def __init__(self, db_config:dict):
+        self.db_config = db_config
+
+    def run(self):
+        #1. Extract loans and compare their fingerprints with the last computed ones
+        logging.info("Extracting loans")
+        db_extractor = MySQLExtractor(self.db_config)
+        loans = db_extractor.get_loans()
+        early_payments = db_extractor.get_loan_early_payments()
+        fingerprints = loan_fingerprints(loans, early_payments)
+        stored = db_extractor.get_loan_amortization_state().set_index("loan_id")["fingerprint"]
+
+        stale = [loan_id for loan_id, fingerprint in fingerprints.items() if stored.get(loan_id) != fingerprint]
+        removed = [int(loan_id) for loan_id in stored.index if loan_id not in fingerprints.index]
+        if not stale and not removed:
+            logging.info("REPORT : loan amortization schedules up to date")
+            return
+
+        #2. Compute the schedules of the changed loans
+        logging.info(f"Computing amortization schedules of {len(stale)} loan(s)")
+        schedule = AmortizationEngine(loans[loans["id"].isin(stale)], early_payments).compute()
+        refresh = pd.DataFrame({
+            "loan_id"       : stale + removed,
+            "fingerprint"   : [fingerprints[loan_id] for loan_id in stale] + [None] * len(removed)
+        })
+
+        #3. Load data
+        loader = MySQLLoader(self.db_config, {
+            "loan_amortization_refresh"     : refresh,
+            "loan_amortization_schedule"    : schedule
+        })
+        loader.load_all()
+        logging.info(f"REPORT : loan amortization - {len(stale)} loan(s) recomputed - {len(removed)} removed - {len(schedule)} month(s) written")
@@ -0,0 +1,32 @@
+from extract.mysql_extractor import MySQLExtractor
+from transform.balance_history_engine import BalanceHistoryEngine
+from load.mysql_loader import MySQLLoader
+import logging
+
+class BalanceHistoryPipeline:
+    def __init__(self, db_config:dict):
+        self.db_config = db_config
+
+    def run(self):
+        #1. Extract monthly aggregates from DB
+        logging.info("Extracting balance history inputs")
+        db_extractor = MySQLExtractor(self.db_config)
+        engine = BalanceHistoryEngine(
+            db_extractor.get_last_balances(),
+            db_extractor.get_monthly_cash_flows(),
+            db_extractor.get_monthly_stock_values(),
+            db_extractor.get_min_transaction_date()
+        )
+
+        #2. Compute the series and keep the months changed since the last run
+        logging.info("Computing balance history")
+        clean_data = engine.diff(engine.compute(), db_extractor.get_balance_history())
+        refresh = clean_data["balance_history_refresh"]
+        if refresh.empty:
+            logging.info("REPORT : balance history up to date")
+            return
+
+        #3. Load data
+        loader = MySQLLoader(self.db_config, clean_data)
+        loader.load_all()
+        logging.info(f"REPORT : balance history - {len(refresh)} account serie(s) refreshed - {len(clean_data['balance_history'])} month(s) written")
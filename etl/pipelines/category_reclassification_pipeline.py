@@ -0,0 +1,74 @@
+from extract.mysql_extractor import MySQLExtractor
+from transform.category_map import CategoryMap
+from load.mysql_loader import MySQLLoader
+import logging
+
+class CategoryReclassificationPipeline:
+    # Keeps transactions.category_id / parent_category_id in line with the categories and their
+    # links. The category map is compared with the snapshot saved at the previous run : only the
+    # transactions of the changed payees are reclassified, all of them when there is no snapshot
+    # yet or when full is set.
+    def __init__(self, db_config:dict, full:bool = False, chunk_size:int = 10000):
+        self.db_config = db_config
+        self.full = full
+        self.chunk_size = chunk_size
+
+    def reclassify(self, category_map: CategoryMap, transactions) -> tuple:
+        # returns (updated, in error) transaction counts
+        categories = category_map.resolve(transactions)
+        current = transactions[["category_id", "parent_category_id"]].astype("Int64").fillna(-1)
+        changed = transactions[
+            (current["category_id"] != categories["category_id"].fillna(-1))
+            | (current["parent_category_id"] != categories["parent_category_id"].fillna(-1))
+        ]
+        if changed.empty:
+            return 0, 0
+
+        loader = MySQLLoader(self.db_config, {
+            "transactions_categories" : categories.loc[changed.index].assign(id=changed["id"])[["id", "category_id", "parent_category_id"]]
+        })
+        loader.load_all()
+        return (0, len(changed)) if loader.errors else (len(changed), 0)
+
+    def run(self):
+        #1. Extract the category map and compare it with the last snapshot
+        db_extractor = MySQLExtractor(self.db_config)
+        category_map = CategoryMap(db_extractor.get_categories(), db_extractor.get_categories_links(), db_extractor.get_payment_methods())
+        full, payees = category_map.diff(db_extractor.get_category_map_snapshot())
+        full = full or self.full
+
+        #2. Reclassify the affected transactions
+        row_counter = 0
+        update_counter = 0
+        error_counter = 0
+        if full:
+            # transaction ids come from the bank files (FITID) : start below any BIGINT
+            last_id = -2**63
+            while True:
+                transactions = db_extractor.get_transactions_categories(last_id, self.chunk_size)
+                if transactions.empty:
+                    break
+                last_id = int(transactions["id"].iloc[-1])
+                row_counter += len(transactions)
+
+                updated, failed = self.reclassify(category_map, transactions)
+                update_counter += updated
+                error_counter += failed
+        else:
+            transactions = db_extractor.get_transactions_to_reclassify(
+                payees["entry_key"].unique().tolist(),
+                category_map.withdrawal_payment_method_ids,
+                category_map.withdrawal_category_id
+            )
+            row_counter = len(transactions)
+            if not transactions.empty:
+                update_counter, error_counter = self.reclassify(category_map, transactions)
+
+        #3. Save the map : the next run only looks at what changes from now on
+        if error_counter:
+            logging.error(f"ERROR : category map snapshot not saved, {error_counter} transaction(s) could not be reclassified")
+        elif full or not payees.empty:
+            MySQLLoader(self.db_config, {"category_map_snapshot": category_map.snapshot()}).load_all()
+
+        logging.info(f"REPORT : category reclassification ({'full' if full else f'{len(payees)} changed payee link(s)'}) - "
+                     f"{row_counter} transaction(s) read - {update_counter} updated - {error_counter} in error")
@@ -1,33 +1,134 @@
 from extract.csv_securities_extractor import CsvSecuritiesExtractor
 from transform.csv_securities_transformer import CsvSecuritiesTransformer
 from load.mysql_loader import MySQLLoader
+from db.import_manifest import date_ranges, merge_date_ranges, trim_to_imported_ranges
+from db.metrics import metrics
 import logging
+import os
 from pathlib import Path
 
+# key columns of the dimension tables of a file, loaded with its first chunk in streaming mode
+DIMENSION_KEYS = {
+    "accounts"      : ["id"],
+    "securities"    : ["name", "isin"]
+}
+
 class CsvSecuritiesPipeline:
-    def __init__(self, file_path:str, db_config:dict):
+    def __init__(self, file_path:str, db_config:dict, imported_ranges:dict = None, chunk_size:int = None):
         self.file_path = file_path
         self.file_name = Path(file_path).name
         self.db_config = db_config
+        # streaming mode : the file is transformed and loaded by chunks of chunk_size operations
+        self.chunk_size = chunk_size
+        # {account_id: [(first date, last date)] already imported}, operations inside are dropped before transforming
+        self.imported_ranges = imported_ranges or {}
+        # outcome of the load, followed by the import manifest
+        self.errors = []
+        self.date_ranges = {}
+        # operations read and already imported, over every chunk
+        self.rows_read = 0
+        self.rows_skipped = 0
         
-    def run(self):
+    def get_date_ranges(self, clean_data: dict) -> dict:
+        return date_ranges(clean_data["security_operations"], "account_id", "date")
+        
+    def trim(self, raw_data):
+        with metrics.stage("csv.trim", rows_in=len(raw_data), file=self.file_name) as stage:
+            trimmed = trim_to_imported_ranges(raw_data, "account_id", "Date", self.imported_ranges)
+            stage.rows_out = len(trimmed)
+        self.rows_read += len(raw_data)
+        self.rows_skipped += len(raw_data) - len(trimmed)
+        if len(trimmed) < len(raw_data):
+            logging.info(f"{len(raw_data) - len(trimmed)} operation(s) already imported skipped from {self.file_name}")
+        return trimmed
+        
+    def warn_if_all_skipped(self):
+        # the file is archived as imported without loading anything
+        if self.rows_read and self.rows_skipped == self.rows_read:
+            logging.warning(f"Every operation of {self.file_name} ({self.rows_read}) was already imported : nothing loaded")
+        
+    def transform(self, raw_data) -> dict:
+        raw_data = self.trim(raw_data)
+        with metrics.stage("csv.transform", rows_in=len(raw_data), file=self.file_name) as stage:
+            transformer = CsvSecuritiesTransformer(raw_data)
+            clean_data = transformer.transform_all()
+            stage.rows_out = len(clean_data["security_operations"])
+        return clean_data
+        
+    def load_all(self, clean_data: dict) -> list:
+        # returns the tables which could not be loaded
+        loader = MySQLLoader(
+            self.db_config,
+            clean_data
+        )
+
+        with metrics.stage("csv.load", rows_in=len(clean_data["security_operations"]), file=self.file_name) as stage:
+            loader.load_all()
+            stage.rows_out = loader.rows_written
+            if loader.errors:
+                stage.fail(f"Unable to load {', '.join(loader.errors)}")
+        return loader.errors
+        
+    def drop_loaded_dimensions(self, clean_data: dict, loaded_keys: dict) -> dict:
+        # accounts and securities already sent with a previous chunk are not merged again
+        for table, columns in DIMENSION_KEYS.items():
+            df = clean_data[table]
+            keys = list(df[columns].itertuples(index=False, name=None))
+            seen = loaded_keys.setdefault(table, set())
+            clean_data[table] = df[[key not in seen for key in keys]]
+            seen.update(keys)
+        return clean_data
+        
+    def run_chunks(self):
+        # streaming mode : each chunk of operations is transformed and loaded on its own
+        extractor = CsvSecuritiesExtractor(self.file_path, chunk_size=self.chunk_size)
+        loaded_keys = {}
+        
+        for chunk_number, raw_data in enumerate(extractor.iter_chunks(), start=1):
+            logging.info(f"Transforming chunk {chunk_number} from {self.file_name}")
+            clean_data = self.drop_loaded_dimensions(self.transform(raw_data), loaded_keys)
+            # chunk already imported (import manifest)
+            if all(df.empty for df in clean_data.values()):
+                continue
+            
+            logging.info(f"Loading chunk {chunk_number} into MySQL from {self.file_name}")
+            errors = self.load_all(clean_data)
+            self.errors += errors
+            # a dimension row of a failed chunk is sent again with the next chunk holding it
+            if errors:
+                loaded_keys.clear()
+            self.date_ranges = merge_date_ranges(self.date_ranges, self.get_date_ranges(clean_data))
+        
+        self.warn_if_all_skipped()
+        logging.info(f"Data loaded from {self.file_name}")
+        
+    def extract_transform(self) -> dict:
         #1. Extract data
         logging.info(f"Extracting data from {self.file_name}")
-        extractor = CsvSecuritiesExtractor(self.file_path)
-        raw_data = extractor.extract_securities()
+        with metrics.stage("csv.extract", bytes_read=os.path.getsize(self.file_path), file=self.file_name) as stage:
+            extractor = CsvSecuritiesExtractor(self.file_path)
+            raw_data = extractor.extract_securities()
+            stage.rows_out = len(raw_data)
         
         #2. Transform data
         logging.info(f"Transforming data from {self.file_name}")
-        transformer = CsvSecuritiesTransformer(raw_data)
-        clean_data = transformer.transform_all()
+        clean_data = self.transform(raw_data)
+        self.warn_if_all_skipped()
+        return clean_data
         
+    def load(self, clean_data: dict):
         #3. Load data
         logging.info(f"Loading data into MySQL from {self.file_name}")
-        loader = MySQLLoader(
-            self.db_config,
-            clean_data
-        )
-
-        loader.load_all()
+        self.errors = self.load_all(clean_data)
+        self.date_ranges = self.get_date_ranges(clean_data)
         
         logging.info(f"Data loaded from {self.file_name}")
+        
+    def run(self):
+        with metrics.stage("csv.run", bytes_read=os.path.getsize(self.file_path), file=self.file_name) as stage:
+            if self.chunk_size:
+                self.run_chunks()
+            else:
+                self.load(self.extract_transform())
+            if self.errors:
+                stage.fail(f"Unable to load {', '.join(self.errors)}")
@@ -1,15 +1,77 @@
+import fnmatch
 import os
 import pathlib
-from pipelines.csv_securities_pipeline import CsvSecuritiesPipeline
-from pipelines.ofx_pipeline import OfxPipeline
-from pipelines.yfinance_pipeline import YfinancePipeline
+# the pipeline of each step is imported by the step itself : a command only pays for the
+# libraries it uses (ofxparse for the OFX files, yfinance for the prices...)
+from db.engine_registry import registry
+from db.import_manifest import ImportManifest, file_hash
+from db.metrics import metrics
+from db.profiling import profiler
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import shutil
+import signal
+import threading
+import time
 import logging
 
+# payee matcher, payment method matcher and category map of a worker process : built by its first
+# OFX file and reused by the next ones, the pool of workers only lives for one run
+worker_reference_data = {}
+
+def extract_transform_file(pipeline_class, file_path: str, db_config: dict, imported_ranges: dict = None, share_reference_data: bool = False) -> tuple:
+    # runs in a worker process of MainPipeline.process_files_concurrently : the metrics of its
+    # stages are returned with the transformed data, the main process writes them
+    options = {"reference_data": worker_reference_data} if share_reference_data else {}
+    clean_data = pipeline_class(file_path, db_config, imported_ranges=imported_ranges, **options).extract_transform()
+    return clean_data, metrics.drain()
+
+def init_worker(profiler_settings: tuple = ()):
+    # worker processes : Ctrl+C is handled by the main process, which lets the files in flight finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # metrics are kept in memory until handed over to the main process, profiles are written by the worker
+    metrics.configure()
+    profiler.configure(*profiler_settings)
+
 class MainPipeline:
-    def __init__(self, data_dir: str, db_config: dict):
+    def __init__(self, data_dir: str, db_config: dict, ofx_chunk_size: int = None, csv_chunk_size: int = None, workers: int = 1, batch_rows: int = None, batch_seconds: float = None, price_store_dir: str = None, securities_info_cache_path: str = None, check_wallet: bool = False, import_manifest_path: str = None, reference_data_ttl: float = None, hold_batches: bool = False):
         self.data_dir = data_dir
         self.db_config = db_config
+        self.ofx_chunk_size = ofx_chunk_size
+        self.csv_chunk_size = csv_chunk_size
+        self.workers = max(workers or 1, 1)
+        # micro-batching : files are loaded together up to batch_rows rows or batch_seconds seconds
+        self.batch_rows = batch_rows
+        self.batch_seconds = batch_seconds
+        # long running processes : a batch which is not full waits for the files of the next cycles,
+        # {extension: BatchLoader} (its files stay in to_process until it is loaded)
+        self.hold_batches = hold_batches
+        self.batches = {}
+        # local copy of the downloaded prices, yfinance is only asked for the missing dates
+        self.price_store_dir = price_store_dir
+        # securities metadata already looked up (or known to be missing) are not asked again
+        self.securities_info_cache_path = securities_info_cache_path
+        # compare the materialized securities wallet with its view after the refresh
+        self.check_wallet = check_wallet
+        # files already loaded (content hash) are skipped, overlapping ones are trimmed to the new dates
+        self.import_manifest = ImportManifest(import_manifest_path) if import_manifest_path else None
+        self.file_hashes = {}
+        self.file_date_ranges = {}
+        # payee matcher, payment method matcher and category map shared by the OFX files, rebuilt
+        # after reference_data_ttl seconds (long running processes), once per run otherwise
+        self.reference_data = {}
+        self.reference_data_ttl = reference_data_ttl
+        self.reference_data_built_at = None
+        # set to stop between two files : the files in flight are finished, the others wait for the next run
+        self.stop_event = threading.Event()
+        
+    def refresh_reference_data(self):
+        now = time.monotonic()
+        if self.reference_data_built_at is None or self.reference_data_ttl is None or now - self.reference_data_built_at >= self.reference_data_ttl:
+            self.reference_data.clear()
+            self.reference_data_built_at = now
+            
+    def is_stopping(self) -> bool:
+        return self.stop_event.is_set()
         
     def move_file_to(self, file_path, to_folder):
         if not os.path.exists(file_path):
@@ -30,73 +92,347 @@ class MainPipeline:
         #move file
         file_path = shutil.move(file_path, to_folder)
         
-    def process_all_csv_securities_files(self):
-        #1. move error files to process folder
+    def move_error_files_to_process(self, extension: str):
         file_counter = 0
         for file in os.scandir(os.path.join(self.data_dir,"error")):
             _, ext = os.path.splitext(file.name)
-            if file.is_file() and ext.lower() == ".csv":
+            if file.is_file() and ext.lower() == extension:
                 self.move_file_to(file, os.path.join(self.data_dir,"to_process"))
                 file_counter += 1
                 logging.info(f"Moving from error directory {file.name}")
-        logging.info(f"REPORT : {file_counter} file(s) moved to processing folder")
+        metrics.count("files", file_counter, source=extension.lstrip("."), outcome="retried")
         
-        #2. process all ofx files in to_process folder
-        file_counter = 0
-        file_counter_error = 0
+    def list_files_to_process(self, extension: str) -> list:
+        files = []
+        held_files = self.held_files()
         for file in os.scandir(os.path.join(self.data_dir,"to_process")):
             _, ext = os.path.splitext(file.name)
-            if file.is_file() and ext.lower() == ".csv":
-                try:
-                    pipeline = CsvSecuritiesPipeline(file.path, self.db_config)
-                    pipeline.run()
-                    self.move_file_to(file, os.path.join(self.data_dir,"archives"))
-                    file_counter += 1
-                except Exception as e:
-                    logging.error(f"Error processing {file.name} : {e}")
-                    self.move_file_to(file, os.path.join(self.data_dir,"error"))
-                    file_counter_error += 1
-        logging.info(f"REPORT : {file_counter} file(s) successfully processed - {file_counter_error} file(s) encountered an error")
+            if file.is_file() and ext.lower() == extension and file.path not in held_files:
+                files.append(file)
+        return files
         
-    def process_all_ofx_files(self):
-        #1. move error files to process folder
+    def skip_imported_files(self, files: list, extension: str) -> list:
+        # identical files already loaded are archived without being processed
+        if self.import_manifest is None:
+            return files
+        
+        files_to_process = []
         file_counter = 0
-        for file in os.scandir(os.path.join(self.data_dir,"error")):
-            _, ext = os.path.splitext(file.name)
-            if file.is_file() and ext.lower() == ".ofx":
-                self.move_file_to(file, os.path.join(self.data_dir,"to_process"))
+        for file in files:
+            content_hash = file_hash(file.path)
+            if self.import_manifest.contains(content_hash):
+                logging.info(f"Skipping {file.name} : identical file already imported")
+                self.move_file_to(file, os.path.join(self.data_dir,"archives"))
                 file_counter += 1
-                logging.info(f"Moving from error directory {file.name}")
-        logging.info(f"REPORT : {file_counter} file(s) moved to processing folder")
+            else:
+                self.file_hashes[file.path] = content_hash
+                files_to_process.append(file)
+        metrics.count("files", file_counter, source=extension.lstrip("."), outcome="already_imported")
+        return files_to_process
         
+    def get_imported_ranges(self, extension: str) -> dict:
+        if self.import_manifest is None:
+            return {}
+        return self.import_manifest.imported_ranges(extension)
         
-        #2. process all ofx files in to_process folder
+    def record_import(self, file, date_ranges: dict):
+        # only files loaded without error are recorded
+        if self.import_manifest is None or file.path not in self.file_hashes:
+            return
+        _, ext = os.path.splitext(file.name)
+        self.import_manifest.record(self.file_hashes.pop(file.path), file.name, ext.lower(), date_ranges)
+        
+    def new_batch(self, extension: str):
+        if not self.batch_rows and not self.batch_seconds:
+            return None
+        if extension in self.batches:
+            return self.batches[extension]
+        from load.batch_loader import BatchLoader
+        batch = BatchLoader(self.db_config, self.batch_rows, self.batch_seconds)
+        if self.hold_batches:
+            self.batches[extension] = batch
+        return batch
+        
+    def held_files(self) -> set:
+        # paths of the files waiting in a held batch
+        return {file.path for batch in self.batches.values() for file in batch.files}
+        
+    def has_aged_batch(self) -> bool:
+        # a held batch full or old enough to be loaded, even if no other file comes
+        return any(batch.is_full() for batch in self.batches.values())
+        
+    def is_batch_over(self, batch) -> bool:
+        # end of the files of a cycle : a held batch is only loaded once full, or when stopping
+        return not self.hold_batches or batch.is_full() or self.is_stopping()
+        
+    def flush_held_batches(self):
+        for extension, batch in self.batches.items():
+            file_counter, file_counter_error = self.flush_batch(batch)
+            metrics.count("files", file_counter, source=extension.lstrip("."), outcome="processed")
+            metrics.count("files", file_counter_error, source=extension.lstrip("."), outcome="error")
+        
+    def move_processed_file(self, file, error = None):
+        if error is None:
+            self.move_file_to(file, os.path.join(self.data_dir,"archives"))
+        else:
+            logging.error(f"Error processing {file.name} : {error}")
+            self.move_file_to(file, os.path.join(self.data_dir,"error"))
+        
+    def flush_batch(self, batch) -> tuple:
         file_counter = 0
         file_counter_error = 0
-        for file in os.scandir(os.path.join(self.data_dir,"to_process")):
-            _, ext = os.path.splitext(file.name)
-            if file.is_file() and ext.lower() == ".ofx":
-                try:
-                    pipeline = OfxPipeline(file.path, self.db_config)
+        for file, error in batch.flush():
+            date_ranges = self.file_date_ranges.pop(file.path, {})
+            if error is None:
+                self.record_import(file, date_ranges)
+            self.move_processed_file(file, error)
+            if error is None:
+                file_counter += 1
+            else:
+                file_counter_error += 1
+        return file_counter, file_counter_error
+        
+    def process_files(self, files: list, build_pipeline, batch = None) -> tuple:
+        file_counter = 0
+        file_counter_error = 0
+        for file_number, file in enumerate(files):
+            if self.is_stopping():
+                logging.info(f"Stop requested : {len(files) - file_number} file(s) left to process")
+                break
+            try:
+                pipeline = build_pipeline(file.path)
+                if batch is None:
                     pipeline.run()
-                    self.move_file_to(file, os.path.join(self.data_dir,"archives"))
+                    if not pipeline.errors:
+                        self.record_import(file, pipeline.date_ranges)
+                    self.move_processed_file(file)
                     file_counter += 1
-                except Exception as e:
-                    logging.error(f"Error processing {file.name} : {e}")
-                    self.move_file_to(file, os.path.join(self.data_dir,"error"))
-                    file_counter_error += 1
-        logging.info(f"REPORT : {file_counter} file(s) successfully processed - {file_counter_error} file(s) encountered an error")
+                else:
+                    # archived once its batch is loaded
+                    clean_data = pipeline.extract_transform()
+                    self.file_date_ranges[file.path] = pipeline.get_date_ranges(clean_data)
+                    batch.add(file, clean_data)
+            except Exception as e:
+                self.move_processed_file(file, e)
+                file_counter_error += 1
+                
+            if batch is not None and batch.is_full():
+                loaded, failed = self.flush_batch(batch)
+                file_counter += loaded
+                file_counter_error += failed
+                
+        if batch is not None and self.is_batch_over(batch):
+            loaded, failed = self.flush_batch(batch)
+            file_counter += loaded
+            file_counter_error += failed
+        return file_counter, file_counter_error
+        
+    def process_files_concurrently(self, files: list, pipeline_class, batch = None, imported_ranges: dict = None, share_reference_data: bool = False) -> tuple:
+        # extract + transform run in worker processes, the main process is the only writer :
+        # loads are applied one file (or one batch) at a time so concurrent inserts never fight
+        # over the shared dimension tables (currencies, accounts, securities...)
+        file_counter = 0
+        file_counter_error = 0
+        files = iter(files)
+        pending = {}
+        
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(profiler.settings(),)) as executor:
+            def submit_next():
+                if self.is_stopping():
+                    return
+                file = next(files, None)
+                if file is not None:
+                    future = executor.submit(extract_transform_file, pipeline_class, file.path, self.db_config, imported_ranges, share_reference_data)
+                    pending[future] = file
+                    
+            # bounded number of files in flight : transformed data waiting for the writer stays small
+            for _ in range(self.workers * 2):
+                submit_next()
+                
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file = pending.pop(future)
+                    try:
+                        clean_data, records = future.result()
+                        metrics.add(records)
+                        pipeline = pipeline_class(file.path, self.db_config)
+                        if batch is None:
+                            pipeline.load(clean_data)
+                            if not pipeline.errors:
+                                self.record_import(file, pipeline.date_ranges)
+                            self.move_processed_file(file)
+                            file_counter += 1
+                        else:
+                            self.file_date_ranges[file.path] = pipeline.get_date_ranges(clean_data)
+                            batch.add(file, clean_data)
+                    except Exception as e:
+                        self.move_processed_file(file, e)
+                        file_counter_error += 1
+                    submit_next()
+                    
+                if batch is not None and batch.is_full():
+                    loaded, failed = self.flush_batch(batch)
+                    file_counter += loaded
+                    file_counter_error += failed
+                    
+        if batch is not None and self.is_batch_over(batch):
+            loaded, failed = self.flush_batch(batch)
+            file_counter += loaded
+            file_counter_error += failed
+        return file_counter, file_counter_error
+        
+    def process_all_csv_securities_files(self):
+        from pipelines.csv_securities_pipeline import CsvSecuritiesPipeline
+        
+        #1. move error files to process folder
+        self.move_error_files_to_process(".csv")
+        
+        #2. process all csv files in to_process folder
+        files = self.skip_imported_files(self.list_files_to_process(".csv"), ".csv")
+        imported_ranges = self.get_imported_ranges(".csv")
+        # streaming chunks are loaded as they are read : no worker pool nor batch for them
+        if self.csv_chunk_size:
+            file_counter, file_counter_error = self.process_files(files, lambda path: CsvSecuritiesPipeline(path, self.db_config, imported_ranges, self.csv_chunk_size))
+        elif self.workers > 1 and len(files) > 1:
+            file_counter, file_counter_error = self.process_files_concurrently(files, CsvSecuritiesPipeline, self.new_batch(".csv"), imported_ranges)
+        else:
+            file_counter, file_counter_error = self.process_files(files, lambda path: CsvSecuritiesPipeline(path, self.db_config, imported_ranges), self.new_batch(".csv"))
+        metrics.count("files", file_counter, source="csv", outcome="processed")
+        metrics.count("files", file_counter_error, source="csv", outcome="error")
+        
+    def process_all_ofx_files(self):
+        from pipelines.ofx_pipeline import OfxPipeline
+        
+        #1. move error files to process folder
+        self.move_error_files_to_process(".ofx")
+        
+        #2. process all ofx files in to_process folder
+        files = self.skip_imported_files(self.list_files_to_process(".ofx"), ".ofx")
+        imported_ranges = self.get_imported_ranges(".ofx")
+        # streaming chunks are loaded as they are parsed : no worker pool nor batch for them
+        if self.ofx_chunk_size:
+            file_counter, file_counter_error = self.process_files(files, lambda path: OfxPipeline(path, self.db_config, self.ofx_chunk_size, imported_ranges, self.reference_data))
+        elif self.workers > 1 and len(files) > 1:
+            file_counter, file_counter_error = self.process_files_concurrently(files, OfxPipeline, self.new_batch(".ofx"), imported_ranges, share_reference_data=True)
+        else:
+            file_counter, file_counter_error = self.process_files(files, lambda path: OfxPipeline(path, self.db_config, imported_ranges=imported_ranges, reference_data=self.reference_data), self.new_batch(".ofx"))
+        metrics.count("files", file_counter, source="ofx", outcome="processed")
+        metrics.count("files", file_counter_error, source="ofx", outcome="error")
 
     def process_yfinance(self):
-        pipeline = YfinancePipeline(self.db_config)
+        from pipelines.yfinance_pipeline import YfinancePipeline
+        from db.price_store import PriceStore
+        from db.securities_info_cache import SecuritiesInfoCache
+        from extract.securities_info_resolver import SecuritiesInfoResolver
+        
+        price_store = PriceStore(self.price_store_dir) if self.price_store_dir else None
+        info_cache = SecuritiesInfoCache(self.securities_info_cache_path) if self.securities_info_cache_path else None
+        pipeline = YfinancePipeline(self.db_config, price_store=price_store, info_resolver=SecuritiesInfoResolver(cache=info_cache))
+        pipeline.run()
+
+    def process_categories(self):
+        from pipelines.category_reclassification_pipeline import CategoryReclassificationPipeline
+        pipeline = CategoryReclassificationPipeline(self.db_config)
+        pipeline.run()
+
+    def process_securities_wallet(self):
+        from pipelines.securities_wallet_pipeline import SecuritiesWalletPipeline
+        pipeline = SecuritiesWalletPipeline(self.db_config, self.check_wallet)
+        pipeline.run()
+
+    def process_balance_history(self):
+        from pipelines.balance_history_pipeline import BalanceHistoryPipeline
+        pipeline = BalanceHistoryPipeline(self.db_config)
+        pipeline.run()
+
+    def process_amortization(self):
+        from pipelines.amortization_pipeline import AmortizationPipeline
+        pipeline = AmortizationPipeline(self.db_config)
+        pipeline.run()
+
+    def process_planned_transactions(self):
+        from pipelines.planned_transactions_pipeline import PlannedTransactionsPipeline
+        pipeline = PlannedTransactionsPipeline(self.db_config)
         pipeline.run()
 
-    def run(self):
+    def run_cycle(self, prices: bool = True):
+        # every step of a run, engines are left open for the next cycle
+        self.refresh_reference_data()
+        
         # Source OFX
         self.process_all_ofx_files()
         
+        # Categories of the transactions already loaded, after a change of categories or links
+        self.process_categories()
+        
+        # Payment status of the planned transactions, after new transactions
+        self.process_planned_transactions()
+        
         # Source csv securities
         self.process_all_csv_securities_files()
         
-        # Source yfinance
+        # Source yfinance (left to a later cycle when a stop is requested)
+        if prices and not self.is_stopping():
+            self.process_yfinance()
+        
+        # Materialized securities wallet, after new operations and prices
+        self.process_securities_wallet()
+        
+        # Monthly balances, from the transactions, balances and securities wallet
+        self.process_balance_history()
+        
+        # Loan schedules, after a change of the loans or their early payments
+        self.process_amortization()
+
+    def run_ofx(self):
+        # OFX files, then what depends on the transactions
+        self.refresh_reference_data()
+        self.process_all_ofx_files()
+        self.process_categories()
+        self.process_planned_transactions()
+        self.process_balance_history()
+
+    def run_csv(self):
+        # securities CSV files, then what depends on the operations
+        self.process_all_csv_securities_files()
+        self.process_securities_wallet()
+        self.process_balance_history()
+
+    def run_prices(self):
+        # yfinance prices, then what depends on them
         self.process_yfinance()
+        self.process_securities_wallet()
+        self.process_balance_history()
+
+    def replay_archived_files(self, patterns: list) -> set:
+        # moves the archived files matching one of the patterns back to to_process, returns their extensions
+        extensions = set()
+        file_counter = 0
+        for file in os.scandir(os.path.join(self.data_dir,"archives")):
+            _, ext = os.path.splitext(file.name)
+            if file.is_file() and ext.lower() in (".ofx", ".csv") and any(fnmatch.fnmatch(file.name, pattern) for pattern in patterns):
+                self.move_file_to(file, os.path.join(self.data_dir,"to_process"))
+                extensions.add(ext.lower())
+                file_counter += 1
+                logging.info(f"Replaying archived file {file.name}")
+        metrics.count("files", file_counter, outcome="replayed")
+        return extensions
+
+    def run_replay(self, patterns: list):
+        # archived files loaded again, e.g. after a fix of their transformer
+        extensions = self.replay_archived_files(patterns)
+        if ".ofx" in extensions:
+            self.run_ofx()
+        if ".csv" in extensions:
+            self.run_csv()
+
+    def run(self, stage = None):
+        # stage : one of the run_* methods, every step (run_cycle) by default
+        try:
+            (stage or self.run_cycle)()
+        finally:
+            # engines are shared by every pipeline of the run
+            registry.log_pool_metrics()
+            metrics.finish_run()
+            registry.dispose_all()
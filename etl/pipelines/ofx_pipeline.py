@@ -1,33 +1,118 @@
 from extract.ofx_extractor import OfxExtractor
 from transform.ofx_transformer import OfxTransformer
 from load.mysql_loader import MySQLLoader
+from db.import_manifest import date_ranges, merge_date_ranges, trim_to_imported_ranges
+from db.metrics import metrics
 import logging
+import os
 from pathlib import Path
 
 class OfxPipeline:
-    def __init__(self, file_path:str, db_config:dict):
+    def __init__(self, file_path:str, db_config:dict, chunk_size:int = None, imported_ranges:dict = None, reference_data:dict = None):
         self.file_path = file_path
         self.file_name = Path(file_path).name
         self.db_config = db_config
+        self.chunk_size = chunk_size
+        # {account_id: [(first date, last date)] already imported}, transactions inside are dropped before transforming
+        self.imported_ranges = imported_ranges or {}
+        # payee matcher, payment method matcher and category map, built by the first transformer
+        # and shared with the next ones (next chunks, next files of MainPipeline)
+        self.reference_data = reference_data if reference_data is not None else {}
+        # outcome of the load, followed by the import manifest
+        self.errors = []
+        self.date_ranges = {}
+        # transactions read and already imported, over every chunk
+        self.rows_read = 0
+        self.rows_skipped = 0
         
-    def run(self):
+    def trim(self, raw_data: dict) -> dict:
+        transactions = raw_data["transactions"]
+        with metrics.stage("ofx.trim", rows_in=len(transactions), file=self.file_name) as stage:
+            raw_data["transactions"] = trim_to_imported_ranges(transactions, "account_id", "date", self.imported_ranges)
+            stage.rows_out = len(raw_data["transactions"])
+        self.rows_read += len(transactions)
+        self.rows_skipped += len(transactions) - len(raw_data["transactions"])
+        if len(raw_data["transactions"]) < len(transactions):
+            logging.info(f"{len(transactions) - len(raw_data['transactions'])} transaction(s) already imported skipped from {self.file_name}")
+        return raw_data
+        
+    def warn_if_all_skipped(self):
+        # the file is archived as imported without loading anything
+        if self.rows_read and self.rows_skipped == self.rows_read:
+            logging.warning(f"Every transaction of {self.file_name} ({self.rows_read}) was already imported : nothing loaded")
+        
+    def transform(self, raw_data: dict) -> dict:
+        raw_data = self.trim(raw_data)
+        with metrics.stage("ofx.transform", rows_in=len(raw_data["transactions"]), file=self.file_name) as stage:
+            transformer = OfxTransformer(raw_data, self.db_config, **self.reference_data)
+            clean_data = transformer.transform_all()
+            stage.rows_out = len(clean_data["transactions"])
+        self.reference_data.update(
+            payee_matcher=transformer.payee_matcher,
+            payment_method_matcher=transformer.payment_method_matcher,
+            category_map=transformer.category_map
+        )
+        return clean_data
+        
+    def get_date_ranges(self, clean_data: dict) -> dict:
+        return date_ranges(clean_data["transactions"], "account_id", "date")
+        
+    def load_all(self, clean_data: dict) -> list:
+        # returns the tables which could not be loaded
+        loader = MySQLLoader(
+            self.db_config,
+            clean_data
+        )
+
+        with metrics.stage("ofx.load", rows_in=len(clean_data["transactions"]), file=self.file_name) as stage:
+            loader.load_all()
+            stage.rows_out = loader.rows_written
+            if loader.errors:
+                stage.fail(f"Unable to load {', '.join(loader.errors)}")
+        return loader.errors
+        
+    def run_chunks(self):
+        # streaming mode : each chunk of transactions is transformed and loaded on its own
+        exctractor = OfxExtractor(self.file_path, streaming=True, chunk_size=self.chunk_size)
+        
+        for chunk_number, raw_data in enumerate(exctractor.iter_chunks(), start=1):
+            logging.info(f"Transforming chunk {chunk_number} from {self.file_name}")
+            clean_data = self.transform(raw_data)
+            
+            logging.info(f"Loading chunk {chunk_number} into MySQL from {self.file_name}")
+            self.errors += self.load_all(clean_data)
+            self.date_ranges = merge_date_ranges(self.date_ranges, self.get_date_ranges(clean_data))
+        
+        self.warn_if_all_skipped()
+        logging.info(f"Data loaded from {self.file_name}")
+        
+    def extract_transform(self) -> dict:
         #1. Extract data
         logging.info(f"Extracting data from {self.file_name}")
-        exctractor = OfxExtractor(self.file_path)
-        raw_data = exctractor.extract_all()
+        with metrics.stage("ofx.extract", bytes_read=os.path.getsize(self.file_path), file=self.file_name) as stage:
+            exctractor = OfxExtractor(self.file_path)
+            raw_data = exctractor.extract_all()
+            stage.rows_out = len(raw_data["transactions"])
         
         #2. Transform data
         logging.info(f"Transforming data from {self.file_name}")
-        transformer = OfxTransformer(raw_data, self.db_config)
-        clean_data = transformer.transform_all()
+        clean_data = self.transform(raw_data)
+        self.warn_if_all_skipped()
+        return clean_data
         
+    def load(self, clean_data: dict):
         #3. Load data
         logging.info(f"Loading data into MySQL from {self.file_name}")
-        loader = MySQLLoader(
-            self.db_config,
-            clean_data
-        )
-
-        loader.load_all()
+        self.errors = self.load_all(clean_data)
+        self.date_ranges = self.get_date_ranges(clean_data)
         
         logging.info(f"Data loaded from {self.file_name}")
+        
+    def run(self):
+        with metrics.stage("ofx.run", bytes_read=os.path.getsize(self.file_path), file=self.file_name) as stage:
+            if self.chunk_size:
+                self.run_chunks()
+            else:
+                self.load(self.extract_transform())
+            if self.errors:
+                stage.fail(f"Unable to load {', '.join(self.errors)}")
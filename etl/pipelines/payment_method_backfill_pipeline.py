@@ -0,0 +1,51 @@
+from extract.mysql_extractor import MySQLExtractor
+from transform.memo_pattern_matcher import MemoPatternMatcher
+from load.mysql_loader import MySQLLoader
+import logging
+
+class PaymentMethodBackfillPipeline:
+    # Sets transactions.payment_method_id on the rows already in database, chunk by chunk.
+    # To run again whenever payment_methods_transaction_link changes.
+    def __init__(self, db_config:dict, chunk_size:int = 10000):
+        self.db_config = db_config
+        self.chunk_size = chunk_size
+
+    def run(self):
+        db_extractor = MySQLExtractor(self.db_config)
+        matcher = MemoPatternMatcher(db_extractor.get_payment_method_patterns())
+        logging.info(f"Payment method matcher built with {len(matcher)} memo pattern(s)")
+
+        # transaction ids come from the bank files (FITID) : start below any BIGINT
+        last_id = -2**63
+        row_counter = 0
+        update_counter = 0
+        error_counter = 0
+        while True:
+            #1. Extract a chunk of transactions
+            transactions = db_extractor.get_transactions_memos(last_id, self.chunk_size)
+            if transactions.empty:
+                break
+            last_id = int(transactions["id"].iloc[-1])
+            row_counter += len(transactions)
+
+            #2. Transform : only rows whose payment method changes are sent back
+            transactions["new_payment_method_id"] = matcher.match_series(transactions["memo"])
+            current = transactions["payment_method_id"].astype("Int64").fillna(-1)
+            changed = transactions[current != transactions["new_payment_method_id"].fillna(-1)]
+            if changed.empty:
+                continue
+
+            #3. Load data
+            loader = MySQLLoader(self.db_config, {
+                "transactions_payment_methods" : changed[["id", "new_payment_method_id"]].rename(columns={
+                    "new_payment_method_id" : "payment_method_id"
+                })
+            })
+            loader.load_all()
+            if loader.errors:
+                error_counter += len(changed)
+            else:
+                update_counter += len(changed)
+            logging.info(f"Payment methods backfilled up to transaction id {last_id}")
+
+        logging.info(f"REPORT : payment method backfill - {row_counter} transaction(s) read - {update_counter} updated - {error_counter} in error")
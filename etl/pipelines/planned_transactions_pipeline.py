@@ -0,0 +1,30 @@
+from extract.mysql_extractor import MySQLExtractor
+from transform.planned_transactions_engine import PlannedTransactionsEngine
+from load.mysql_loader import MySQLLoader
+import logging
+
+class PlannedTransactionsPipeline:
+    def __init__(self, db_config:dict):
+        self.db_config = db_config
+
+    def run(self):
+        #1. Extract planned transactions and the transactions of their payees
+        logging.info("Extracting planned transactions")
+        db_extractor = MySQLExtractor(self.db_config)
+        engine = PlannedTransactionsEngine(
+            db_extractor.get_planned_transactions(),
+            db_extractor.get_planned_transactions_candidates()
+        )
+
+        #2. Compute the status of every occurrence and keep the planned transactions that changed
+        logging.info("Computing planned transactions status")
+        clean_data = engine.diff(engine.compute(), db_extractor.get_planned_transactions_status())
+        refresh = clean_data["planned_transactions_status_refresh"]
+        if refresh.empty:
+            logging.info("REPORT : planned transactions status up to date")
+            return
+
+        #3. Load data
+        loader = MySQLLoader(self.db_config, clean_data)
+        loader.load_all()
+        logging.info(f"REPORT : planned transactions status - {len(refresh)} planned transaction(s) refreshed - {len(clean_data['planned_transactions_status'])} occurrence(s) written")
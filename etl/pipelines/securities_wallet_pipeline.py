@@ -0,0 +1,17 @@
+from load.securities_wallet_materializer import SecuritiesWalletMaterializer
+import logging
+
+class SecuritiesWalletPipeline:
+    def __init__(self, db_config:dict, check_consistency:bool = False):
+        self.db_config = db_config
+        self.check_consistency = check_consistency
+
+    def run(self):
+        #1. Refresh positions touched by new operations or prices
+        logging.info("Refreshing securities wallet positions")
+        materializer = SecuritiesWalletMaterializer(self.db_config)
+        materializer.refresh()
+
+        #2. Compare with the securities_wallet_evolution view
+        if self.check_consistency:
+            materializer.check_consistency()
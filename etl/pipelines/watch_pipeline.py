@@ -0,0 +1,92 @@
+from pipelines.main_pipeline import MainPipeline
+from db.engine_registry import registry
+from db.metrics import metrics
+import os
+import signal
+import time
+import logging
+
+WATCHED_EXTENSIONS = (".ofx", ".csv")
+
+class WatchPipeline:
+    # Daemon mode : polls data/to_process and runs a MainPipeline cycle for each burst of new files.
+    # A burst is over once the folder has not changed for settle_seconds (files still being
+    # copied, other files of the same export...). The engines and the reference data of the
+    # MainPipeline stay warm from one cycle to the next. Prices are downloaded at most every
+    # prices_seconds. With --batch-rows / --batch-seconds, files are held in a batch across cycles until it
+    # is full or old enough, checked on every poll. SIGINT / SIGTERM stop the daemon once the files in
+    # flight (and the held batches) are loaded.
+    def __init__(self, main_pipeline: MainPipeline, poll_seconds: float = 5, settle_seconds: float = 2, prices_seconds: float = 3600):
+        self.main_pipeline = main_pipeline
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        self.prices_seconds = prices_seconds
+        self.to_process_dir = os.path.join(main_pipeline.data_dir, "to_process")
+        self.stop_event = main_pipeline.stop_event
+        self.prices_downloaded_at = None
+
+    def request_stop(self, signum, frame):
+        logging.info(f"Signal {signum} received : stopping once the files in flight are loaded")
+        self.stop_event.set()
+
+    def list_files(self) -> dict:
+        # {file name: (size, modification time)} of the new files waiting in to_process
+        files = {}
+        held_files = self.main_pipeline.held_files()
+        for file in os.scandir(self.to_process_dir):
+            _, ext = os.path.splitext(file.name)
+            if file.is_file() and ext.lower() in WATCHED_EXTENSIONS and file.path not in held_files:
+                stat = file.stat()
+                files[file.name] = (stat.st_size, stat.st_mtime)
+        return files
+
+    def wait_for_burst(self) -> bool:
+        # False when a stop is requested before any file arrives
+        files = self.list_files()
+        while not files:
+            # a held batch is loaded once old enough, without waiting for another file
+            if self.main_pipeline.has_aged_batch():
+                logging.info("Loading the batch held since the previous cycles")
+                return True
+            if self.stop_event.wait(self.poll_seconds):
+                return False
+            files = self.list_files()
+
+        # the burst is over once nothing moved during settle_seconds
+        while True:
+            if self.stop_event.wait(self.settle_seconds):
+                return False
+            current = self.list_files()
+            if current == files:
+                logging.info(f"{len(files)} new file(s) in {self.to_process_dir}")
+                return True
+            files = current
+
+    def prices_due(self) -> bool:
+        return self.prices_downloaded_at is None or time.monotonic() - self.prices_downloaded_at >= self.prices_seconds
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGTERM, self.request_stop)
+        logging.info(f"Watching {self.to_process_dir} every {self.poll_seconds}s")
+
+        try:
+            # files left by a previous run are processed straight away
+            while self.wait_for_burst():
+                prices = self.prices_due()
+                started_at = time.monotonic()
+                try:
+                    self.main_pipeline.run_cycle(prices=prices)
+                finally:
+                    # one summary (and Prometheus file) per cycle
+                    metrics.finish_run()
+                if prices:
+                    self.prices_downloaded_at = started_at
+        finally:
+            # the steps depending on these files run on the next start
+            if self.main_pipeline.held_files():
+                self.main_pipeline.flush_held_batches()
+                metrics.finish_run()
+            registry.log_pool_metrics()
+            registry.dispose_all()
+            logging.info("Watch stopped")
@@ -1,29 +1,52 @@
 from extract.yfinance_extractor import YFinanceExtractor
+from extract.yfinance_downloader import YFinanceDownloader
 from extract.mysql_extractor import MySQLExtractor
+from extract.securities_info_resolver import SecuritiesInfoResolver
+from db.price_store import PriceStore
 from load.mysql_loader import MySQLLoader
+from db.metrics import metrics
 import logging
 from pathlib import Path
 
 class YfinancePipeline:
-    def __init__(self, db_config:dict):
+    def __init__(self, db_config:dict, downloader: YFinanceDownloader = None, price_store: PriceStore = None, info_resolver: SecuritiesInfoResolver = None):
         self.db_config = db_config
+        self.downloader = downloader
+        self.price_store = price_store
+        self.info_resolver = info_resolver
+        # tables which could not be loaded
+        self.errors = []
 
     def run(self):
+        with metrics.stage("yfinance.run") as stage:
+            self.extract_load()
+            if self.errors:
+                stage.fail(f"Unable to load {', '.join(self.errors)}")
+
+    def extract_load(self):
         #1. Extract data from DB
-        db_extractor = MySQLExtractor(self.db_config)
-        tickers = db_extractor.get_securities_to_update()
-        security_prices_date = db_extractor.get_securities_price_import_dates()
+        with metrics.stage("yfinance.extract_db") as stage:
+            db_extractor = MySQLExtractor(self.db_config)
+            tickers = db_extractor.get_securities_to_update()
+            security_prices_date = db_extractor.get_securities_price_import_dates()
+            stage.rows_out = len(tickers) + len(security_prices_date)
 
         #2. Extract data from yfinance
-        y_extractor = YFinanceExtractor()
+        y_extractor = YFinanceExtractor(self.downloader, self.price_store, self.info_resolver)
         data = {}
         if tickers != []:
-            securities_info = y_extractor.extract_securities_info(tickers)
-            data["securities_info"] = securities_info
+            with metrics.stage("yfinance.extract_securities_info", rows_in=len(tickers)) as stage:
+                securities_info = y_extractor.extract_securities_info(tickers)
+                stage.rows_out = len(securities_info)
+            # every resolved ticker is updated by one load_securities_optional_info call
+            if not securities_info.empty:
+                data["securities_info"] = securities_info
         else:
             logging.info("No data to update in securities table")
         if not security_prices_date.empty:
-            security_prices = y_extractor.extract_security_prices(security_prices_date)
+            with metrics.stage("yfinance.extract_security_prices", rows_in=len(security_prices_date)) as stage:
+                security_prices = y_extractor.extract_security_prices(security_prices_date)
+                stage.rows_out = len(security_prices)
             data["security_prices"] = security_prices
         else:
             logging.info("No data to add in security_prices table")
@@ -33,3 +56,4 @@ class YfinancePipeline:
         loader = MySQLLoader(self.db_config, data)
 
         loader.load_all()
+        self.errors = loader.errors
@@ -0,0 +1,190 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from transform.balance_history_engine import ACCOUNT_KEY_STRIDE, to_month_number, to_month_last_day
+
+SCHEDULE_COLUMNS = [
+    "loan_id", "month_last_day", "month_duration", "start_month_total_due_amount", "interest",
+    "month_due_amount", "amount_repaid", "end_month_total_due_amount"
+]
+
+def month_first_days(month_numbers: np.ndarray) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(pd.to_datetime({"year": month_numbers // 12, "month": month_numbers % 12 + 1, "day": 1}))
+
+def add_months_to_month_end(month_numbers: np.ndarray, months) -> np.ndarray:
+    # DATE_ADD(LAST_DAY(date), INTERVAL n MONTH) : the day is clamped to the length of the target month
+    targets = month_numbers + months
+    first_days = month_first_days(targets)
+    days = np.minimum(month_first_days(month_numbers).days_in_month, first_days.days_in_month)
+    return (first_days + pd.to_timedelta(days - 1, unit="D")).to_numpy()
+
+def loan_fingerprints(loans: pd.DataFrame, early_payments: pd.DataFrame) -> pd.Series:
+    # fingerprint of every input of a loan schedule, by loan id
+    payments = {}
+    for payment in early_payments.sort_values(["loan_id", "date", "amount"]).itertuples(index=False):
+        payments.setdefault(int(payment.loan_id), []).append(f"{payment.date}:{float(payment.amount)}")
+
+    fingerprints = {}
+    for loan in loans.itertuples(index=False):
+        key = "|".join(str(value) for value in [
+            float(loan.amount), None if pd.isna(loan.flat_rate_value) else float(loan.flat_rate_value),
+            loan.subscription_date, loan.first_installment_date, int(loan.total_month_duration),
+            ";".join(payments.get(int(loan.id), []))
+        ])
+        fingerprints[int(loan.id)] = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return pd.Series(fingerprints, dtype=object)
+
+class AmortizationEngine:
+    # Loan schedules, same rows as the former recursive amortization_table view :
+    # - before the first installment : interest accrues by yearly blocks from the subscription
+    #   (first block : fraction of the first month + 11 months), shown month by month, nothing repaid
+    # - from the first installment : constant annuity computed each month on the remaining capital
+    #   and the remaining duration, early payments reduce the capital of their month
+    # All the loans are computed together, month step by month step.
+    def __init__(self, loans: pd.DataFrame, early_payments: pd.DataFrame):
+        self.loans = loans.reset_index(drop=True)
+        self.early_payments = early_payments
+
+        # early payments by (loan index, month), several payments of a month are summed
+        position = {int(id): index for index, id in enumerate(self.loans["id"])}
+        payments = early_payments[early_payments["loan_id"].isin(position)]
+        keys = payments["loan_id"].map(position).to_numpy(dtype=np.int64) * ACCOUNT_KEY_STRIDE + to_month_number(payments["date"])
+        self.early_payments_by_key = pd.Series(payments["amount"].astype(float).to_numpy()).groupby(keys).sum()
+
+    def early_payment_amounts(self, loan_index: np.ndarray, months: np.ndarray) -> np.ndarray:
+        if self.early_payments_by_key.empty:
+            return np.zeros(len(months))
+        return pd.Series(loan_index * ACCOUNT_KEY_STRIDE + months).map(self.early_payments_by_key).fillna(0.0).to_numpy()
+
+    def compute(self) -> pd.DataFrame:
+        if self.loans.empty:
+            return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            before = self.compute_before_first_installment()
+            schedule = pd.concat([before, self.compute_after_first_installment(before)], ignore_index=True)
+
+        values = SCHEDULE_COLUMNS[3:]
+        schedule[values] = schedule[values].replace([np.inf, -np.inf], np.nan).round(4)
+        schedule["month_last_day"] = to_month_last_day(schedule["month"].to_numpy())
+        return schedule.sort_values(["loan_id", "month_duration"])[SCHEDULE_COLUMNS].reset_index(drop=True)
+
+    def loan_arrays(self) -> tuple:
+        # amounts, rates, subscription dates, first installment dates
+        amounts = self.loans["amount"].astype(float).to_numpy()
+        rates = self.loans["flat_rate_value"].astype(float).to_numpy()
+        subscription_dates = pd.DatetimeIndex(pd.to_datetime(self.loans["subscription_date"]))
+        first_installment_dates = pd.to_datetime(self.loans["first_installment_date"]).to_numpy()
+        return amounts, rates, subscription_dates, first_installment_dates
+
+    def last_month_before_first_installment(self) -> tuple:
+        # (number of yearly blocks, last month before the first installment) of each loan
+        _, _, subscription_dates, first_installment_dates = self.loan_arrays()
+        subscription_months = to_month_number(subscription_dates)
+
+        # a new block starts while one year after the end of the current block is before the first installment
+        blocks = np.ones(len(subscription_months), dtype=np.int64)
+        active = add_months_to_month_end(subscription_months, 12) < first_installment_dates
+        while active.any():
+            blocks += active
+            active &= add_months_to_month_end(subscription_months + 12 * (blocks - 1), 12) < first_installment_dates
+
+        # months follow each other inside the last block while the next one is before the first installment
+        last_months = subscription_months + 12 * (blocks - 1)
+        active = add_months_to_month_end(last_months, 1) < first_installment_dates
+        while active.any():
+            last_months += active
+            active &= add_months_to_month_end(last_months, 1) < first_installment_dates
+
+        return blocks, last_months
+
+    def compute_before_first_installment(self) -> pd.DataFrame:
+        amounts, rates, subscription_dates, first_installment_dates = self.loan_arrays()
+        subscription_months = to_month_number(subscription_dates)
+        blocks, last_months = self.last_month_before_first_installment()
+
+        #1. yearly blocks : interest of the first (partial) year, then compounded full years
+        days_in_month = subscription_dates.days_in_month.to_numpy()
+        installment_days = np.minimum(pd.DatetimeIndex(first_installment_dates).day.to_numpy(), days_in_month)
+        first_interests = (installment_days - subscription_dates.day.to_numpy()) / days_in_month * amounts * rates / 12 + 11 * (amounts * rates / 12)
+        first_year_ends = amounts + first_interests
+
+        #2. one row per month from the subscription to the last month before the first installment
+        counts = last_months - subscription_months + 1
+        loan_index = np.repeat(np.arange(len(counts)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        months = subscription_months[loan_index] + offsets
+        # the last block can run over 12 months : months compare the installment date with the
+        # same day of the next month, blocks with the last day of the month one year later
+        block = np.minimum(offsets // 12, blocks[loan_index] - 1)
+        in_block = offsets - 12 * block
+
+        rate = rates[loan_index]
+        year_start = np.where(block == 0, amounts[loan_index], first_year_ends[loan_index] * (1 + rate) ** (block - 1))
+        year_end = first_year_ends[loan_index] * (1 + rate) ** block
+        year_interest = np.where(block == 0, first_interests[loan_index], year_start * rate)
+
+        early_payments = self.early_payment_amounts(loan_index, months)
+        block_first_early_payments = self.early_payment_amounts(loan_index, months - in_block)
+        # the early payments of the first month of a block are not counted as repaid
+        repaid = pd.Series(np.where(in_block == 0, 0.0, early_payments)).groupby([loan_index, block]).cumsum().to_numpy()
+        # the month before a new block already carries the yearly interest
+        next_is_block = (in_block == 11) & (block + 1 < blocks[loan_index])
+
+        return pd.DataFrame({
+            "loan_id"                       : self.loans["id"].to_numpy()[loan_index],
+            "month"                         : months,
+            "month_duration"                : offsets + 1,
+            "start_month_total_due_amount"  : year_start,
+            "interest"                      : year_interest / 12,
+            "month_due_amount"              : block_first_early_payments,
+            "amount_repaid"                 : repaid,
+            "end_month_total_due_amount"    : np.where(next_is_block, year_end, year_start) - early_payments
+        })
+
+    def compute_after_first_installment(self, before: pd.DataFrame) -> pd.DataFrame:
+        # starts from the last month before the first installment of each loan
+        rates = self.loans["flat_rate_value"].astype(float).to_numpy()
+        durations = self.loans["total_month_duration"].astype(np.int64).to_numpy()
+        last_rows = before.groupby("loan_id", sort=False).tail(1)
+
+        loan_index = np.arange(len(self.loans))
+        months = last_rows["month"].to_numpy().copy()
+        month_durations = last_rows["month_duration"].to_numpy().copy()
+        due_amounts = last_rows["end_month_total_due_amount"].to_numpy(dtype=float).copy()
+        monthly_rates = rates / 12
+
+        steps = []
+        # the first installment carries the yearly rate on the remaining capital
+        active = np.ones(len(loan_index), dtype=bool)
+        first_step = True
+        while active.any():
+            index = loan_index[active]
+            capital = due_amounts[index]
+            months[index] += 1
+            early_payments = self.early_payment_amounts(index, months[index])
+
+            installments = capital * monthly_rates[index] / (1 - (1 + monthly_rates[index]) ** -(durations[index] - month_durations[index]).astype(float))
+            interests = capital * (rates[index] if first_step else monthly_rates[index])
+            due_amounts[index] = capital + interests - early_payments - installments
+            month_durations[index] += 1
+
+            steps.append(pd.DataFrame({
+                "loan_id"                       : self.loans["id"].to_numpy()[index],
+                "month"                         : months[index],
+                "month_duration"                : month_durations[index],
+                "start_month_total_due_amount"  : capital,
+                "interest"                      : interests,
+                "month_due_amount"              : installments,
+                "amount_repaid"                 : installments - capital * monthly_rates[index] + early_payments,
+                "end_month_total_due_amount"    : due_amounts[index]
+            }))
+            active = month_durations < durations
+            first_step = False
+
+        return pd.concat(steps, ignore_index=True)
+
+    def compute_for(self, loan_ids: list) -> pd.DataFrame:
+        # schedules of some loans only
+        loans = self.loans[self.loans["id"].isin(loan_ids)]
+        return AmortizationEngine(loans, self.early_payments).compute()
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+# month keys of different accounts never overlap : key = account index * ACCOUNT_KEY_STRIDE + month
+ACCOUNT_KEY_STRIDE = 12 * 100000
+
+HISTORY_COLUMNS = ["account_id", "month_last_day", "source", "value"]
+
+def to_month_number(dates) -> np.ndarray:
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    return (dates.year * 12 + dates.month - 1).to_numpy(dtype=np.int64)
+
+def to_month_last_day(month_numbers: np.ndarray) -> np.ndarray:
+    first_days = pd.to_datetime({"year": month_numbers // 12, "month": month_numbers % 12 + 1, "day": 1})
+    return (first_days + pd.offsets.MonthEnd(0)).dt.date.to_numpy()
+
+class BalanceHistoryEngine:
+    # Monthly balance of each account, same series as the former balance_history view :
+    # - cash accounts : starting from the month of the last known balance, the series goes back
+    #   month by month down to the month before the first transaction (all accounts), each month
+    #   being worth the last balance minus the cash flows of the following months
+    # - securities : value of the positions on the last stock market day of each month
+    def __init__(self, last_balances: pd.DataFrame, cash_flows: pd.DataFrame, stock_values: pd.DataFrame, min_transaction_date):
+        self.last_balances = last_balances
+        self.cash_flows = cash_flows
+        self.stock_values = stock_values
+        self.min_transaction_date = None if min_transaction_date is None or pd.isna(min_transaction_date) else pd.Timestamp(min_transaction_date)
+
+    def compute_cash_balances(self) -> pd.DataFrame:
+        if self.last_balances.empty:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+        account_ids = self.last_balances["account_id"].to_numpy()
+        anchors = to_month_number(self.last_balances["date"])
+        values = self.last_balances["value"].astype(float).to_numpy()
+
+        #1. monthly grid : from the anchor month down to the month before the first transaction
+        # (a month is followed by the previous one while its last day is after the first transaction)
+        if self.min_transaction_date is None:
+            lowest = anchors
+        else:
+            first_month = to_month_number([self.min_transaction_date])[0]
+            if self.min_transaction_date.is_month_end:
+                first_month += 1
+            lowest = np.minimum(anchors, first_month - 1)
+
+        counts = anchors - lowest + 1
+        account_index = np.repeat(np.arange(len(anchors)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        months = anchors[account_index] - offsets
+
+        #2. cash flows of the months strictly after each grid month, from one cumulative sum
+        position = {account_id: index for index, account_id in enumerate(account_ids)}
+        cash_flows = self.cash_flows[self.cash_flows["account_id"].isin(position)]
+        flow_keys = cash_flows["account_id"].map(position).to_numpy(dtype=np.int64) * ACCOUNT_KEY_STRIDE + to_month_number(cash_flows["month_last_day"])
+        order = np.argsort(flow_keys, kind="stable")
+        flow_keys = flow_keys[order]
+        cumulated = np.concatenate([[0.0], np.cumsum(cash_flows["cash_flow"].astype(float).to_numpy()[order])])
+
+        grid_keys = account_index * ACCOUNT_KEY_STRIDE + months
+        account_ends = np.searchsorted(flow_keys, (account_index + 1) * ACCOUNT_KEY_STRIDE, side="left")
+        following_flows = cumulated[account_ends] - cumulated[np.searchsorted(flow_keys, grid_keys, side="right")]
+
+        return pd.DataFrame({
+            "account_id"        : account_ids[account_index],
+            "month_last_day"    : to_month_last_day(months),
+            "source"            : "balance",
+            "value"             : np.round(values[account_index] - following_flows, 2)
+        })
+
+    def compute_stock_values(self) -> pd.DataFrame:
+        if self.min_transaction_date is None or self.stock_values.empty:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+        stock_values = self.stock_values[pd.to_datetime(self.stock_values["month_last_day"]) > self.min_transaction_date]
+        return pd.DataFrame({
+            "account_id"        : stock_values["account_id"].to_numpy(),
+            "month_last_day"    : pd.to_datetime(stock_values["month_last_day"]).dt.date.to_numpy(),
+            "source"            : "securities",
+            "value"             : np.round(stock_values["value"].astype(float).to_numpy(), 2)
+        })
+
+    def compute(self) -> pd.DataFrame:
+        return pd.concat([self.compute_cash_balances(), self.compute_stock_values()], ignore_index=True)[HISTORY_COLUMNS]
+
+    def diff(self, history: pd.DataFrame, stored: pd.DataFrame) -> dict:
+        # rows to write from the earliest changed month of each account/source, the stored rows
+        # of these months are replaced
+        keys = ["account_id", "source", "month_last_day"]
+        stored = stored[HISTORY_COLUMNS].copy()
+        stored["month_last_day"] = pd.to_datetime(stored["month_last_day"]).dt.date
+        stored["value"] = stored["value"].astype(float).round(2)
+
+        merged = history.merge(stored, on=keys, how="outer", suffixes=("", "_stored"), indicator=True)
+        changed = merged[(merged["_merge"] != "both") | (merged["value"] != merged["value_stored"])]
+
+        refresh = changed.groupby(["account_id", "source"], as_index=False)["month_last_day"].min().rename(columns={
+            "month_last_day" : "from_month_last_day"
+        })
+        rows = history.merge(refresh, on=["account_id", "source"])
+        rows = rows[rows["month_last_day"] >= rows["from_month_last_day"]]
+
+        return {
+            "balance_history_refresh"   : refresh,
+            "balance_history"           : rows[HISTORY_COLUMNS].reset_index(drop=True)
+        }
@@ -0,0 +1,119 @@
+import pandas as pd
+
+WITHDRAWAL_PAYMENT_METHOD = "RETRAIT"
+WITHDRAWAL_CATEGORY = "Retrait"
+UNCATEGORIZED_CATEGORY = "Non catégorisé"
+
+SNAPSHOT_COLUMNS = ["entry", "entry_key", "is_expense", "category_id", "parent_category_id"]
+
+def to_int_or_none(value):
+    return None if value is None or pd.isna(value) else int(value)
+
+class CategoryMap:
+    # Categories of the transactions, same rules as the former transactions_monthly_details view :
+    # - withdrawal payment method : "Retrait"
+    # - otherwise the category tagged by the user, then the one linked to the clean payee
+    #   (categories_transaction_link), then "Non catégorisé"
+    # - parent : parent of the tagged category, then parent of the linked category, then the
+    #   linked category itself, then "Non catégorisé"
+    # Payees are compared case insensitively, as the default collation of the database.
+    def __init__(self, categories: pd.DataFrame, links: pd.DataFrame, payment_methods: pd.DataFrame):
+        # categories : id, name, parent_id - links : id, payee, is_expense, category_id - payment_methods : id, name
+        self.parents = {int(row.id): to_int_or_none(row.parent_id) for row in categories.itertuples(index=False)}
+        self.withdrawal_category_id = self.get_category_id(categories, WITHDRAWAL_CATEGORY)
+        self.uncategorized_category_id = self.get_category_id(categories, UNCATEGORIZED_CATEGORY)
+        self.withdrawal_payment_method_ids = sorted(int(id) for id in payment_methods.loc[payment_methods["name"] == WITHDRAWAL_PAYMENT_METHOD, "id"])
+
+        # one link per payee and type, the first one (link id order) when several exist
+        links = links.sort_values("id").assign(
+            entry_key=links["payee"].str.upper(),
+            is_expense=links["is_expense"].astype(bool)
+        ).drop_duplicates(["entry_key", "is_expense"])
+        self.links = pd.DataFrame({
+            "entry_key"             : links["entry_key"].to_numpy(),
+            "is_expense"            : links["is_expense"].to_numpy(),
+            "link_category_id"      : links["category_id"].astype("Int64").to_numpy(),
+            "link_parent_id"        : links["category_id"].map(self.parents).astype("Int64").to_numpy()
+        })
+
+    def get_category_id(self, categories: pd.DataFrame, name: str):
+        ids = categories.loc[categories["name"] == name, "id"]
+        return int(ids.min()) if not ids.empty else None
+
+    def __len__(self) -> int:
+        return len(self.links)
+
+    def resolve(self, transactions: pd.DataFrame) -> pd.DataFrame:
+        # category_id / parent_category_id (Int64) of transactions with clean_payee, is_expense,
+        # payment_method_id and optionally user_tag_category_id columns
+        keys = pd.DataFrame({
+            "entry_key"     : transactions["clean_payee"].str.upper().to_numpy(),
+            "is_expense"    : transactions["is_expense"].astype(bool).to_numpy()
+        })
+        linked = keys.merge(self.links, on=["entry_key", "is_expense"], how="left")
+
+        if "user_tag_category_id" in transactions:
+            user_tag = pd.Series(transactions["user_tag_category_id"].to_numpy(), dtype="Int64")
+        else:
+            user_tag = pd.Series(pd.NA, index=keys.index, dtype="Int64")
+        user_tag_parent = user_tag.map(self.parents).astype("Int64")
+
+        uncategorized = pd.NA if self.uncategorized_category_id is None else self.uncategorized_category_id
+        category_id = user_tag.fillna(linked["link_category_id"]).fillna(uncategorized)
+        parent_category_id = user_tag_parent.fillna(linked["link_parent_id"]).fillna(linked["link_category_id"]).fillna(uncategorized)
+
+        is_withdrawal = pd.Series(transactions["payment_method_id"].to_numpy(), dtype="Int64").isin(self.withdrawal_payment_method_ids).to_numpy()
+        withdrawal = pd.NA if self.withdrawal_category_id is None else self.withdrawal_category_id
+        category_id[is_withdrawal] = withdrawal
+        parent_category_id[is_withdrawal] = withdrawal
+
+        return pd.DataFrame({
+            "category_id"           : category_id.astype("Int64").to_numpy(),
+            "parent_category_id"    : parent_category_id.astype("Int64").to_numpy()
+        }, index=transactions.index)
+
+    def snapshot(self) -> pd.DataFrame:
+        # state of the map saved in category_map_snapshot, compared at the next run
+        payees = pd.DataFrame({
+            "entry"                 : "payee",
+            "entry_key"             : self.links["entry_key"],
+            "is_expense"            : self.links["is_expense"],
+            "category_id"           : self.links["link_category_id"],
+            "parent_category_id"    : self.links["link_parent_id"]
+        })
+        defaults = pd.DataFrame([
+            ["withdrawal", "", False, self.withdrawal_category_id, None],
+            ["uncategorized", "", False, self.uncategorized_category_id, None]
+        ] + [
+            ["withdrawal_payment_method", str(id), False, None, None] for id in self.withdrawal_payment_method_ids
+        ], columns=SNAPSHOT_COLUMNS)
+
+        snapshot = pd.concat([payees, defaults], ignore_index=True)
+        snapshot["is_expense"] = snapshot["is_expense"].astype(bool)
+        snapshot["category_id"] = snapshot["category_id"].astype("Int64")
+        snapshot["parent_category_id"] = snapshot["parent_category_id"].astype("Int64")
+        return snapshot[SNAPSHOT_COLUMNS]
+
+    def diff(self, stored: pd.DataFrame) -> tuple:
+        # (full, payees) : full when the whole table must be reclassified (no snapshot yet, default
+        # categories or withdrawal payment methods changed), otherwise the payees whose link changed
+        snapshot = self.snapshot()
+        if stored.empty:
+            return True, snapshot.iloc[0:0][["entry_key", "is_expense"]]
+
+        stored = stored[SNAPSHOT_COLUMNS].copy()
+        stored["is_expense"] = stored["is_expense"].astype(bool)
+        stored["category_id"] = stored["category_id"].astype("Int64")
+        stored["parent_category_id"] = stored["parent_category_id"].astype("Int64")
+
+        keys = ["entry", "entry_key", "is_expense"]
+        merged = snapshot.merge(stored, on=keys, how="outer", suffixes=("", "_stored"), indicator=True)
+        changed = merged[
+            (merged["_merge"] != "both")
+            | (merged["category_id"].fillna(-1) != merged["category_id_stored"].fillna(-1))
+            | (merged["parent_category_id"].fillna(-1) != merged["parent_category_id_stored"].fillna(-1))
+        ]
+
+        full = bool((changed["entry"] != "payee").any())
+        payees = changed.loc[changed["entry"] == "payee", ["entry_key", "is_expense"]].reset_index(drop=True)
+        return full, payees
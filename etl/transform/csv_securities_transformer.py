@@ -1,6 +1,8 @@
 import logging
+import numpy as np
 import pandas as pd
 import re
+from db.dtypes import CATEGORY, STRING
 
 class CsvSecuritiesTransformer:
     def __init__(self, raw_data: pd.DataFrame):
@@ -14,6 +16,23 @@ class CsvSecuritiesTransformer:
             amount = float(amount)
             
         return amount
+    
+    def clean_amounts_column(self, amounts: pd.Series) -> pd.Series:
+        # vectorized clean_amounts
+        if pd.api.types.is_numeric_dtype(amounts):
+            return amounts.astype(float)
+        
+        # first run of digits and commas, kept in the Arrow string kernels (str.extract is not)
+        text = amounts.astype(STRING)
+        has_number = text.str.contains(r"[\d,]", regex=True, na=False)
+        numbers = text.str.replace(r"(?s)^[^\d,]*([\d,]+).*$", r"\1", regex=True).where(has_number)
+        cleaned = numbers.str.replace(",", ".", regex=False).astype(float)
+        
+        # values without any number are kept as is, like clean_amounts
+        if numbers.isna().any():
+            cleaned = cleaned.astype(object).where(numbers.notna(), amounts)
+        
+        return cleaned
         
     def transform_accounts(self) -> pd.DataFrame:
         accounts = self.raw_data[["account_id"]].drop_duplicates().copy()
@@ -39,20 +58,25 @@ class CsvSecuritiesTransformer:
         operations = self.raw_data[["Opération", "ISIN", "Quantité", "Montant Net", "Frais", "Date", "account_id"]].copy()
         operations = operations[operations["ISIN"].notna() & (operations["ISIN"] != "")]
         
-        operations["operation_type"] = operations["Opération"].apply(
-            lambda x: "purchase" if "ACHAT" in x.upper()
-            else "sale" if "VENTE" in x.upper()
-            else "tax"
+        # labels of the categorical column as strings : the vectorized str methods apply to them
+        operation = operations["Opération"].astype(STRING).str.upper()
+        operations["operation_type"] = np.select(
+            [
+                operation.str.contains("ACHAT", regex=False, na=False),
+                operation.str.contains("VENTE", regex=False, na=False)
+            ],
+            ["purchase", "sale"],
+            default="tax"
         )
+        operations["operation_type"] = operations["operation_type"].astype(CATEGORY)
         
-        operations["Montant Net"] = operations["Montant Net"].apply(self.clean_amounts)
-        operations["Frais"] = operations["Frais"].apply(self.clean_amounts)
+        operations["Montant Net"] = self.clean_amounts_column(operations["Montant Net"])
+        operations["Frais"] = self.clean_amounts_column(operations["Frais"])
         
-        operations["gross_amount"] = operations.apply(
-            lambda row: row["Montant Net"] + row["Frais"]
-            if row["operation_type"] == "sale"
-            else row["Montant Net"] - row["Frais"],
-            axis=1
+        operations["gross_amount"] = np.where(
+            operations["operation_type"] == "sale",
+            operations["Montant Net"] + operations["Frais"],
+            operations["Montant Net"] - operations["Frais"]
         )
         
         operations["gross_unit_price"] = round(operations["gross_amount"]/operations["Quantité"], 4)
@@ -0,0 +1,64 @@
+import re
+import numpy as np
+import pandas as pd
+
+def like_to_regex(pattern: str) -> str:
+    # MySQL LIKE : % any sequence, _ any character, \ escapes the next character
+    regex = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            regex.append(re.escape(char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "%":
+            regex.append(".*")
+        elif char == "_":
+            regex.append(".")
+        else:
+            regex.append(re.escape(char))
+    if escaped:
+        regex.append(re.escape("\\"))
+
+    return "".join(regex)
+
+class MemoPatternMatcher:
+    # The LIKE patterns of payment_methods_transaction_link compiled into one regex, one group per
+    # pattern. Patterns are tried in the given order (link id) : the first matching one wins.
+    # Matching is case insensitive, as the default collation of the database.
+    def __init__(self, patterns: list):
+        # patterns : [(transaction_memo_pattern, payment_method_id)]
+        self.payment_method_ids = [payment_method_id for _, payment_method_id in patterns]
+        self.regex = None
+        if patterns:
+            groups = "|".join(f"({like_to_regex(pattern)})" for pattern, _ in patterns)
+            self.regex = re.compile(rf"^(?:{groups})\Z", re.IGNORECASE | re.DOTALL)
+
+    def __len__(self) -> int:
+        return len(self.payment_method_ids)
+
+    def match(self, memo: str):
+        if self.regex is None or not isinstance(memo, str):
+            return None
+
+        result = self.regex.match(memo)
+        if result is None:
+            return None
+        return self.payment_method_ids[result.lastindex - 1]
+
+    def match_series(self, memos: pd.Series) -> pd.Series:
+        # payment_method_id of each memo (<NA> without match), evaluated once per distinct memo
+        if self.regex is None or memos.empty:
+            return pd.Series(pd.NA, index=memos.index, dtype="Int64")
+
+        distinct_memos = pd.Series(memos.dropna().unique(), dtype=object)
+        groups = distinct_memos.str.extract(self.regex)
+
+        matched = groups.notna().to_numpy()
+        first_group = matched.argmax(axis=1)
+        ids = np.array(self.payment_method_ids, dtype=object)[first_group]
+        ids[~matched.any(axis=1)] = pd.NA
+
+        mapping = pd.Series(ids, index=distinct_memos.to_numpy())
+        return memos.map(mapping).astype("Int64")
@@ -2,31 +2,57 @@ import logging
 import pandas as pd
 import re
 from extract.mysql_extractor import MySQLExtractor
+from transform.payee_matcher import PayeeMatcher
+from transform.memo_pattern_matcher import MemoPatternMatcher
+from transform.category_map import CategoryMap
+from db.dtypes import CATEGORY
 
 class OfxTransformer:
-    def __init__(self, raw_data: dict, db_config: dict):
+    def __init__(self, raw_data: dict, db_config: dict, payee_matcher: PayeeMatcher = None, payment_method_matcher: MemoPatternMatcher = None, category_map: CategoryMap = None):
         self.raw_data_accounts = raw_data["accounts"]
         self.raw_data_transactions = raw_data["transactions"]
         self.db_config = db_config
-        self.db_payees = []
+        self.payee_matcher = payee_matcher
+        self.payment_method_matcher = payment_method_matcher
+        self.category_map = category_map
+        
+    def get_payee_matcher(self) -> PayeeMatcher:
+        if self.payee_matcher is None:
+            db_extractor = MySQLExtractor(self.db_config)
+            self.payee_matcher = PayeeMatcher(db_extractor.get_clean_payees())
+            logging.info(f"Payee matcher built with {len(self.payee_matcher)} clean payee(s)")
+        
+        return self.payee_matcher
+        
+    def get_payment_method_matcher(self) -> MemoPatternMatcher:
+        if self.payment_method_matcher is None:
+            db_extractor = MySQLExtractor(self.db_config)
+            self.payment_method_matcher = MemoPatternMatcher(db_extractor.get_payment_method_patterns())
+            logging.info(f"Payment method matcher built with {len(self.payment_method_matcher)} memo pattern(s)")
+        
+        return self.payment_method_matcher
+        
+    def get_category_map(self) -> CategoryMap:
+        if self.category_map is None:
+            db_extractor = MySQLExtractor(self.db_config)
+            self.category_map = CategoryMap(db_extractor.get_categories(), db_extractor.get_categories_links(), db_extractor.get_payment_methods())
+            logging.info(f"Category map built with {len(self.category_map)} payee link(s)")
+        
+        return self.category_map
         
     def clean_payee(self, payee: str) -> str:
         if not isinstance(payee, str):
             return payee
         
-        if self.db_payees == []:
-            db_extractor = MySQLExtractor(self.db_config)
-            self.db_payees = db_extractor.get_clean_payees()
-        
         payee = payee.upper()
         
         # reduce multiple spaces
         payee = re.sub(r"\s{2,}", " ", payee)
         
         # check if ther already is a clean payee in database
-        for db_payee in self.db_payees:
-            if db_payee in payee:
-                return db_payee
+        db_payee = self.get_payee_matcher().match(payee)
+        if db_payee is not None:
+            return db_payee
         
         
         # if there is no clean payee in database, clean it
@@ -59,6 +85,8 @@ class OfxTransformer:
 
     def transform_balances(self) -> pd.DataFrame:
         balances = self.raw_data_accounts[["account_id", "balance", "date"]].drop_duplicates().copy()
+        # streamed chunks can hold accounts whose balance is not known yet
+        balances = balances[balances["balance"].notna()]
         balances["date"] = pd.to_datetime(balances["date"])
         
         balances = balances.sort_values("date").groupby("account_id").tail(1)
@@ -78,14 +106,21 @@ class OfxTransformer:
     def transform_transactions(self) -> pd.DataFrame:
         transactions = self.raw_data_transactions[["account_id", "date", "payee", "memo", "amount", "transaction_id"]].copy()
         
-        #clean payee
-        transactions["clean_payee"] = transactions["payee"].apply(self.clean_payee)
+        #clean payee (once per distinct raw payee)
+        clean_payees = {payee: self.clean_payee(payee) for payee in transactions["payee"].dropna().unique()}
+        transactions["clean_payee"] = transactions["payee"].map(clean_payees).astype(CATEGORY)
+        
+        # payment method from the memo patterns (first matching link)
+        transactions["payment_method_id"] = self.get_payment_method_matcher().match_series(transactions["memo"])
         
         # is_expense column
-        transactions["is_expense"] = transactions["amount"].apply(lambda x: 0 if x>0 else 1)
+        transactions["is_expense"] = (transactions["amount"] <= 0).astype("int8")
+        
+        # categories from the payment method and the clean payee links
+        transactions[["category_id", "parent_category_id"]] = self.get_category_map().resolve(transactions)
         
         # absolue amount
-        transactions["amount"] = transactions["amount"].apply(abs)
+        transactions["amount"] = transactions["amount"].abs()
         
         return transactions
     
@@ -0,0 +1,90 @@
+from collections import deque
+
+class PayeeMatcher:
+    # Aho-Corasick automaton over the known clean payees.
+    # Among all the payees found in a text, the longest one wins and, for equal lengths,
+    # the first one in the given list (same result as testing "payee in text" in list order
+    # with a list sorted by length desc, as returned by MySQLExtractor.get_clean_payees)
+    def __init__(self, payees: list):
+        self.payees = list(payees)
+
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]
+        self.empty_match = None
+
+        self.build_trie()
+        self.build_fail_links()
+
+    def is_better(self, candidate: int, current) -> bool:
+        if current is None:
+            return True
+        candidate_length = len(self.payees[candidate])
+        current_length = len(self.payees[current])
+
+        return candidate_length > current_length or (candidate_length == current_length and candidate < current)
+
+    def build_trie(self):
+        for index, payee in enumerate(self.payees):
+            if not isinstance(payee, str):
+                continue
+            if payee == "":
+                if self.empty_match is None:
+                    self.empty_match = index
+                continue
+
+            state = 0
+            for char in payee:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(None)
+                state = next_state
+
+            if self.is_better(index, self.best[state]):
+                self.best[state] = index
+
+    def build_fail_links(self):
+        # breadth-first so that fail targets (shorter suffixes) are complete before their children
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+
+                fail_state = self.fail[state]
+                while fail_state and char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                self.fail[next_state] = self.goto[fail_state].get(char, 0)
+
+                # a node also reports every payee ending at its fail target
+                inherited = self.best[self.fail[next_state]]
+                if inherited is not None and self.is_better(inherited, self.best[next_state]):
+                    self.best[next_state] = inherited
+
+    def match(self, text: str):
+        goto = self.goto
+        fail = self.fail
+        best = self.best
+
+        state = 0
+        found = None
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            candidate = best[state]
+            if candidate is not None and (found is None or self.is_better(candidate, found)):
+                found = candidate
+
+        if found is None:
+            found = self.empty_match
+
+        return None if found is None else self.payees[found]
+
+    def __len__(self):
+        return len(self.payees)
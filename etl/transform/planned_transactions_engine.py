@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+from transform.balance_history_engine import to_month_number, to_month_last_day
+
+STATUS_COLUMNS = [
+    "planned_transaction_id", "is_expense", "due_amount", "paid_amount", "total_due_amount", "total_paid_amount",
+    "payee", "due_month_last_day", "paid_month_last_day", "status"
+]
+
+# transactions are indexed by (payee, type) code then date : key = code * KEY_STRIDE + days since epoch
+KEY_STRIDE = 1000000
+
+def to_days(dates) -> np.ndarray:
+    return pd.DatetimeIndex(pd.to_datetime(dates)).to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+def comparable(values: pd.Series) -> pd.Series:
+    # missing values (None, NaN, NaT) compared as equal
+    return values.astype(object).map(lambda value: "" if pd.isna(value) else str(value))
+
+def payment_status(due_month_last_day, paid_month_last_day) -> str:
+    if paid_month_last_day is None or pd.isna(paid_month_last_day):
+        return "En attente"
+    if paid_month_last_day == due_month_last_day:
+        return "Payé"
+    return f"Payé en {paid_month_last_day.month:02d}/{paid_month_last_day.year}"
+
+class PlannedTransactionsEngine:
+    # Payment status of every occurrence of the planned transactions, same rows as the former
+    # planned_transactions_history view :
+    # - occurrences : every month (monthly) or year (any other frequency) from the month of the
+    #   start date, up to the first month ending on or after the end date (today without end date)
+    # - a transaction pays the planned transaction of the same clean payee and type whose period
+    #   (start date to end date + 1 month, today without end date) contains it, the one ending
+    #   first when several match (no end date first)
+    # - an occurrence is paid by the first payment whose cumulative amount covers the cumulative
+    #   amount due up to this occurrence
+    def __init__(self, planned: pd.DataFrame, transactions: pd.DataFrame, today = None):
+        # planned : id, is_expense, amount, start_date, end_date, frequency, payee
+        # transactions : id, date, amount, is_expense, clean_payee
+        self.planned = planned.reset_index(drop=True)
+        self.transactions = transactions
+        self.today = pd.Timestamp(today if today is not None else pd.Timestamp.now().date())
+
+    def payee_codes(self) -> tuple:
+        # one code per (payee, type), payees compared case insensitively as in the database (-1 without payee)
+        payees = pd.concat([self.planned["payee"], self.transactions["clean_payee"]], ignore_index=True).astype(object)
+        is_expense = pd.concat([self.planned["is_expense"], self.transactions["is_expense"]], ignore_index=True).astype(bool)
+        keys = [(payee.upper(), expense) if isinstance(payee, str) else None for payee, expense in zip(payees, is_expense)]
+        codes, _ = pd.factorize(pd.Series(keys, dtype=object))
+        return codes[:len(self.planned)], codes[len(self.planned):]
+
+    def occurrences(self) -> pd.DataFrame:
+        planned = self.planned
+        start_months = to_month_number(planned["start_date"])
+        end_dates = pd.to_datetime(planned["end_date"]).fillna(self.today)
+        end_months = to_month_number(end_dates)
+        steps = np.where(planned["frequency"] == "monthly", 1, 12)
+
+        # the last occurrence is the first one ending on or after the end date
+        counts = np.maximum(-(-(end_months - start_months) // steps), 0) + 1
+        plan_index = np.repeat(np.arange(len(planned)), counts)
+        ranks = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        due_amounts = planned["amount"].astype(float).to_numpy()[plan_index]
+
+        return pd.DataFrame({
+            "plan_index"        : plan_index,
+            "month"             : start_months[plan_index] + ranks * steps[plan_index],
+            "due_amount"        : due_amounts,
+            "total_due_amount"  : np.round(due_amounts * (ranks + 1), 2)
+        })
+
+    def payments(self) -> pd.DataFrame:
+        # transactions matched to their planned transaction, with the cumulative paid amount
+        columns = ["plan_index", "transaction_id", "date", "paid_amount", "total_paid_amount"]
+        if self.planned.empty or self.transactions.empty:
+            return pd.DataFrame(columns=columns)
+
+        #1. interval index : transactions sorted by (payee, type) then date
+        plan_codes, transaction_codes = self.payee_codes()
+        transaction_keys = transaction_codes * KEY_STRIDE + to_days(self.transactions["date"])
+        transaction_keys[transaction_codes < 0] = -1
+        order = np.argsort(transaction_keys, kind="stable")
+        sorted_keys = transaction_keys[order]
+
+        end_dates = pd.to_datetime(self.planned["end_date"])
+        upper_dates = (end_dates + pd.DateOffset(months=1)).fillna(self.today)
+        lows = np.searchsorted(sorted_keys, plan_codes * KEY_STRIDE + to_days(self.planned["start_date"]), side="left")
+        highs = np.searchsorted(sorted_keys, plan_codes * KEY_STRIDE + to_days(upper_dates), side="right")
+        highs = np.where(plan_codes < 0, lows, np.maximum(highs, lows))
+
+        #2. (planned transaction, transaction) pairs from the index ranges
+        counts = highs - lows
+        plan_index = np.repeat(np.arange(len(counts)), counts)
+        positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lows, counts)
+        pairs = self.transactions.iloc[order[positions]]
+        pairs = pd.DataFrame({
+            "plan_index"        : plan_index,
+            "end_date"          : end_dates.to_numpy()[plan_index],
+            "plan_id"           : self.planned["id"].to_numpy()[plan_index],
+            "transaction_id"    : pairs["id"].to_numpy(),
+            "date"              : pd.to_datetime(pairs["date"]).to_numpy(),
+            "paid_amount"       : pairs["amount"].astype(float).to_numpy()
+        })
+
+        #3. one planned transaction per transaction : the one ending first, no end date first
+        pairs = pairs.sort_values(["transaction_id", "end_date", "plan_id"], na_position="first").drop_duplicates("transaction_id")
+
+        #4. cumulative paid amount by date (payments of a same date share their total)
+        pairs = pairs.sort_values(["plan_index", "date", "transaction_id"]).reset_index(drop=True)
+        cumulated = pairs.groupby("plan_index")["paid_amount"].cumsum()
+        pairs["total_paid_amount"] = np.round(cumulated.groupby([pairs["plan_index"], pairs["date"]]).transform("max"), 2)
+        return pairs[columns]
+
+    def compute(self) -> pd.DataFrame:
+        if self.planned.empty:
+            return pd.DataFrame(columns=STATUS_COLUMNS)
+
+        occurrences = self.occurrences()
+        payments = self.payments()
+
+        # first payment covering the cumulative amount due, searched within each planned transaction
+        paid_position = np.full(len(occurrences), -1)
+        payment_groups = payments.groupby("plan_index").indices
+        for plan_index, occurrence_positions in occurrences.groupby("plan_index").indices.items():
+            payment_positions = payment_groups.get(plan_index)
+            if payment_positions is None:
+                continue
+            totals = payments["total_paid_amount"].to_numpy(dtype=float)[payment_positions]
+            found = np.searchsorted(totals, occurrences["total_due_amount"].to_numpy()[occurrence_positions], side="left")
+            paid_position[occurrence_positions] = np.where(found < len(totals), payment_positions[np.minimum(found, len(totals) - 1)], -1)
+
+        is_paid = paid_position >= 0
+        paid = payments.iloc[paid_position[is_paid]]
+        plan_index = occurrences["plan_index"].to_numpy()
+
+        status = pd.DataFrame({
+            "planned_transaction_id"    : self.planned["id"].to_numpy()[plan_index],
+            "is_expense"                : self.planned["is_expense"].to_numpy()[plan_index],
+            "due_amount"                : occurrences["due_amount"].to_numpy(),
+            "paid_amount"               : np.nan,
+            "total_due_amount"          : occurrences["total_due_amount"].to_numpy(),
+            "total_paid_amount"         : np.nan,
+            "payee"                     : self.planned["payee"].to_numpy()[plan_index],
+            "due_month_last_day"        : to_month_last_day(occurrences["month"].to_numpy()),
+            "paid_month_last_day"       : None
+        })
+        status.loc[is_paid, "paid_amount"] = paid["paid_amount"].to_numpy(dtype=float)
+        status.loc[is_paid, "total_paid_amount"] = paid["total_paid_amount"].to_numpy(dtype=float)
+        status.loc[is_paid, "paid_month_last_day"] = to_month_last_day(to_month_number(paid["date"]))
+        status["status"] = [payment_status(due, paid) for due, paid in zip(status["due_month_last_day"], status["paid_month_last_day"])]
+        return status[STATUS_COLUMNS]
+
+    def diff(self, status: pd.DataFrame, stored: pd.DataFrame) -> dict:
+        # planned transactions whose rows changed since the last run, their rows are replaced
+        keys = ["planned_transaction_id", "due_month_last_day"]
+        values = ["due_amount", "paid_amount", "total_due_amount", "total_paid_amount"]
+        stored = stored[STATUS_COLUMNS].copy()
+        stored["due_month_last_day"] = pd.to_datetime(stored["due_month_last_day"]).dt.date
+        stored["paid_month_last_day"] = pd.to_datetime(stored["paid_month_last_day"]).dt.date
+
+        merged = status.merge(stored, on=keys, how="outer", suffixes=("", "_stored"), indicator=True)
+        changed = merged["_merge"] != "both"
+        for column in values:
+            changed |= merged[column].astype(float).round(2).fillna(-1) != merged[f"{column}_stored"].astype(float).round(2).fillna(-1)
+        changed |= merged["is_expense"].astype(float).fillna(-1) != merged["is_expense_stored"].astype(float).fillna(-1)
+        for column in ["payee", "paid_month_last_day", "status"]:
+            changed |= comparable(merged[column]) != comparable(merged[f"{column}_stored"])
+
+        refresh = pd.DataFrame({"planned_transaction_id": merged.loc[changed, "planned_transaction_id"].unique()})
+        return {
+            "planned_transactions_status_refresh"   : refresh,
+            "planned_transactions_status"           : status[status["planned_transaction_id"].isin(refresh["planned_transaction_id"])].reset_index(drop=True)
+        }
@@ -0,0 +1,24 @@
+-- ======================================
+-- CLÉS UNIQUES POUR LE MODE DE FUSION "upsert" DE L'ETL
+-- (MySQLLoader(merge_mode="upsert") ou "merge_mode": "upsert" dans db_config)
+-- À exécuter une fois sur une base créée avant l'ajout de ces clés.
+-- Les doublons éventuels doivent être supprimés avant l'ajout des clés.
+-- ======================================
+
+USE personnal_finance_db;
+
+-- Les comparaisons de l'ETL reposent sur la collation par défaut (utf8mb4_0900_ai_ci),
+-- insensible à la casse : plus besoin de LOWER() et les index sont utilisables.
+
+ALTER TABLE currency
+  ADD UNIQUE KEY uq_currency_abbreviation (abbreviation);
+
+ALTER TABLE account_type
+  ADD UNIQUE KEY uq_account_type_name (name);
+
+ALTER TABLE securities
+  ADD KEY idx_securities_name (name),
+  ADD KEY idx_securities_ticker (ticker);
+
+ALTER TABLE security_operations
+  ADD UNIQUE KEY uq_security_operations_natural_key (account_id, isin, date, quantity, operation_type);
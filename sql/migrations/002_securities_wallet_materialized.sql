@@ -0,0 +1,42 @@
+-- ======================================
+-- TABLES MATÉRIALISÉES DE L'ÉVOLUTION DU PORTEFEUILLE BOURSIER
+-- Remplies et maintenues par l'ETL après chaque chargement (SecuritiesWalletPipeline).
+-- À exécuter une fois sur une base existante, puis recréer les vues (sql/views.sql).
+-- ======================================
+
+USE personnal_finance_db;
+
+-- Positions et valorisation par titre et par jour de cotation (vue securities_wallet_evolution)
+CREATE TABLE securities_wallet_positions (
+  date DATE NOT NULL,
+  account_id BIGINT NOT NULL,
+  isin VARCHAR(12) NOT NULL,
+  total_quantity DECIMAL(32,0) NOT NULL,
+  cost_price DECIMAL(32,8),
+  unit_cost_price DECIMAL(32,8),
+  open_price DECIMAL(10,4),
+  close_price DECIMAL(10,4),
+  capital_value DECIMAL(32,8),
+  capital_gain_value DECIMAL(32,8),
+  capital_gain_rate DECIMAL(32,12),
+  capital_rate DECIMAL(32,12),  -- part de la position dans la valeur du portefeuille à cette date
+  PRIMARY KEY (isin, date),     -- une seule ligne par titre et par date (row_id = 1 dans la vue)
+  KEY idx_securities_wallet_positions_date (date)
+);
+
+-- Rendement global du portefeuille par jour de cotation
+CREATE TABLE securities_wallet_global_rates (
+  date DATE PRIMARY KEY,
+  global_gain_rate DECIMAL(32,12),
+  global_gain_rate_since_yesterday DECIMAL(32,12)
+);
+
+-- État du rafraîchissement par titre : empreinte des opérations et derniers cours pris en compte
+CREATE TABLE securities_wallet_refresh_state (
+  isin VARCHAR(12) PRIMARY KEY,
+  operations_fingerprint VARCHAR(64),
+  price_count INT NOT NULL DEFAULT 0,
+  last_price_date DATE,
+  refresh_from_date DATE,  -- non NULL : positions à recalculer à partir de cette date
+  refreshed_at DATETIME
+);
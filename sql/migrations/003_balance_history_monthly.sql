@@ -0,0 +1,16 @@
+-- ======================================
+-- TABLE MATÉRIALISÉE DE L'HISTORIQUE DES SOLDES
+-- Remplie et maintenue par l'ETL après chaque chargement (BalanceHistoryPipeline).
+-- À exécuter une fois sur une base existante, puis recréer les vues (sql/views.sql).
+-- ======================================
+
+USE personnal_finance_db;
+
+-- Solde mensuel par compte, calculé par l'ETL (BalanceHistoryEngine) et lu par la vue balance_history
+CREATE TABLE balance_history_monthly (
+  account_id BIGINT NOT NULL,
+  month_last_day DATE NOT NULL,
+  source ENUM('balance', 'securities') NOT NULL,  -- solde reconstitué ou valeur des titres
+  value DECIMAL(12,2),
+  PRIMARY KEY (account_id, source, month_last_day)
+);
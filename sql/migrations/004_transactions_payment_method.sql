@@ -0,0 +1,17 @@
+-- ======================================
+-- MOYEN DE PAIEMENT ATTRIBUÉ À L'IMPORT DES TRANSACTIONS
+-- L'ETL renseigne transactions.payment_method_id (premier motif LIKE du mémo qui correspond,
+-- dans l'ordre des id de payment_methods_transaction_link) : la vue transactions_monthly_details
+-- n'évalue plus les motifs à chaque requête.
+-- À exécuter une fois sur une base existante, puis :
+--   1. recréer les vues (sql/views.sql)
+--   2. remplir la colonne pour les transactions existantes : python etl/main.py --backfill-payment-methods
+--      (à relancer après chaque modification des motifs)
+-- ======================================
+
+USE personnal_finance_db;
+
+ALTER TABLE transactions
+  ADD COLUMN payment_method_id INT,
+  ADD KEY idx_transactions_payment_method (payment_method_id),
+  ADD FOREIGN KEY (payment_method_id) REFERENCES payment_methods(id);
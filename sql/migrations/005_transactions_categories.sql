@@ -0,0 +1,29 @@
+-- ======================================
+-- CATÉGORIES ATTRIBUÉES À L'IMPORT DES TRANSACTIONS
+-- L'ETL renseigne transactions.category_id / parent_category_id (mêmes règles que l'ancienne vue
+-- transactions_monthly_details) : la vue ne fait plus de jointures sur les catégories.
+-- Quand les catégories ou categories_transaction_link changent, seules les transactions des payees
+-- concernés sont reclassées (comparaison avec category_map_snapshot).
+-- À exécuter une fois sur une base existante, puis :
+--   1. recréer les vues (sql/views.sql)
+--   2. lancer l'ETL : sans snapshot, toutes les transactions existantes sont classées au premier passage
+--      (ou directement : python etl/main.py --reclassify-categories)
+-- ======================================
+
+USE personnal_finance_db;
+
+ALTER TABLE transactions
+  ADD COLUMN category_id INT,
+  ADD COLUMN parent_category_id INT,
+  ADD KEY idx_transactions_clean_payee (clean_payee),
+  ADD FOREIGN KEY (category_id) REFERENCES categories(id),
+  ADD FOREIGN KEY (parent_category_id) REFERENCES categories(id);
+
+CREATE TABLE category_map_snapshot (
+  entry VARCHAR(32) NOT NULL,  -- 'payee', 'withdrawal', 'uncategorized' ou 'withdrawal_payment_method'
+  entry_key VARCHAR(256) NOT NULL,
+  is_expense BOOLEAN NOT NULL,
+  category_id INT,
+  parent_category_id INT,
+  PRIMARY KEY (entry, entry_key, is_expense)
+);
@@ -0,0 +1,28 @@
+-- ======================================
+-- TABLE MATÉRIALISÉE DES TABLEAUX D'AMORTISSEMENT
+-- Remplie et maintenue par l'ETL après chaque chargement (AmortizationPipeline) : seuls les prêts
+-- dont la ligne ou les remboursements anticipés ont changé sont recalculés.
+-- À exécuter une fois sur une base existante, puis recréer les vues (sql/views.sql).
+-- ======================================
+
+USE personnal_finance_db;
+
+-- Tableau d'amortissement des prêts, calculé par l'ETL (AmortizationEngine) et lu par la vue amortization_table
+CREATE TABLE loan_amortization_schedule (
+  loan_id INT NOT NULL,
+  month_last_day DATE NOT NULL,
+  month_duration INT NOT NULL,
+  start_month_total_due_amount DECIMAL(14,4),
+  interest DECIMAL(14,4),
+  month_due_amount DECIMAL(14,4),
+  amount_repaid DECIMAL(14,4),
+  end_month_total_due_amount DECIMAL(14,4),
+  PRIMARY KEY (loan_id, month_last_day)
+);
+
+-- Empreinte du prêt et de ses remboursements anticipés lors du dernier calcul : un prêt n'est recalculé que si elle change
+CREATE TABLE loan_amortization_state (
+  loan_id INT PRIMARY KEY,
+  fingerprint CHAR(40) NOT NULL,
+  computed_at DATETIME NOT NULL
+);
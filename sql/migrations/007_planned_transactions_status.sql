@@ -0,0 +1,24 @@
+-- ======================================
+-- TABLE MATÉRIALISÉE DU STATUT DES TRANSACTIONS PLANIFIÉES
+-- Remplie et maintenue par l'ETL après chaque chargement de transactions (PlannedTransactionsPipeline) :
+-- seules les transactions planifiées dont une occurrence a changé sont réécrites.
+-- À exécuter une fois sur une base existante, puis recréer les vues (sql/views.sql).
+-- ======================================
+
+USE personnal_finance_db;
+
+-- Statut de paiement de chaque occurrence des transactions planifiées, calculé par l'ETL
+-- (PlannedTransactionsEngine) et lu par la vue planned_transactions_history
+CREATE TABLE planned_transactions_status (
+  planned_transaction_id INT NOT NULL,
+  is_expense BOOLEAN NOT NULL,
+  due_amount DECIMAL(10,2),
+  paid_amount DECIMAL(10,2),
+  total_due_amount DECIMAL(12,2),
+  total_paid_amount DECIMAL(12,2),
+  payee VARCHAR(128),
+  due_month_last_day DATE NOT NULL,
+  paid_month_last_day DATE,
+  status VARCHAR(32) NOT NULL,  -- 'Payé', 'Payé en MM/AAAA' ou 'En attente'
+  PRIMARY KEY (planned_transaction_id, due_month_last_day)
+);
@@ -16,13 +16,15 @@ CREATE TABLE currency (
   id INT AUTO_INCREMENT PRIMARY KEY,
   name VARCHAR(16) NOT NULL,
   abbreviation VARCHAR(4) NOT NULL,
-  symbol VARCHAR(4) NOT NULL
+  symbol VARCHAR(4) NOT NULL,
+  UNIQUE KEY uq_currency_abbreviation (abbreviation)  -- clé de fusion de l'ETL (collation insensible à la casse)
 );
 
 CREATE TABLE account_type (
   id INT AUTO_INCREMENT PRIMARY KEY,
   name VARCHAR(45) NOT NULL,
-  is_checking_account BOOLEAN NOT NULL DEFAULT FALSE
+  is_checking_account BOOLEAN NOT NULL DEFAULT FALSE,
+  UNIQUE KEY uq_account_type_name (name)
 );
 
 CREATE TABLE accounts (
@@ -69,8 +71,15 @@ CREATE TABLE transactions (
   user_tag_category_id INT,
   user_ignore_transaction BOOLEAN NOT NULL DEFAULT FALSE,
   is_expense BOOLEAN NOT NULL,
+  payment_method_id INT,  -- attribué par l'ETL d'après payment_methods_transaction_link (voir plus bas)
+  category_id INT,  -- attribuées par l'ETL (catégorie de l'utilisateur, du payee, "Retrait" ou "Non catégorisé")
+  parent_category_id INT,
+  KEY idx_transactions_payment_method (payment_method_id),
+  KEY idx_transactions_clean_payee (clean_payee),
   FOREIGN KEY (account_id) REFERENCES accounts(id),
-  FOREIGN KEY (user_tag_category_id) REFERENCES categories(id)
+  FOREIGN KEY (user_tag_category_id) REFERENCES categories(id),
+  FOREIGN KEY (category_id) REFERENCES categories(id),
+  FOREIGN KEY (parent_category_id) REFERENCES categories(id)
 );
 
 CREATE TABLE categories_transaction_link (
@@ -81,6 +90,17 @@ CREATE TABLE categories_transaction_link (
   FOREIGN KEY (category_id) REFERENCES categories(id)
 );
 
+-- Correspondances payee -> catégorie utilisées par l'ETL lors du dernier classement des transactions :
+-- seules les transactions des payees dont le lien a changé depuis sont reclassées
+CREATE TABLE category_map_snapshot (
+  entry VARCHAR(32) NOT NULL,  -- 'payee', 'withdrawal', 'uncategorized' ou 'withdrawal_payment_method'
+  entry_key VARCHAR(256) NOT NULL,
+  is_expense BOOLEAN NOT NULL,
+  category_id INT,
+  parent_category_id INT,
+  PRIMARY KEY (entry, entry_key, is_expense)
+);
+
 -- ======================================
 -- MOYENS DE PAIEMENT
 -- ======================================
@@ -97,6 +117,10 @@ CREATE TABLE payment_methods_transaction_link (
   FOREIGN KEY (payment_method_id) REFERENCES payment_methods(id)
 );
 
+-- Moyen de paiement des transactions : premier motif LIKE du mémo qui correspond (ordre des id)
+ALTER TABLE transactions
+  ADD FOREIGN KEY (payment_method_id) REFERENCES payment_methods(id);
+
 -- ======================================
 -- TRANSACTIONS PLANIFIÉES
 -- ======================================
@@ -113,6 +137,22 @@ CREATE TABLE planned_transactions (
   payee VARCHAR(128)
 );
 
+-- Statut de paiement de chaque occurrence des transactions planifiées, calculé par l'ETL
+-- (PlannedTransactionsEngine) et lu par la vue planned_transactions_history
+CREATE TABLE planned_transactions_status (
+  planned_transaction_id INT NOT NULL,
+  is_expense BOOLEAN NOT NULL,
+  due_amount DECIMAL(10,2),
+  paid_amount DECIMAL(10,2),
+  total_due_amount DECIMAL(12,2),
+  total_paid_amount DECIMAL(12,2),
+  payee VARCHAR(128),
+  due_month_last_day DATE NOT NULL,
+  paid_month_last_day DATE,
+  status VARCHAR(32) NOT NULL,  -- 'Payé', 'Payé en MM/AAAA' ou 'En attente'
+  PRIMARY KEY (planned_transaction_id, due_month_last_day)
+);
+
 -- ======================================
 -- PRÊTS ET REMBOURSEMENTS ANTICIPÉS
 -- ======================================
@@ -139,6 +179,26 @@ CREATE TABLE loan_early_payments (
   FOREIGN KEY (loan_id) REFERENCES loan(id)
 );
 
+-- Tableau d'amortissement des prêts, calculé par l'ETL (AmortizationEngine) et lu par la vue amortization_table
+CREATE TABLE loan_amortization_schedule (
+  loan_id INT NOT NULL,
+  month_last_day DATE NOT NULL,
+  month_duration INT NOT NULL,
+  start_month_total_due_amount DECIMAL(14,4),
+  interest DECIMAL(14,4),
+  month_due_amount DECIMAL(14,4),
+  amount_repaid DECIMAL(14,4),
+  end_month_total_due_amount DECIMAL(14,4),
+  PRIMARY KEY (loan_id, month_last_day)
+);
+
+-- Empreinte du prêt et de ses remboursements anticipés lors du dernier calcul : un prêt n'est recalculé que si elle change
+CREATE TABLE loan_amortization_state (
+  loan_id INT PRIMARY KEY,
+  fingerprint CHAR(40) NOT NULL,
+  computed_at DATETIME NOT NULL
+);
+
 -- ======================================
 -- BOURSE : TITRES, OPÉRATIONS, COURS
 -- ======================================
@@ -150,6 +210,8 @@ CREATE TABLE securities (
   type VARCHAR(32) NOT NULL,
   currency_id INT NOT NULL,
   market VARCHAR(64),
+  KEY idx_securities_name (name),  -- plusieurs ISIN peuvent porter le même nom
+  KEY idx_securities_ticker (ticker),  -- mise à jour des infos yfinance par ticker
   FOREIGN KEY (currency_id) REFERENCES currency(id)
 );
 
@@ -165,6 +227,7 @@ CREATE TABLE security_operations (
   gross_unit_price DECIMAL(10,4),
   fees DECIMAL(10,2) DEFAULT 0,
   account_id BIGINT NOT NULL,
+  UNIQUE KEY uq_security_operations_natural_key (account_id, isin, date, quantity, operation_type),  -- dédoublonnage des imports CSV (une taxe reprend la quantité de son achat)
   FOREIGN KEY (isin) REFERENCES securities(isin),
   FOREIGN KEY (account_id) REFERENCES accounts(id)
 );
@@ -181,3 +244,51 @@ CREATE TABLE security_prices (
   UNIQUE(isin, date),
   FOREIGN KEY (isin) REFERENCES securities(isin)
 );
+
+-- ======================================
+-- TABLES MATÉRIALISÉES : MAINTENUES PAR L'ETL
+-- ======================================
+
+-- Positions et valorisation par titre et par jour de cotation (vue securities_wallet_evolution)
+CREATE TABLE securities_wallet_positions (
+  date DATE NOT NULL,
+  account_id BIGINT NOT NULL,
+  isin VARCHAR(12) NOT NULL,
+  total_quantity DECIMAL(32,0) NOT NULL,
+  cost_price DECIMAL(32,8),
+  unit_cost_price DECIMAL(32,8),
+  open_price DECIMAL(10,4),
+  close_price DECIMAL(10,4),
+  capital_value DECIMAL(32,8),
+  capital_gain_value DECIMAL(32,8),
+  capital_gain_rate DECIMAL(32,12),
+  capital_rate DECIMAL(32,12),  -- part de la position dans la valeur du portefeuille à cette date
+  PRIMARY KEY (isin, date),     -- une seule ligne par titre et par date (row_id = 1 dans la vue)
+  KEY idx_securities_wallet_positions_date (date)
+);
+
+-- Rendement global du portefeuille par jour de cotation
+CREATE TABLE securities_wallet_global_rates (
+  date DATE PRIMARY KEY,
+  global_gain_rate DECIMAL(32,12),
+  global_gain_rate_since_yesterday DECIMAL(32,12)
+);
+
+-- État du rafraîchissement par titre : empreinte des opérations et derniers cours pris en compte
+CREATE TABLE securities_wallet_refresh_state (
+  isin VARCHAR(12) PRIMARY KEY,
+  operations_fingerprint VARCHAR(64),
+  price_count INT NOT NULL DEFAULT 0,
+  last_price_date DATE,
+  refresh_from_date DATE,  -- non NULL : positions à recalculer à partir de cette date
+  refreshed_at DATETIME
+);
+
+-- Solde mensuel par compte, calculé par l'ETL (BalanceHistoryEngine) et lu par la vue balance_history
+CREATE TABLE balance_history_monthly (
+  account_id BIGINT NOT NULL,
+  month_last_day DATE NOT NULL,
+  source ENUM('balance', 'securities') NOT NULL,  -- solde reconstitué ou valeur des titres
+  value DECIMAL(12,2),
+  PRIMARY KEY (account_id, source, month_last_day)
+);